@@ -2,24 +2,243 @@
 Flask API for Insurance Eligibility Prediction
 Run with: python api.py
 Access at: http://localhost:5000
+
+Set PREDICT_COALESCE_WINDOW_MS (e.g. 2) to micro-batch concurrent /predict
+requests; PREDICT_COALESCE_MAX_BATCH and PREDICT_DEADLINE_MS tune it.
+
+Set PREDICTION_CACHE_SIZE (e.g. 10000) to memoize /predict results for
+repeated feature rows.
+
+ICD/CPT frequency tables come from model.bundle until frequency_store.py
+publishes a snapshot at CODE_TABLES_PATH (default code_frequencies.bundle);
+the snapshot is re-checked every second and picked up without a restart.
+
+/predict-stream scores NDJSON or CSV request bodies in chunks of
+PREDICT_STREAM_CHUNK_SIZE rows (default 1000) and streams NDJSON back.
+
+/predict-batch and /predict-stream also answer with columnar JSON or Arrow
+IPC (?format=columnar|arrow or the Accept header; see response_formats.py).
+
+The model is hot-swapped without a restart when model.bundle changes, on
+SIGHUP, or via POST /admin/reload-model (see model_slot.py); responses carry
+the serving version in X-Model-Version.
+
+Set SHADOW_BUNDLE_PATH to score every request against a candidate bundle
+in the background and report agreement at /health and /metrics.
+
+Set REQUEST_PROFILING=1 to profile single requests sent with an X-Profile
+header (see request_profiling.py).
+
+Prometheus metrics are served at /metrics. Scaling is folded into the fused
+engine, so the `transform` stage is not observed here; its cost is part of
+`predict_proba`.
 """
 
-from flask import Flask, request, jsonify
-import pickle
+from flask import Flask, Response, request, jsonify, stream_with_context
+import csv
+import itertools
+import os
+import time
 import numpy as np
 import json
 
+import hmac
+
+from frequency_store import DEFAULT_SNAPSHOT_PATH, PublishedCodeTables
+from model_slot import ModelSlot, install_sighup_handler
+from prediction_cache import PredictionCache
+from request_profiling import RequestProfiler
+from request_coalescer import RequestCoalescer, CoalescerTimeout
+from shadow_scoring import ShadowScorer
+from service_metrics import ServiceMetrics, PROMETHEUS_CONTENT_TYPE
+from validation import API_SCHEMA
+import response_formats
+from response_formats import BatchScores, UnsupportedFormat
+
 app = Flask(__name__)
 
-# Load model, scaler, and features
-model = pickle.load(open('model.pkl', 'rb'))
-scaler = pickle.load(open('scaler.pkl', 'rb'))
-features = pickle.load(open('features.pkl', 'rb'))
+metrics = ServiceMetrics(endpoints=('/predict', '/predict-batch', '/predict-stream'))
+
+# Opt-in per-request profiling (REQUEST_PROFILING=1 plus an X-Profile header)
+profiler = RequestProfiler.from_env()
+profiler.install(app)
+
+# The versioned model bundle (written by export_model.py), behind a slot that
+# hot-swaps it when the file changes, on SIGHUP or via /admin/reload-model.
+# It needs only NumPy: no unpickling, so sklearn and pandas are never imported
+# here. The engine has the scaler folded into its coefficients and scores raw
+# feature rows directly.
+model_slot = ModelSlot(
+    os.environ.get('MODEL_BUNDLE_PATH', 'model.bundle'),
+    check_interval=float(os.environ.get('MODEL_WATCH_INTERVAL', 1.0)),
+    on_swap=lambda model: metrics.model_load_seconds.set(model.load_seconds)
+)
+
+# Token for /admin/reload-model (the endpoint is disabled without one)
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
+
+# Normalized ICD/CPT frequency tables, so clients can send raw codes. A
+# published frequency_store snapshot replaces the serving bundle's tables when
+# present.
+code_tables = PublishedCodeTables(os.environ.get('CODE_TABLES_PATH', DEFAULT_SNAPSHOT_PATH), default=None)
+code_tables.get()
+
+def request_code_indexes(served):
+    """(icd_index, cpt_index): the published snapshot's, else the served bundle's"""
+    return code_tables.get() or served.code_indexes
+
+# Optional micro-batching of concurrent /predict requests.
+# Enabled by setting PREDICT_COALESCE_WINDOW_MS (e.g. 2).
+PREDICT_COALESCE_WINDOW_MS = float(os.environ.get('PREDICT_COALESCE_WINDOW_MS', 0))
+PREDICT_COALESCE_MAX_BATCH = int(os.environ.get('PREDICT_COALESCE_MAX_BATCH', 64))
+PREDICT_DEADLINE_MS = float(os.environ.get('PREDICT_DEADLINE_MS', 1000))
+
+coalescer = None
+if PREDICT_COALESCE_WINDOW_MS > 0:
+    # Each /predict passes its own snapshot's engine to submit(), so rows are
+    # batched per model version and scored by the version the response names
+    coalescer = RequestCoalescer(
+        lambda X: model_slot.get().engine.eligible_probability(X),
+        window_ms=PREDICT_COALESCE_WINDOW_MS,
+        max_batch_size=PREDICT_COALESCE_MAX_BATCH
+    )
+
+# Optional LRU cache of /predict results, keyed on the engine version.
+# Enabled by setting PREDICTION_CACHE_SIZE (e.g. 10000).
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 0))
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(maxsize=PREDICTION_CACHE_SIZE)
+    metrics.extra_collectors.append(prediction_cache.prometheus_lines)
+
+# Optional shadow scoring: a candidate bundle scores the same rows off the
+# response path and is compared with the primary (see shadow_scoring.py).
+# Enabled by setting SHADOW_BUNDLE_PATH; the candidate is hot-swapped too.
+SHADOW_BUNDLE_PATH = os.environ.get('SHADOW_BUNDLE_PATH')
+
+shadow = None
+if SHADOW_BUNDLE_PATH:
+    shadow_slot = ModelSlot(
+        SHADOW_BUNDLE_PATH,
+        check_interval=float(os.environ.get('MODEL_WATCH_INTERVAL', 1.0)),
+        expected_features=model_slot.get().bundle.features
+    )
+    shadow = ShadowScorer(
+        shadow_slot.get,
+        max_workers=int(os.environ.get('SHADOW_WORKERS', 1)),
+        max_pending=int(os.environ.get('SHADOW_MAX_PENDING', 64)),
+        sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', 1.0)),
+        poll_interval=float(os.environ.get('SHADOW_POLL_MS', 50)) / 1000,
+        max_cpu=float(os.environ.get('SHADOW_MAX_CPU', 0.05)),
+        get_code_indexes=code_tables.get
+    )
+    metrics.extra_collectors.append(shadow.prometheus_lines)
+
+PREDICT_STREAM_CHUNK_SIZE = int(os.environ.get('PREDICT_STREAM_CHUNK_SIZE', 1000))
+
+def score_batch(patients, timer=None, served=None):
+    """
+    Validate and score a list of batch patients with one engine call.
+    
+    The batch is validated as a whole (validation.API_SCHEMA). Entries that
+    fail, or are exceptions (e.g. unparseable stream lines), are listed in
+    `errors` as [{'field', 'code', 'message'}]; the rest are scored.
+    
+    Args:
+        served: model_slot.ServingModel to score with (default: the current one)
+    
+    Returns:
+        response_formats.BatchScores (probability is NaN for invalid rows)
+    """
+    served = served or model_slot.get()
+    icd_index, cpt_index = request_code_indexes(served)
+    validated = API_SCHEMA.validate(patients, {'icd': icd_index, 'cpt': cpt_index})
+    errors = {}
+    for i in validated.invalid_rows():
+        metrics.errors.inc(f'row_{validated.error_type(i)}')
+        errors[i] = validated.row_errors(i)
+    if timer is not None:
+        timer.mark('validate')
+    
+    # Score all valid rows at once
+    probability = np.full(len(patients), np.nan)
+    if validated.valid.any():
+        probability[validated.valid] = served.engine.eligible_probability(validated.features[validated.valid])
+        metrics.batch_size.observe(int(validated.valid.sum()))
+        if timer is not None:
+            timer.mark('predict_proba')
+        if shadow is not None:
+            shadow.submit(validated.features, probability, validated.valid, patients, validated.from_code)
+    return BatchScores(probability, validated.valid, errors)
+
+def _plain_number(value):
+    """Whole floats as ints for JSON responses (15.0 -> 15)"""
+    return int(value) if value.is_integer() else value
+
+def iter_ndjson_patients(stream):
+    """One patient dict per non-blank line (a ValueError for unparseable lines)"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'Invalid JSON line: {e}')
+
+def iter_csv_patients(stream):
+    """Patient dicts from a CSV body with a header row (age,gender,icd_frequency,...)"""
+    lines = (line.decode('utf-8') for line in stream)
+    for record in csv.DictReader(lines):
+        patient = {}
+        for key, value in record.items():
+            if key is None or value is None or value.strip() == '':
+                continue
+            value = value.strip()
+            if key in ('age', 'icd_frequency', 'cpt_frequency', 'month'):
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+            patient[key.strip()] = value
+        yield patient
+
+def error_response(message, status, error_type, errors=None):
+    """JSON error response, counted in prediction_errors_total"""
+    metrics.errors.inc(error_type)
+    body = {'error': message}
+    if errors is not None:
+        body['errors'] = errors
+    return jsonify(body), status
+
+def warm_up():
+    """Score one row so the first real request doesn't pay first-call costs (used by serve.py)."""
+    model_slot.get().engine.predict_proba(np.array([[45, 1, 15, 8, 6]]))
+
+def worker_init():
+    """Per-process setup once the server is running (used by serve.py): SIGHUP reloads the model"""
+    install_sighup_handler(model_slot)
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'Insurance Eligibility Predictor'})
+    response = {'status': 'healthy', 'service': 'Insurance Eligibility Predictor'}
+    model_slot.get()  # health probes also drive the file watch in idle workers
+    response['model'] = model_slot.stats()
+    if shadow is not None:
+        response['shadow'] = dict(shadow.stats(), slot=shadow_slot.stats())
+    if coalescer is not None:
+        response['coalescer'] = coalescer.stats()
+    if prediction_cache is not None:
+        response['prediction_cache'] = prediction_cache.stats()
+    response['code_tables'] = code_tables.stats()
+    return jsonify(response)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics (stage latencies, batch sizes, errors, model load time)"""
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -35,6 +254,9 @@ def predict():
         "month": 6
     }
     
+    Raw codes may be sent instead of frequencies ("icd": "M51.17",
+    "cpt": "72100"); they are resolved through the frequency index.
+    
     Response JSON:
     {
         "eligible": true,
@@ -43,58 +265,84 @@ def predict():
         "not_eligible_probability": 0.442
     }
     """
+    metrics.requests.inc('/predict')
+    timer = metrics.timer(profiler.stages())
     try:
         data = request.json
+        timer.mark('parse')
         
-        # Validate input
-        required_fields = ['age', 'gender', 'icd_frequency', 'cpt_frequency', 'month']
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': f'Missing fields. Required: {required_fields}'}), 400
+        # One model snapshot for the whole request, even if a swap happens meanwhile
+        served = model_slot.get()
         
-        # Extract data
-        age = int(data['age'])
-        gender = data['gender'].lower()
-        icd_freq = int(data['icd_frequency'])
-        cpt_freq = int(data['cpt_frequency'])
-        month = int(data['month'])
+        # Validate and encode (same schema as the batch endpoints)
+        icd_index, cpt_index = request_code_indexes(served)
+        validated = API_SCHEMA.validate([data], {'icd': icd_index, 'cpt': cpt_index})
+        if not validated.valid[0]:
+            error_type = validated.error_type(0)
+            message = validated.error_message(0)
+            if error_type == 'missing_fields':
+                message = ('Missing fields. Required: age, gender, month, '
+                           'icd_frequency or icd, cpt_frequency or cpt')
+            return error_response(message, 400, error_type, validated.row_errors(0))
+        timer.mark('validate')
         
-        # Validate ranges
-        if not 1 <= age <= 120:
-            return jsonify({'error': 'Age must be 1-120'}), 400
-        if gender not in ['male', 'female']:
-            return jsonify({'error': 'Gender must be male or female'}), 400
-        if not 1 <= icd_freq <= 683:
-            return jsonify({'error': 'ICD frequency must be 1-683'}), 400
-        if not 1 <= cpt_freq <= 1815:
-            return jsonify({'error': 'CPT frequency must be 1-1815'}), 400
-        if not 1 <= month <= 6:
-            return jsonify({'error': 'Month must be 1-6'}), 400
+        patient_row = validated.features[0].tolist()
+        age, _, icd_freq, cpt_freq, month = patient_row
+        gender = data['gender'].lower()
+        icd_known = data['icd'] in icd_index if validated.from_code['icd_frequency'][0] else None
+        cpt_known = data['cpt'] in cpt_index if validated.from_code['cpt_frequency'][0] else None
+        timer.mark('encode')
         
-        # Prepare data
-        gender_encoded = 1 if gender == 'male' else 0
-        patient_data = np.array([[age, gender_encoded, icd_freq, cpt_freq, month]])
+        # Scale and predict (repeated rows are answered from the cache)
+        eligible_probability = None
+        if prediction_cache is not None:
+            eligible_probability = prediction_cache.get(served.engine.version, patient_row)
+        if eligible_probability is None:
+            if coalescer is not None:
+                try:
+                    eligible_probability = coalescer.submit(patient_row, timeout=PREDICT_DEADLINE_MS / 1000,
+                                                             score_fn=served.engine.eligible_probability)
+                except CoalescerTimeout as e:
+                    return error_response(str(e), 503, 'deadline_exceeded')
+            else:
+                eligible_probability = float(served.engine.eligible_probability(np.array([patient_row]))[0])
+            metrics.batch_size.observe(1)
+            if prediction_cache is not None:
+                prediction_cache.put(served.engine.version, patient_row, eligible_probability)
+        probabilities = [1.0 - eligible_probability, eligible_probability]
+        timer.mark('predict_proba')
+        if shadow is not None:
+            shadow.submit(validated.features, np.array([eligible_probability]), validated.valid, [data],
+                          validated.from_code)
         
-        # Scale and predict
-        patient_scaled = scaler.transform(patient_data)
-        prediction = model.predict(patient_scaled)[0]
-        probabilities = model.predict_proba(patient_scaled)[0]
+        patient_info = {
+            'age': int(age),
+            'gender': gender.capitalize(),
+            'icd_frequency': _plain_number(icd_freq),
+            'cpt_frequency': _plain_number(cpt_freq),
+            'month': int(month)
+        }
+        if icd_known is not None:
+            patient_info['icd'] = data['icd']
+            patient_info['icd_known'] = icd_known
+        if cpt_known is not None:
+            patient_info['cpt'] = data['cpt']
+            patient_info['cpt_known'] = cpt_known
         
-        return jsonify({
-            'eligible': bool(prediction == 1),
+        response = jsonify({
+            'eligible': bool(probabilities[1] > 0.5),
             'confidence': float(max(probabilities)),
             'eligible_probability': float(probabilities[1]),
             'not_eligible_probability': float(probabilities[0]),
-            'patient_info': {
-                'age': age,
-                'gender': gender.capitalize(),
-                'icd_frequency': icd_freq,
-                'cpt_frequency': cpt_freq,
-                'month': month
-            }
+            'patient_info': patient_info,
+            'model_version': served.version
         })
+        response.headers['X-Model-Version'] = served.version
+        timer.mark('serialize')
+        return response
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(str(e), 500, type(e).__name__)
 
 @app.route('/predict-batch', methods=['POST'])
 def predict_batch():
@@ -105,65 +353,136 @@ def predict_batch():
     {
         "patients": [
             {"age": 45, "gender": "Male", "icd_frequency": 15, "cpt_frequency": 8, "month": 6},
-            {"age": 55, "gender": "Female", "icd_frequency": 25, "cpt_frequency": 15, "month": 3}
+            {"age": 55, "gender": "Female", "icd_frequency": 25, "cpt_frequency": 15, "month": 3},
+            {"age": 38, "gender": "Female", "icd": "M51.17", "cpt": "72100", "month": 2}
         ]
     }
+    
+    The response format follows ?format= or the Accept header (see
+    response_formats.py): json rows (default), columnar JSON arrays, or an
+    Arrow IPC stream.
     """
+    metrics.requests.inc('/predict-batch')
+    timer = metrics.timer(profiler.stages())
+    try:
+        response_format = response_formats.negotiate(request.accept_mimetypes, request.args.get('format'))
+    except UnsupportedFormat as e:
+        return error_response(str(e), 406, 'unsupported_format')
     try:
         data = request.json
+        timer.mark('parse')
         
         if 'patients' not in data:
-            return jsonify({'error': 'Missing patients array'}), 400
-        
-        patients = data['patients']
-        results = []
+            return error_response('Missing patients array', 400, 'missing_patients')
         
-        for patient in patients:
-            try:
-                age = int(patient['age'])
-                gender = patient['gender'].lower()
-                icd_freq = int(patient['icd_frequency'])
-                cpt_freq = int(patient['cpt_frequency'])
-                month = int(patient['month'])
-                
-                gender_encoded = 1 if gender == 'male' else 0
-                patient_array = np.array([[age, gender_encoded, icd_freq, cpt_freq, month]])
-                
-                patient_scaled = scaler.transform(patient_array)
-                prediction = model.predict(patient_scaled)[0]
-                probabilities = model.predict_proba(patient_scaled)[0]
-                
-                results.append({
-                    'eligible': bool(prediction == 1),
-                    'confidence': float(max(probabilities)),
-                    'eligible_probability': float(probabilities[1])
-                })
-            except Exception as e:
-                results.append({'error': str(e)})
+        served = model_slot.get()
+        scores = score_batch(data['patients'], timer, served)
         
-        return jsonify({'results': results, 'total': len(results)})
+        response = Response(response_formats.encode_batch(scores, response_format),
+                            mimetype=response_formats.BATCH_MIMETYPES[response_format],
+                            headers={'X-Model-Version': served.version})
+        timer.mark('serialize')
+        return response
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(str(e), 500, type(e).__name__)
+
+@app.route('/predict-stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming batch prediction
+    
+    Request body: one patient per line, either NDJSON (default) or CSV with
+    a header row when Content-Type is text/csv:
+    
+        {"age": 45, "gender": "Male", "icd_frequency": 15, "cpt_frequency": 8, "month": 6}
+        {"age": 38, "gender": "Female", "icd": "M51.17", "cpt": "72100", "month": 2}
+    
+    The body is read and scored in chunks (?chunk_size=, default
+    PREDICT_STREAM_CHUNK_SIZE) and each chunk's results are streamed back as
+    NDJSON, one line per input row in input order:
+    
+        {"index": 0, "eligible": true, "confidence": 0.558, "eligible_probability": 0.558}
+        {"index": 1, "error": "Missing field: month", "errors": [{"field": "month", "code": "missing", ...}]}
+    
+    Memory use is bounded by the chunk size, not the request size.
+    ?format=columnar (or the Accept header) streams one columnar JSON object
+    per chunk instead, and ?format=arrow an Arrow IPC stream with one record
+    batch per chunk.
+    """
+    metrics.requests.inc('/predict-stream')
+    try:
+        chunk_size = int(request.args.get('chunk_size', PREDICT_STREAM_CHUNK_SIZE))
+    except ValueError:
+        return error_response('chunk_size must be an integer', 400, 'invalid_chunk_size')
+    if chunk_size < 1:
+        return error_response('chunk_size must be at least 1', 400, 'invalid_chunk_size')
+    try:
+        response_format = response_formats.negotiate(request.accept_mimetypes, request.args.get('format'))
+    except UnsupportedFormat as e:
+        return error_response(str(e), 406, 'unsupported_format')
+    
+    if request.mimetype in ('text/csv', 'application/csv'):
+        patients = iter_csv_patients(request.stream)
+    else:
+        patients = iter_ndjson_patients(request.stream)
+    
+    # The whole stream is scored by one model snapshot
+    served = model_slot.get()
+    
+    def generate():
+        if response_format == response_formats.ARROW:
+            yield response_formats.arrow_stream_start()
+        offset = 0
+        while True:
+            chunk = list(itertools.islice(patients, chunk_size))
+            if not chunk:
+                break
+            yield response_formats.encode_stream_chunk(score_batch(chunk, served=served), response_format, offset)
+            offset += len(chunk)
+        if response_format == response_formats.ARROW:
+            yield response_formats.ARROW_EOS
+    
+    return Response(stream_with_context(generate()), mimetype=response_formats.STREAM_MIMETYPES[response_format],
+                    headers={'X-Model-Version': served.version})
 
 @app.route('/info', methods=['GET'])
 def info():
-    """Get model information"""
-    model_info = pickle.load(open('model_info.pkl', 'rb'))
+    """Get model information (from the model bundle header)"""
+    model_info = model_slot.get().bundle.info()
     
     return jsonify({
         'model_type': model_info['model_type'],
+        'model_version': model_info['model_version'],
+        'schema_version': model_info['schema_version'],
         'features': model_info['features'],
         'coefficients': model_info['coefficients'],
-        'intercept': float(model_info['intercept']),
-        'performance': {
-            'accuracy': float(model_info['accuracy']),
-            'precision': float(model_info['precision']),
-            'recall': float(model_info['recall']),
-            'f1_score': float(model_info['f1_score']),
-            'roc_auc': float(model_info['roc_auc'])
-        }
+        'intercept': model_info['intercept'],
+        'performance': model_info['metrics']
     })
 
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """
+    Reload model.bundle in this process and swap it in if it validates.
+    
+    Requires MODEL_ADMIN_TOKEN, sent as the X-Admin-Token header. Under
+    serve.py each worker process holds its own model: this reloads the worker
+    that handles the request, while the file watch reaches all of them.
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if MODEL_ADMIN_TOKEN is None or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        return error_response('Forbidden', 403, 'forbidden')
+    previous = model_slot.get().version
+    served = model_slot.reload('admin', wait=True)
+    error = model_slot.stats()['last_error']
+    return jsonify({
+        'reloaded': error is None,
+        'previous_version': previous,
+        'model_version': served.version,
+        'error': error
+    }), 200 if error is None else 500
+
 if __name__ == '__main__':
+    worker_init()
     app.run(debug=True, port=5000)
@@ -2,16 +2,19 @@
 Flask REST API for Insurance Eligibility Prediction
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
 import os
 import sys
 from datetime import datetime
 
-# Add parent directory to path
+# Add this directory to path, then the repo root for the shared modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from insurance_predictor import predict_insurance_eligibility
+from insurance_predictor import predict_insurance_eligibility, get_registry, get_prediction_cache, ModelLoadError
+from request_profiling import RequestProfiler
+from service_metrics import ServiceMetrics, PROMETHEUS_CONTENT_TYPE
 
 app = Flask(__name__)
 CORS(app)
@@ -19,6 +22,28 @@ CORS(app)
 # Configuration
 app.config['JSON_SORT_KEYS'] = False
 
+metrics = ServiceMetrics(endpoints=('/api/predict',))
+if get_prediction_cache() is not None:
+    metrics.extra_collectors.append(get_prediction_cache().prometheus_lines)
+
+# Opt-in per-request profiling (REQUEST_PROFILING=1 plus an X-Profile header)
+profiler = RequestProfiler.from_env()
+profiler.install(app)
+
+def error_response(body, status, error_type):
+    """JSON error response, counted in prediction_errors_total"""
+    metrics.errors.inc(error_type)
+    return jsonify(body), status
+
+def warm_up():
+    """Load the model into the registry before workers fork (used by serve.py)"""
+    try:
+        get_registry().get()
+    except FileNotFoundError:
+        print("⚠️  Model files not found; they will be loaded on first request")
+    except ModelLoadError:
+        print("⚠️  Model files could not be loaded; /api/predict fails until they are replaced")
+
 @app.route('/', methods=['GET'])
 def home():
     """Serve the web interface"""
@@ -40,57 +65,80 @@ def predict():
     }
     """
     
+    metrics.requests.inc('/api/predict')
+    timer = metrics.timer(profiler.stages())
     try:
         data = request.get_json()
+        timer.mark('parse')
         
         # Validate required fields
         required_fields = ['age', 'gender', 'icd_frequency', 'cpt_frequency', 'month']
         missing_fields = [field for field in required_fields if field not in data]
         
         if missing_fields:
-            return jsonify({
+            return error_response({
                 'error': f'Missing required fields: {", ".join(missing_fields)}',
                 'status': 'error'
-            }), 400
+            }, 400, 'missing_fields')
+        
+        age = float(data['age'])
+        icd_frequency = int(data['icd_frequency'])
+        cpt_frequency = int(data['cpt_frequency'])
+        month = int(data['month'])
+        timer.mark('validate')
         
         # Get prediction
         result = predict_insurance_eligibility(
-            age=float(data['age']),
+            age=age,
             gender=data['gender'],
-            icd_frequency=int(data['icd_frequency']),
-            cpt_frequency=int(data['cpt_frequency']),
-            month=int(data['month'])
+            icd_frequency=icd_frequency,
+            cpt_frequency=cpt_frequency,
+            month=month,
+            stage_timer=timer
         )
+        metrics.batch_size.observe(1)
         
         if 'error' in result:
-            return jsonify(result), 500
+            return error_response(result, 500, 'model_unavailable')
         
         # Add timestamp
         result['timestamp'] = datetime.now().isoformat()
         result['disease'] = data.get('disease', 'Not specified')
         
-        return jsonify(result), 200
+        response = jsonify(result)
+        timer.mark('serialize')
+        return response, 200
     
     except ValueError as e:
-        return jsonify({
+        return error_response({
             'error': f'Invalid input type: {str(e)}',
             'status': 'error'
-        }), 400
+        }, 400, 'invalid_input_type')
     except Exception as e:
-        return jsonify({
+        return error_response({
             'error': f'Prediction failed: {str(e)}',
             'status': 'error'
-        }), 500
+        }, 500, type(e).__name__)
 
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    response = {
         'status': 'healthy',
         'service': 'Insurance Eligibility Prediction API',
         'version': '1.0.0',
+        'model': get_registry().stats(),
         'timestamp': datetime.now().isoformat()
-    }), 200
+    }
+    if get_prediction_cache() is not None:
+        response['prediction_cache'] = get_prediction_cache().stats()
+    return jsonify(response), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics (stage latencies, batch sizes, errors, model load time)"""
+    metrics.model_load_seconds.set(get_registry().stats()['last_load_seconds'])
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.route('/api/info', methods=['GET'])
 def info():
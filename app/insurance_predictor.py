@@ -2,13 +2,27 @@
 """
 Insurance Eligibility Prediction API
 Save model and scaler for production use
+
+Serving prefers the single-file model bundle (MODEL_BUNDLE_PATH, default
+models/model.bundle), which loads with NumPy alone. Without it the pickles
+at MODEL_PATH/SCALER_PATH are used, which imports sklearn when unpickled.
 """
 
+import os
 import pickle
+import sys
+import threading
+import time
+from typing import NamedTuple
+
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.linear_model import LogisticRegression
+
+# Shared modules live in the repo root (copied alongside this file in Docker)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_bundle import load_bundle
+from prediction_cache import PredictionCache
+from scoring_engine import FusedLogisticScorer
 
 # Note: This script assumes the model has been trained
 # In production, load the trained model and scaler from the Jupyter notebook
@@ -40,7 +54,157 @@ def load_model_artifacts(model_path='models/insurance_model.pkl',
     
     return model, scaler
 
-def predict_insurance_eligibility(age, gender, icd_frequency, cpt_frequency, month):
+class ModelBundle(NamedTuple):
+    """Immutable snapshot of the loaded model artifacts"""
+    engine: FusedLogisticScorer
+    version: str
+    loaded_at: float
+    source: str
+
+class ModelLoadError(RuntimeError):
+    """The model artifacts exist but could not be loaded"""
+
+class ModelRegistry:
+    """
+    Process-wide holder for the scoring engine.
+    
+    The artifacts are loaded once and handed out as an immutable ModelBundle.
+    The model bundle file is used when it exists, otherwise the model and
+    scaler pickles. Every `check_interval` seconds the file mtimes/sizes are
+    re-checked and the bundle is reloaded if an artifact changed on disk.
+    
+    A load that fails (corrupt bundle, bad pickle) is remembered with the
+    files' signature, as in model_slot.ModelSlot: the previous bundle keeps
+    serving, and the same files are not tried again until they change. With
+    no previous bundle, get() raises ModelLoadError.
+    """
+    
+    def __init__(self, model_path='models/insurance_model.pkl',
+                 scaler_path='models/minmax_scaler.pkl', check_interval=1.0,
+                 bundle_path='models/model.bundle'):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.bundle_path = bundle_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._signature = None
+        self._failed_signature = None
+        self._failed_loads = 0
+        self._last_error = None
+        self._next_check = 0.0
+        self._load_count = 0
+        self._last_load_seconds = 0.0
+        self._total_load_seconds = 0.0
+    
+    def _artifact_paths(self):
+        """The files serving is loaded from: the bundle if present, else the pickles"""
+        if self.bundle_path and os.path.exists(self.bundle_path):
+            return (self.bundle_path,)
+        return (self.model_path, self.scaler_path)
+    
+    def _file_signature(self):
+        """Paths plus mtime/size of the artifacts; raises FileNotFoundError if missing"""
+        signature = []
+        for path in self._artifact_paths():
+            stat = os.stat(path)
+            signature.extend((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def _load(self, signature):
+        start = time.perf_counter()
+        try:
+            if signature[0] == self.bundle_path:
+                bundle_file = load_bundle(self.bundle_path)
+                engine, version, source = bundle_file.engine(), bundle_file.version, 'bundle'
+            else:
+                model, scaler = load_model_artifacts(self.model_path, self.scaler_path)
+                engine = FusedLogisticScorer.from_sklearn(model, scaler)
+                version, source = f'{abs(hash(signature)):x}'[:12], 'pickle'
+        except FileNotFoundError:
+            raise  # removed mid-deploy; checked again on the next request
+        except Exception as e:  # keep the previous bundle whatever went wrong
+            self._failed_signature = signature
+            self._failed_loads += 1
+            self._last_error = f"{type(e).__name__}: {e}"
+            serving = self._bundle.version if self._bundle else 'nothing'
+            print(f"⚠️  Model load failed, still serving {serving}: {self._last_error}")
+            return
+        elapsed = time.perf_counter() - start
+        
+        self._bundle = ModelBundle(
+            engine=engine,
+            version=version,
+            loaded_at=time.time(),
+            source=source
+        )
+        self._signature = signature
+        self._failed_signature = None
+        self._last_error = None
+        self._load_count += 1
+        self._last_load_seconds = elapsed
+        self._total_load_seconds += elapsed
+    
+    def get(self):
+        """
+        Return the current ModelBundle, loading or reloading if needed
+        
+        Raises:
+            FileNotFoundError if the artifacts are missing
+            ModelLoadError if they failed to load and no earlier bundle exists
+        """
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() < self._next_check:
+            return bundle
+        
+        with self._lock:
+            if self._bundle is not None and time.monotonic() < self._next_check:
+                return self._bundle
+            signature = self._file_signature()
+            self._next_check = time.monotonic() + self.check_interval
+            if signature != self._signature and signature != self._failed_signature:
+                self._load(signature)
+            if self._bundle is None:
+                raise ModelLoadError(self._last_error)
+            return self._bundle
+    
+    def stats(self):
+        """Load-time and reload statistics"""
+        bundle = self._bundle
+        return {
+            'loaded': bundle is not None,
+            'model_version': bundle.version if bundle else None,
+            'source': bundle.source if bundle else None,
+            'loaded_at': bundle.loaded_at if bundle else None,
+            'load_count': self._load_count,
+            'failed_loads': self._failed_loads,
+            'last_error': self._last_error,
+            'reload_count': max(self._load_count - 1, 0),
+            'last_load_seconds': self._last_load_seconds,
+            'total_load_seconds': self._total_load_seconds
+        }
+
+_registry = ModelRegistry(
+    model_path=os.environ.get('MODEL_PATH', 'models/insurance_model.pkl'),
+    scaler_path=os.environ.get('SCALER_PATH', 'models/minmax_scaler.pkl'),
+    bundle_path=os.environ.get('MODEL_BUNDLE_PATH', 'models/model.bundle')
+)
+
+def get_registry():
+    """Return the process-wide model registry"""
+    return _registry
+
+# Optional LRU cache of predictions, keyed on the registry's model version so
+# a reload invalidates it. Enabled by setting PREDICTION_CACHE_SIZE (e.g. 10000).
+_prediction_cache = None
+if int(os.environ.get('PREDICTION_CACHE_SIZE', 0)) > 0:
+    _prediction_cache = PredictionCache(maxsize=int(os.environ['PREDICTION_CACHE_SIZE']))
+
+def get_prediction_cache():
+    """Return the process-wide prediction cache, or None when disabled"""
+    return _prediction_cache
+
+def predict_insurance_eligibility(age, gender, icd_frequency, cpt_frequency, month, stage_timer=None):
     """
     Predict insurance eligibility for a patient
     
@@ -50,27 +214,43 @@ def predict_insurance_eligibility(age, gender, icd_frequency, cpt_frequency, mon
         icd_frequency (int): Frequency of ICD code (1-683)
         cpt_frequency (int): Frequency of CPT code (1-1815)
         month (int): Month of approval (1-6)
+        stage_timer: Optional service_metrics.StageTimer; encode and
+            predict_proba stages are marked on it (scaling is fused into
+            the engine, so there is no separate transform stage)
     
     Returns:
         dict: Prediction result with eligibility status and confidence
     """
     
     try:
-        # Load model and scaler
-        model, scaler = load_model_artifacts()
+        # Get cached scoring engine
+        bundle = get_registry().get()
         
         # Encode gender
         gender_encoded = 1 if gender.lower() == 'male' else 0
         
         # Create feature array
-        features = np.array([[age, gender_encoded, icd_frequency, cpt_frequency, month]])
+        row = (age, gender_encoded, icd_frequency, cpt_frequency, month)
+        features = np.array([row])
+        if stage_timer is not None:
+            stage_timer.mark('encode')
+        
+        # Repeated rows are answered from the cache without touching the model
+        eligible_probability = None
+        if _prediction_cache is not None:
+            eligible_probability = _prediction_cache.get(bundle.version, row)
         
-        # Scale features
-        features_scaled = scaler.transform(features)
+        if eligible_probability is None:
+            # Scaling is folded into the engine's coefficients
+            eligible_probability = float(bundle.engine.eligible_probability(features)[0])
+            if _prediction_cache is not None:
+                _prediction_cache.put(bundle.version, row, eligible_probability)
         
-        # Get prediction
-        prediction = model.predict(features_scaled)[0]
-        probability = model.predict_proba(features_scaled)[0]
+        # Get prediction (decision taken from the probabilities)
+        probability = [1.0 - eligible_probability, eligible_probability]
+        prediction = int(probability[1] > 0.5)
+        if stage_timer is not None:
+            stage_timer.mark('predict_proba')
         
         result = {
             'eligible': bool(prediction),
@@ -94,6 +274,11 @@ def predict_insurance_eligibility(age, gender, icd_frequency, cpt_frequency, mon
             'error': 'Model files not found. Please train and save the model first.',
             'status': 'error'
         }
+    except ModelLoadError as e:
+        return {
+            'error': f'Model files could not be loaded: {e}',
+            'status': 'error'
+        }
 
 if __name__ == '__main__':
     # Example usage
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark: legacy export_model.py preprocessing vs feature_pipeline.
+
+Replicates the bundled claims CSV to --rows rows (default 10M) in a temp
+file, then times both pipelines from read_csv to the final X/y and checks
+that they produced the same X and y. A difference fails the run.
+
+Usage:
+    python benchmarks/bench_feature_pipeline.py
+    python benchmarks/bench_feature_pipeline.py --rows 2000000 --skip-legacy
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_model import DEFAULT_DATA_PATH  # noqa: E402
+from feature_pipeline import FEATURES, load_claims, build_training_frame  # noqa: E402
+
+
+def legacy_prepare(file_path):
+    """The original export_model.py preprocessing, unchanged in substance."""
+    df = pd.read_csv(file_path)
+
+    def extract_age(age_str):
+        try:
+            if pd.isna(age_str):
+                return np.nan
+            years = int(str(age_str).split(':')[0].strip().replace('Y', '').strip())
+            months = int(str(age_str).split(':')[1].strip().replace('M', '').strip())
+            return years + (months / 12)
+        except:  # noqa: E722
+            return np.nan
+
+    df['Age_Years'] = df['Age'].apply(extract_age)
+    df = df.dropna(subset=['Age_Years'])
+    df = df.drop_duplicates()
+
+    df['Gender_Encoded'] = df['Gender'].map({'Male': 1, 'Female': 0})
+
+    icd_category_counts = df.groupby('ICD').size().reset_index(name='ICD_Frequency')
+    df = df.merge(icd_category_counts, on='ICD', how='left')
+    cpt_category_counts = df.groupby('CPT').size().reset_index(name='CPT_Frequency')
+    df = df.merge(cpt_category_counts, on='CPT', how='left')
+
+    df['ApprovedDate'] = pd.to_datetime(df['ApprovedDate'], format='%m/%d/%y', errors='coerce')
+    df['Month_of_Approval'] = df['ApprovedDate'].dt.month
+    df['Month_of_Approval'] = df['Month_of_Approval'].fillna(df['Month_of_Approval'].median())
+    df['Insurance_Eligible'] = (df['Insurance'].str.strip() == 'Yes').astype(int)
+
+    for column in ['Age_Years', 'ICD_Frequency', 'CPT_Frequency']:
+        df[column] = df[column].fillna(df[column].median())
+
+    X = df[FEATURES]
+    y = df['Insurance_Eligible']
+    valid = ~X.isna().any(axis=1)
+    return X[valid], y[valid]
+
+
+def vectorized_prepare(file_path):
+    X, y, _, _ = build_training_frame(load_claims(file_path))
+    return X, y
+
+
+def output_differences(legacy, vectorized):
+    """Differing cells per column between two (X, y) results; empty if identical."""
+    (X_legacy, y_legacy), (X, y) = legacy, vectorized
+    if X_legacy.shape != X.shape:
+        return {'shape': f"{X_legacy.shape} vs {X.shape}"}
+    differences = {
+        column: int((X_legacy[column].to_numpy(dtype=np.float64) != X[column].to_numpy(dtype=np.float64)).sum())
+        for column in FEATURES
+    }
+    differences[y.name] = int((y_legacy.to_numpy() != y.to_numpy()).sum())
+    return {column: n for column, n in differences.items() if n}
+
+
+def replicate_csv(source, target, rows):
+    """Write `rows` data rows by repeating the body of `source`."""
+    with open(source) as f:
+        header = f.readline()
+        body = [line if line.endswith('\n') else line + '\n' for line in f]
+    with open(target, 'w') as out:
+        out.write(header)
+        written = 0
+        while written < rows:
+            take = body[:rows - written]
+            out.writelines(take)
+            written += len(take)
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the vectorized pipeline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'claims.csv')
+        print(f"Replicating bundled CSV to {args.rows:,} rows...")
+        replicate_csv(DEFAULT_DATA_PATH, path, args.rows)
+        print(f"  {os.path.getsize(path) / 1e9:.2f} GB")
+
+        vectorized_seconds, vectorized = time_call(vectorized_prepare, path)
+        print(f"feature_pipeline:  {vectorized_seconds:8.2f}s  ({args.rows / vectorized_seconds:,.0f} rows/sec, {len(vectorized[0]):,} rows out)")
+
+        if not args.skip_legacy:
+            legacy_seconds, legacy = time_call(legacy_prepare, path)
+            print(f"legacy:            {legacy_seconds:8.2f}s  ({args.rows / legacy_seconds:,.0f} rows/sec, {len(legacy[0]):,} rows out)")
+            print(f"speedup:           {legacy_seconds / vectorized_seconds:8.1f}x")
+
+            differences = output_differences(legacy, vectorized)
+            if differences:
+                print(f"❌ Outputs differ (cells per column): {differences}")
+                sys.exit(1)
+            print("✅ Outputs identical")
+
+
+if __name__ == '__main__':
+    main()
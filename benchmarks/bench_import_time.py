@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start import time of the serving modules.
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+repeated --repeats times. The script reports the median wall time, the
+module's own cumulative import time, and the slowest imports it pulled in.
+It fails (exit status 1) if a serving module imports any of the training-only
+packages (sklearn, pandas, scipy).
+
+tests/test_import_time.py runs the same imports under pytest and also holds
+them to an import-time budget.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeats 10 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_DIR, 'app')
+
+# Packages that serving must not import (training and export only)
+FORBIDDEN = ('sklearn', 'pandas', 'scipy')
+
+# name -> (python statement, working directory)
+SERVING_IMPORTS = {
+    'api': ('import api', REPO_DIR),
+    'predictor (from_bundle)': (
+        'import predictor; predictor.InsuranceEligibilityPredictor.from_bundle()', REPO_DIR),
+    'model_bundle (load)': (
+        'import model_bundle; model_bundle.load_bundle().engine()', REPO_DIR),
+    'app/insurance_predictor (first prediction)': (
+        f'import sys; sys.path.insert(0, {APP_DIR!r}); import insurance_predictor as p; '
+        f'p.get_registry().get()', REPO_DIR),
+}
+
+
+def import_env():
+    env = dict(os.environ)
+    # The app service reads models/ by default; point it at the repo's bundle
+    env['MODEL_BUNDLE_PATH'] = os.path.join(REPO_DIR, 'model.bundle')
+    return env
+
+
+def run_import(statement, cwd):
+    """
+    Run one statement in a fresh interpreter with -X importtime.
+
+    Returns:
+        (wall seconds, {module: cumulative microseconds})
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=cwd, env=import_env(), capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{completed.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, module = line.split('|')
+        cumulative[module.strip()] = int(cumulative_us)
+    return elapsed, cumulative
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time benchmark for the serving modules')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='Slowest top-level imports to list')
+    args = parser.parse_args(argv)
+
+    failures = []
+    for name, (statement, cwd) in SERVING_IMPORTS.items():
+        walls = []
+        for _ in range(args.repeats):
+            wall, cumulative = run_import(statement, cwd)
+            walls.append(wall)
+
+        top_level = {module: us for module, us in cumulative.items() if '.' not in module}
+        forbidden = sorted(m for m in top_level if m in FORBIDDEN)
+        print(f"\n{name}: {statistics.median(walls) * 1000:.1f} ms wall (median of {args.repeats}), "
+              f"{len(cumulative)} modules imported")
+        for module, us in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"   {us / 1000:8.1f} ms  {module}")
+        if forbidden:
+            failures.append((name, forbidden))
+            print(f"   ✗ imports training-only packages: {', '.join(forbidden)}")
+        else:
+            print(f"   ✓ no {'/'.join(FORBIDDEN)}")
+
+    if failures:
+        print(f"\n✗ {len(failures)} serving module(s) import training-only packages")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ParallelScorer scaling from 1 to N worker processes.
+
+Scores a random --rows x 5 feature matrix with the in-process engine, then
+with ParallelScorer at each worker count. The pool is started and warmed
+before timing, as it would be for a long-running nightly job. Results are
+checked against the in-process scores.
+
+Usage:
+    python benchmarks/bench_parallel.py
+    python benchmarks/bench_parallel.py --rows 20000000 --workers 1,2,4,8 --chunk-size 500000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_scoring import DEFAULT_CHUNK_SIZE, ParallelScorer  # noqa: E402
+from predictor import InsuranceEligibilityPredictor  # noqa: E402
+
+
+def time_call(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='ParallelScorer scaling benchmark')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, cores, 2 * cores})),
+                        help='Comma-separated worker counts (default: 1,2,cores,2*cores)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    predictor = InsuranceEligibilityPredictor.from_bundle()
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(1, 120, args.rows), rng.integers(0, 2, args.rows),
+        rng.integers(1, 684, args.rows), rng.integers(1, 1816, args.rows), rng.integers(1, 7, args.rows)
+    ]).astype(np.float64)
+    expected = predictor.engine.eligible_probability(X)
+
+    print(f"{args.rows:,} rows, chunk size {args.chunk_size:,}, {cores} core(s) available\n")
+    single = time_call(lambda: predictor.engine.eligible_probability(X), args.repeats)
+    print(f"{'in-process engine':<20} {single:8.3f} s {args.rows / single:14,.0f} rows/s")
+
+    for n_workers in [int(n) for n in args.workers.split(',')]:
+        with ParallelScorer.from_predictor(predictor, n_workers=n_workers, chunk_size=args.chunk_size) as scorer:
+            result = scorer.eligible_probability(X)  # starts and warms the pool
+            max_diff = float(np.abs(result - expected).max())
+            seconds = time_call(lambda: scorer.eligible_probability(X), args.repeats)
+            shared_X = scorer.input_buffer(*X.shape)
+            shared_X[:] = X
+            zero_copy = time_call(lambda: scorer.eligible_probability(shared_X), args.repeats)
+            del shared_X
+        print(f"{f'{n_workers} worker(s)':<20} {seconds:8.3f} s {args.rows / seconds:14,.0f} rows/s "
+              f"{single / seconds:6.2f}x   zero-copy {zero_copy:6.3f} s {single / zero_copy:5.2f}x   "
+              f"max |diff| {max_diff:.1e}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: payload size and serialization time of the batch response formats.
+
+For each batch size, scores random patients once and then times only the
+encoding of the response body:
+
+    json (stdlib)   the original path: row dicts through json.dumps
+    json            row dicts through response_formats.dumps (orjson if installed)
+    columnar        parallel arrays (response_formats.columnar)
+    arrow           Arrow IPC stream (needs pyarrow)
+
+A --invalid fraction of the rows fails validation, so the error paths are
+included. --end-to-end also times POST /predict-batch per format through the
+Flask test client (request parsing and validation included).
+
+Usage:
+    python benchmarks/bench_response_formats.py
+    python benchmarks/bench_response_formats.py --sizes 1000,100000 --invalid 0.05 --end-to-end
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)  # api.py loads its artifacts relative to the working directory
+
+import api  # noqa: E402
+import response_formats  # noqa: E402
+from response_formats import ARROW, COLUMNAR, JSON  # noqa: E402
+
+
+def make_patients(n, invalid=0.0, seed=0):
+    """n random patients in api.py's wire format; a fraction has an out-of-range age."""
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(1, 121, n)
+    ages[rng.random(n) < invalid] = 150
+    genders = rng.choice(['Male', 'Female'], n).tolist()
+    icd = rng.integers(1, 684, n).tolist()
+    cpt = rng.integers(1, 1816, n).tolist()
+    months = rng.integers(1, 7, n).tolist()
+    return [
+        {'age': a, 'gender': g, 'icd_frequency': i, 'cpt_frequency': c, 'month': m}
+        for a, g, i, c, m in zip(ages.tolist(), genders, icd, cpt, months)
+    ]
+
+
+def stdlib_rows(scores):
+    """The pre-negotiation /predict-batch body: row dicts through the stdlib encoder."""
+    return json.dumps({'results': response_formats.rows(scores), 'total': len(scores.probability)}).encode()
+
+
+def encoders():
+    found = {
+        'json (stdlib)': stdlib_rows,
+        'json': lambda scores: response_formats.encode_batch(scores, JSON),
+        'columnar': lambda scores: response_formats.encode_batch(scores, COLUMNAR),
+    }
+    try:
+        import pyarrow  # noqa: F401
+        found['arrow'] = lambda scores: response_formats.encode_batch(scores, ARROW)
+    except ImportError:
+        print("⚠️  pyarrow is not installed; skipping the arrow format")
+    return found
+
+
+def time_call(func, repeats):
+    func()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def repeats_for(n):
+    return max(3, min(200, 200_000 // max(n, 1)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Payload size and encoding time per response format')
+    parser.add_argument('--sizes', default='100,10000,100000', help='Comma-separated batch sizes')
+    parser.add_argument('--invalid', type=float, default=0.01, help='Fraction of rows that fail validation')
+    parser.add_argument('--end-to-end', action='store_true', help='Also time POST /predict-batch per format')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    formats = encoders()
+    print(f"📦 orjson: {'yes' if response_formats.orjson is not None else 'no (stdlib json)'}, "
+          f"invalid rows: {args.invalid:.0%}")
+
+    for n in sizes:
+        patients = make_patients(n, args.invalid)
+        scores = api.score_batch(patients)
+        repeats = repeats_for(n)
+        print(f"\n📊 {n:,} rows")
+        print(f"   {'format':<14} {'bytes':>12} {'bytes/row':>10} {'encode':>11} {'rows/s':>14} {'vs stdlib':>10}")
+        reference = None
+        for name, encode in formats.items():
+            size = len(encode(scores))
+            seconds = time_call(lambda: encode(scores), repeats)
+            reference = reference or seconds
+            print(f"   {name:<14} {size:>12,} {size / n:>10.1f} {seconds * 1e3:>9.2f}ms "
+                  f"{n / seconds:>14,.0f} {reference / seconds:>9.1f}x")
+
+        if args.end_to_end:
+            client = api.app.test_client()
+            body = json.dumps({'patients': patients})
+            for name in [JSON, COLUMNAR, ARROW]:
+                if name == ARROW and 'arrow' not in formats:
+                    continue
+                seconds = time_call(lambda: client.post(f'/predict-batch?format={name}', data=body,
+                                                        content_type='application/json'), max(3, repeats // 4))
+                print(f"   POST ?format={name:<9} {seconds * 1e3:>9.2f}ms {n / seconds:>14,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
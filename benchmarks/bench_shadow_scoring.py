@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: primary response time with shadow scoring off vs on.
+
+Writes a candidate bundle (the served model with its coefficients scaled by
+--candidate-scale) to a temp dir, imports api.py with SHADOW_BUNDLE_PATH
+pointing at it, then times each endpoint with the shadow scorer detached and
+attached, alternating in --rounds rounds so machine noise hits both sides
+alike. Shadow work left over from an "on" round is drained before the next
+"off" round starts.
+
+Exits with status 1 if any case's median with shadowing is more than
+--threshold slower than without. Also prints the shadow comparison
+(agreement, deltas, candidate latency, drops).
+
+Usage:
+    python benchmarks/bench_shadow_scoring.py
+    python benchmarks/bench_shadow_scoring.py --rounds 30 --threshold 0.05
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+os.chdir(REPO_DIR)  # api.py loads its artifacts relative to the working directory
+
+from model_bundle import load_bundle, write_bundle  # noqa: E402
+from run_benchmarks import make_patients, to_api_patient  # noqa: E402
+
+
+def write_candidate(path, scale):
+    """The served bundle with its coefficients multiplied by `scale`."""
+    bundle = load_bundle(os.environ.get('MODEL_BUNDLE_PATH', 'model.bundle'))
+    arrays = {name: np.array(array) for name, array in bundle.arrays.items()}
+    arrays['coef'] = arrays['coef'] * scale
+    header = {key: value for key, value in bundle.header.items()
+              if key not in ('arrays', 'data_sha256', 'header_sha256', 'schema_version')}
+    write_bundle(path, arrays, header)
+
+
+def cases(client):
+    single = to_api_patient(make_patients(1)[0])
+    batches = {n: json.dumps({'patients': [to_api_patient(p) for p in make_patients(n)]}) for n in (100, 10_000)}
+    return {
+        '/predict': (lambda: client.post('/predict', json=single), 2000),
+        '/predict-batch[100]': (lambda: client.post('/predict-batch', data=batches[100],
+                                                    content_type='application/json'), 300),
+        '/predict-batch[10k]': (lambda: client.post('/predict-batch', data=batches[10_000],
+                                                    content_type='application/json'), 10),
+    }
+
+
+def time_calls(func, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[min(int(len(timings) * 0.99), len(timings) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Primary latency with and without shadow scoring')
+    parser.add_argument('--rounds', type=int, default=15)
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed median slowdown with shadowing (default: 0.10 = 10%%)')
+    parser.add_argument('--candidate-scale', type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        candidate_path = os.path.join(tmp, 'candidate.bundle')
+        write_candidate(candidate_path, args.candidate_scale)
+        os.environ['SHADOW_BUNDLE_PATH'] = candidate_path
+        import api
+
+        shadow = api.shadow
+        client = api.app.test_client()
+        timings = {}
+        for name, (func, calls) in cases(client).items():
+            for _ in range(max(calls // 10, 3)):
+                func()  # warm-up, both paths
+            api.shadow = None
+            func()
+            shadow.wait_idle()
+            for _ in range(args.rounds):
+                for mode, scorer in (('off', None), ('on', shadow)):
+                    api.shadow = scorer
+                    timings.setdefault((name, mode), []).append(time_calls(func, calls))
+                    shadow.wait_idle()
+            api.shadow = shadow
+
+    print(f"{'case':<22} {'off p50':>11} {'on p50':>11} {'change':>8} {'off p99':>11} {'on p99':>11}")
+    failed = []
+    for name in dict.fromkeys(name for name, _ in timings):
+        off_p50 = statistics.median(t[0] for t in timings[(name, 'off')])
+        on_p50 = statistics.median(t[0] for t in timings[(name, 'on')])
+        off_p99 = statistics.median(t[1] for t in timings[(name, 'off')])
+        on_p99 = statistics.median(t[1] for t in timings[(name, 'on')])
+        change = on_p50 / off_p50 - 1
+        mark = ''
+        if change > args.threshold:
+            failed.append(name)
+            mark = ' ✗'
+        print(f"{name:<22} {off_p50 * 1e3:>9.3f}ms {on_p50 * 1e3:>9.3f}ms {change * 100:>+7.1f}% "
+              f"{off_p99 * 1e3:>9.3f}ms {on_p99 * 1e3:>9.3f}ms{mark}")
+
+    stats = shadow.stats()
+    print(f"\n🔍 Shadow: {stats['rows_compared']:,} rows compared, agreement {stats['agreement_rate']:.2%}, "
+          f"mean |delta| {stats['mean_abs_delta']:.4f}, max |delta| {stats['max_abs_delta']:.4f}")
+    print(f"   candidate p50 {stats['candidate_p50_ms']:.3f}ms, p99 {stats['candidate_p99_ms']:.3f}ms; "
+          f"{stats['requests_scored']:,} requests scored, {stats['requests_dropped']:,} dropped, "
+          f"{stats['requests_failed']:,} failed")
+
+    if failed:
+        print(f"\n✗ Shadowing slowed {', '.join(failed)} beyond {args.threshold:.0%}")
+        return 1
+    print(f"\n✓ Primary median within {args.threshold:.0%} with shadowing on")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
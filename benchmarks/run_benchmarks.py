@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for every inference and training path.
+
+Each case is timed over several repeats and the median seconds per call is
+compared with the stored baseline (benchmarks/baseline.json). A case whose
+median is more than --threshold slower than its baseline is a regression and
+makes the run exit with status 1. A case more than --threshold *faster* is
+reported as a stale baseline: the gate only catches regressions measured
+against the current speed, so a change that speeds a case up should re-record
+it (--save-baseline --only <case>) in the same commit.
+
+Usage:
+    python benchmarks/run_benchmarks.py                  # compare with baseline
+    python benchmarks/run_benchmarks.py --quick          # skip the 1M-row cases
+    python benchmarks/run_benchmarks.py --only api       # cases whose name contains "api"
+    python benchmarks/run_benchmarks.py --save-baseline  # record new baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_DIR, 'benchmarks', 'baseline.json')
+WARMUP_SECONDS = 1.0
+
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)  # api.py loads its pickles relative to the working directory
+warnings.filterwarnings('ignore')
+
+
+def make_patients(n, seed=0):
+    """n random in-range patients in predictor.py's input format."""
+    rng = np.random.default_rng(seed)
+    ages = rng.uniform(1, 120, n).round(1).tolist()
+    genders = rng.choice(['Male', 'Female'], n).tolist()
+    icd = rng.integers(1, 684, n).tolist()
+    cpt = rng.integers(1, 1816, n).tolist()
+    months = rng.integers(1, 7, n).tolist()
+    return [
+        {'age': a, 'gender': g, 'icd_freq': i, 'cpt_freq': c, 'month': m}
+        for a, g, i, c, m in zip(ages, genders, icd, cpt, months)
+    ]
+
+
+def to_api_patient(patient):
+    return {
+        'age': patient['age'], 'gender': patient['gender'],
+        'icd_frequency': patient['icd_freq'], 'cpt_frequency': patient['cpt_freq'],
+        'month': patient['month']
+    }
+
+
+# Each case factory returns (callable, rows_per_call). Factories do their
+# setup (model loading, payload building) outside the timed region.
+
+def case_predictor_predict():
+    from predictor import InsuranceEligibilityPredictor
+    predictor = InsuranceEligibilityPredictor()
+    return lambda: predictor.predict(age=45, gender='Male', icd_freq=15, cpt_freq=8, month=6), 1
+
+
+def case_predictor_batch(n):
+    def factory():
+        from predictor import InsuranceEligibilityPredictor
+        predictor = InsuranceEligibilityPredictor()
+        patients = make_patients(n)
+        return lambda: predictor.predict_batch(patients), n
+    return factory
+
+
+def case_api_predict():
+    import api
+    client = api.app.test_client()
+    payload = {'age': 45, 'gender': 'Male', 'icd_frequency': 15, 'cpt_frequency': 8, 'month': 6}
+    return lambda: client.post('/predict', json=payload), 1
+
+
+def case_api_predict_batch(n, response_format=None):
+    def factory():
+        import api
+        client = api.app.test_client()
+        body = json.dumps({'patients': [to_api_patient(p) for p in make_patients(n)]})
+        url = f'/predict-batch?format={response_format}' if response_format else '/predict-batch'
+        return lambda: client.post(url, data=body, content_type='application/json'), n
+    return factory
+
+
+def case_app_predict():
+    os.environ.setdefault('MODEL_PATH', os.path.join(REPO_DIR, 'model.pkl'))
+    os.environ.setdefault('SCALER_PATH', os.path.join(REPO_DIR, 'scaler.pkl'))
+    sys.path.insert(0, os.path.join(REPO_DIR, 'app'))
+    from insurance_predictor import predict_insurance_eligibility
+    return lambda: predict_insurance_eligibility(45.5, 'Male', 15, 8, 6), 1
+
+
+def case_export_preprocess():
+    from export_model import prepare_training_data
+    X, _, _, _ = prepare_training_data(use_cache=False)
+    return lambda: prepare_training_data(use_cache=False), len(X)
+
+
+def case_export_preprocess_cached():
+    """Hashing the CSV + memory-mapping the cached matrix (cache in a temp dir)."""
+    import tempfile
+    from export_model import DEFAULT_DATA_PATH
+    from feature_cache import load_training_data
+    cache_dir = tempfile.mkdtemp(prefix='feature_cache_')
+    X, _, _, _ = load_training_data(DEFAULT_DATA_PATH, cache_dir=cache_dir)  # fills the cache
+    return lambda: load_training_data(DEFAULT_DATA_PATH, cache_dir=cache_dir), len(X)
+
+
+def case_export_train():
+    from export_model import prepare_training_data, train_model
+    X, y, _, _ = prepare_training_data(use_cache=False)
+    return lambda: train_model(X, y), len(X)
+
+
+def case_import(statement):
+    """Cold start: run `statement` in a fresh interpreter (see bench_import_time.py)."""
+    def factory():
+        env = dict(os.environ, MODEL_BUNDLE_PATH=os.path.join(REPO_DIR, 'model.bundle'))
+        command = [sys.executable, '-c', statement]
+        return lambda: subprocess.run(command, cwd=REPO_DIR, env=env, check=True), 1
+    return factory
+
+
+# name -> (factory, repeats, heavy)
+CASES = {
+    'predictor.predict': (case_predictor_predict, 2000, False),
+    'predictor.predict_batch[1]': (case_predictor_batch(1), 2000, False),
+    'predictor.predict_batch[100]': (case_predictor_batch(100), 300, False),
+    'predictor.predict_batch[10k]': (case_predictor_batch(10_000), 10, False),
+    'predictor.predict_batch[1M]': (case_predictor_batch(1_000_000), 3, True),
+    'api./predict': (case_api_predict, 1000, False),
+    'api./predict-batch[1]': (case_api_predict_batch(1), 1000, False),
+    'api./predict-batch[100]': (case_api_predict_batch(100), 100, False),
+    'api./predict-batch[10k]': (case_api_predict_batch(10_000), 5, False),
+    'api./predict-batch[10k,columnar]': (case_api_predict_batch(10_000, 'columnar'), 5, False),
+    'api./predict-batch[10k,arrow]': (case_api_predict_batch(10_000, 'arrow'), 5, False),
+    'api./predict-batch[1M]': (case_api_predict_batch(1_000_000), 1, True),
+    'app.predict_insurance_eligibility': (case_app_predict, 1000, False),
+    'import.api': (case_import('import api'), 10, False),
+    'import.app.insurance_predictor': (case_import(
+        "import sys; sys.path.insert(0, 'app'); import insurance_predictor as p; p.get_registry().get()"), 10, False),
+    'export_model.preprocess': (case_export_preprocess, 5, False),
+    'export_model.preprocess[cached]': (case_export_preprocess_cached, 50, False),
+    'export_model.train': (case_export_train, 5, False),
+}
+
+
+def run_case(factory, repeats):
+    func, rows = factory()
+    # Warm up for a fixed time, not a fixed count: a single call leaves
+    # microsecond cases timed on a cold (down-clocked) CPU, which made their
+    # numbers depend on which cases ran before them
+    deadline = time.perf_counter() + WARMUP_SECONDS
+    func()
+    while time.perf_counter() < deadline:
+        func()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        'median_seconds': median,
+        'p99_seconds': timings[min(int(len(timings) * 0.99), len(timings) - 1)],
+        'rows_per_second': rows / median if median > 0 else float('inf'),
+        'repeats': repeats,
+    }
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.2f} s "
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='Skip the 1M-row cases')
+    parser.add_argument('--only', help='Run only cases whose name contains this string')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown vs baseline before failing (default: 0.25 = 25%%)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--json', help='Also write results to this file')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results', {})
+
+    results = {}
+    regressions = []
+    stale = []
+    print(f"{'case':<36} {'median':>11} {'p99':>11} {'rows/sec':>14} {'vs baseline':>12}")
+    for name, (factory, repeats, heavy) in CASES.items():
+        if args.quick and heavy:
+            continue
+        if args.only and args.only not in name:
+            continue
+        result = run_case(factory, repeats)
+        results[name] = result
+
+        change = ''
+        if name in baseline:
+            ratio = result['median_seconds'] / baseline[name]['median_seconds']
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio > 1 + args.threshold:
+                regressions.append((name, ratio))
+                change += ' ✗'
+            elif ratio < 1 / (1 + args.threshold):
+                stale.append((name, ratio))
+                change += ' ↓'
+        print(f"{name:<36} {format_seconds(result['median_seconds'])} {format_seconds(result['p99_seconds'])} "
+              f"{result['rows_per_second']:14,.0f} {change:>12}", flush=True)
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        report['results'] = merged
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n✓ Baseline written to {args.baseline}")
+        return 0
+
+    if stale:
+        print(f"\n⚠️  {len(stale)} case(s) faster than baseline by more than {args.threshold:.0%}; "
+              f"re-record with --save-baseline:")
+        for name, ratio in stale:
+            print(f"   {name}: {ratio:.2f}x baseline")
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for name, ratio in regressions:
+            print(f"   {name}: {ratio:.2f}x baseline")
+        return 1
+    if baseline:
+        print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+In-memory ICD/CPT frequency index.
+
+The original frequency tables (icd_mapping.pkl, cpt_mapping.pkl) are keyed
+by the raw codes as they appeared in the claims file, so ICD keys carry
+trailing padding ("A09       ") and CPT keys are floats (70100.0).
+CodeFrequencyIndex normalizes those keys once at startup so that callers can
+send codes as they write them ("a09", "70100", 70100). Training
+(feature_pipeline.build_training_frame) still counts per raw code, as the
+shipped model was trained, so the index merges the raw keys when it is built.
+
+Usage:
+    icd_index = CodeFrequencyIndex.from_pickle('icd_mapping.pkl')
+    icd_index.lookup(' a09 ')   # -> 53
+"""
+
+import pickle
+import re
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+_INTEGRAL_DECIMAL = re.compile(r'^(\d+)\.0+$')
+
+
+def normalize_code(code):
+    """
+    Canonical form of an ICD/CPT code: no whitespace, upper case, and
+    integral numbers without a decimal part (70100.0 / "70100.0" -> "70100").
+
+    Returns None for missing codes (None, NaN, blank strings).
+    """
+    if code is None:
+        return None
+    if isinstance(code, float):
+        if code != code:
+            return None
+        if code.is_integer():
+            return str(int(code))
+    code = _WHITESPACE.sub('', str(code)).upper()
+    if not code:
+        return None
+    return _INTEGRAL_DECIMAL.sub(r'\1', code)
+
+
+def normalize_codes(codes):
+    """
+    Vectorized normalize_code() for a pandas Series of raw codes.
+
+    Categorical columns are normalized per category rather than per row, and
+    the result keeps the categorical dtype (categories that normalize to the
+    same code are merged).
+    """
+    import pandas as pd
+
+    if isinstance(codes.dtype, pd.CategoricalDtype):
+        normalized = normalize_codes(pd.Series(codes.cat.categories))
+        merged_ids, merged_categories = pd.factorize(normalized)
+        row_codes = codes.cat.codes.to_numpy()
+        new_codes = np.where(row_codes >= 0, merged_ids[row_codes], -1)
+        return pd.Series(
+            pd.Categorical.from_codes(new_codes, categories=merged_categories),
+            index=codes.index, name=codes.name
+        )
+
+    if pd.api.types.is_float_dtype(codes.dtype):
+        codes = codes.map(normalize_code, na_action='ignore')
+    normalized = (
+        codes.astype('string')
+        .str.replace(_WHITESPACE.pattern, '', regex=True)
+        .str.upper()
+        .str.replace(_INTEGRAL_DECIMAL.pattern, r'\1', regex=True)
+    )
+    return normalized.mask(normalized == '')
+
+
+def frequency_fallback(mapping):
+    """
+    Frequency used for codes missing from a frequency table.
+
+    Training fills missing ICD/CPT frequencies with the median over rows, and
+    a code with frequency f accounts for f training rows, so this is the
+    frequency-weighted median of the table.
+    """
+    counts = np.fromiter(mapping.values(), dtype=np.float64, count=len(mapping))
+    return float(np.median(np.repeat(counts, counts.astype(np.int64))))
+
+
+class CodeFrequencyIndex:
+    """
+    Code -> frequency lookup with normalized keys.
+
+    Raw keys that normalize to the same code (e.g. "A09" and "A09       ")
+    are merged and their frequencies summed. Codes not in the table resolve to
+    `fallback` (by default the frequency-weighted median, the same value
+    training imputes for missing frequencies).
+    """
+
+    def __init__(self, mapping, fallback=None):
+        """
+        Args:
+            mapping: Raw code -> frequency table
+            fallback: Frequency for unseen codes (default: weighted median)
+        """
+        table = {}
+        for code, frequency in mapping.items():
+            key = normalize_code(code)
+            if key is not None:
+                table[key] = table.get(key, 0) + int(frequency)
+        self.table = table
+
+        # Raw keys point at the merged frequency too, so callers that send
+        # codes exactly as they appear in the table skip normalization.
+        self._lookup = dict(table)
+        for code in mapping:
+            key = normalize_code(code)
+            if key is not None:
+                self._lookup.setdefault(code, table[key])
+
+        self.fallback = frequency_fallback(mapping) if fallback is None else float(fallback)
+
+    @classmethod
+    def from_pickle(cls, path, fallback=None):
+        """Build the index from a pickled code -> frequency dict."""
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f), fallback=fallback)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, code):
+        return code in self._lookup or normalize_code(code) in self.table
+
+    def lookup(self, code):
+        """Frequency for a single code (fallback if unseen or missing)."""
+        frequency = self._lookup.get(code)
+        if frequency is None:
+            frequency = self.table.get(normalize_code(code), self.fallback)
+        return frequency
+
+    def lookup_many(self, codes):
+        """Frequencies for a sequence of codes, as a float array."""
+        return np.fromiter(map(self.lookup, codes), dtype=np.float64, count=len(codes))
+
+    def map_series(self, codes):
+        """
+        Vectorized lookup for a pandas Series of raw codes.
+
+        Normalization is done with pandas string methods over the whole
+        column (see normalize_codes) instead of calling normalize_code() per row.
+        """
+        frequencies = normalize_codes(codes).map(self.table)
+        return frequencies.astype('float64').fillna(self.fallback)
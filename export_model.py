@@ -1,101 +1,140 @@
-import pandas as pd
-import numpy as np
+import argparse
+import os
 import pickle
-import sys
+import time
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.linear_model import LogisticRegression
-
-# Load and prepare data
-file_path = "/Users/ashishbathula/Desktop/gmu data /csv file -gmu radiology.csv"
-df = pd.read_csv(file_path)
-
-# Age extraction function
-def extract_age(age_str):
-    try:
-        if pd.isna(age_str):
-            return np.nan
-        years = int(str(age_str).split(':')[0].strip().replace('Y', '').strip())
-        months = int(str(age_str).split(':')[1].strip().replace('M', '').strip())
-        total_age = years + (months / 12)
-        return total_age
-    except:
-        return np.nan
-
-df['Age_Years'] = df['Age'].apply(extract_age)
-df = df.dropna(subset=['Age_Years'])
-df = df.drop_duplicates()
-
-# Gender encoding
-gender_mapping = {'Male': 1, 'Female': 0}
-df['Gender_Encoded'] = df['Gender'].map(gender_mapping)
-
-# ICD and CPT frequencies
-icd_category_counts = df.groupby('ICD').size().reset_index(name='ICD_Frequency')
-df = df.merge(icd_category_counts, on='ICD', how='left')
-
-cpt_category_counts = df.groupby('CPT').size().reset_index(name='CPT_Frequency')
-df = df.merge(cpt_category_counts, on='CPT', how='left')
-
-# Date parsing
-df['ApprovedDate'] = pd.to_datetime(df['ApprovedDate'], format='%m/%d/%y', errors='coerce')
-df['Month_of_Approval'] = df['ApprovedDate'].dt.month
-df['Month_of_Approval'] = df['Month_of_Approval'].fillna(df['Month_of_Approval'].median())
-
-# Target variable
-df['Insurance_Eligible'] = (df['Insurance'].str.strip() == 'Yes').astype(int)
-
-# Handle missing values
-df['Age_Years'].fillna(df['Age_Years'].median(), inplace=True)
-df['ICD_Frequency'].fillna(df['ICD_Frequency'].median(), inplace=True)
-df['CPT_Frequency'].fillna(df['CPT_Frequency'].median(), inplace=True)
-
-# Select features
-features = ['Age_Years', 'Gender_Encoded', 'ICD_Frequency', 'CPT_Frequency', 'Month_of_Approval']
-X = df[features].copy()
-y = df['Insurance_Eligible'].copy()
-
-# Remove NaN values
-valid_indices = ~X.isna().any(axis=1)
-X = X[valid_indices]
-y = y[valid_indices]
-
-# Initialize and fit scaler
-scaler = MinMaxScaler(feature_range=(0, 1))
-X_scaled = scaler.fit_transform(X)
-
-# Train model
-model = LogisticRegression(random_state=42, max_iter=1000, solver='lbfgs', class_weight='balanced')
-model.fit(X_scaled, y)
-
-# Save model and scaler
-with open('/Users/ashishbathula/Desktop/gmu data /model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-
-with open('/Users/ashishbathula/Desktop/gmu data /scaler.pkl', 'wb') as f:
-    pickle.dump(scaler, f)
-
-# Save feature names
-with open('/Users/ashishbathula/Desktop/gmu data /features.pkl', 'wb') as f:
-    pickle.dump(features, f)
-
-# Save ICD/CPT mappings for reference
-icd_mapping = dict(zip(icd_category_counts['ICD'], icd_category_counts['ICD_Frequency']))
-cpt_mapping = dict(zip(cpt_category_counts['CPT'], cpt_category_counts['CPT_Frequency']))
-
-with open('/Users/ashishbathula/Desktop/gmu data /icd_mapping.pkl', 'wb') as f:
-    pickle.dump(icd_mapping, f)
-
-with open('/Users/ashishbathula/Desktop/gmu data /cpt_mapping.pkl', 'wb') as f:
-    pickle.dump(cpt_mapping, f)
-
-print("✅ Model saved: model.pkl")
-print("✅ Scaler saved: scaler.pkl")
-print("✅ Features saved: features.pkl")
-print("✅ ICD mapping saved: icd_mapping.pkl")
-print("✅ CPT mapping saved: cpt_mapping.pkl")
-print(f"\n📊 Model Performance on Training Data:")
-print(f"   Accuracy: {model.score(X_scaled, y):.4f}")
-print(f"\n🎯 Model Coefficients:")
-for feat, coef in zip(features, model.coef_[0]):
-    print(f"   {feat}: {coef:.6f}")
-print(f"\n📌 Intercept: {model.intercept_[0]:.6f}")
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from feature_cache import load_training_data
+from feature_pipeline import FEATURES
+from model_bundle import DEFAULT_BUNDLE_PATH, export_bundle
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(SCRIPT_DIR, 'csv file -gmu radiology.csv')
+
+
+def prepare_training_data(file_path=DEFAULT_DATA_PATH, use_cache=True):
+    """
+    Load the raw claims CSV and derive features/target.
+
+    The cleaned matrix is cached on disk (see feature_cache.py) and reused
+    until the CSV or the preprocessing code changes.
+
+    Returns:
+        (X, y, icd_mapping, cpt_mapping) - see feature_pipeline.build_training_frame
+    """
+    return load_training_data(file_path, use_cache=use_cache)
+
+
+def train_model(X, y):
+    """Fit the MinMax scaler and the logistic regression model"""
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    X_scaled = scaler.fit_transform(X)
+
+    model = LogisticRegression(random_state=42, max_iter=1000, solver='lbfgs', class_weight='balanced')
+    model.fit(X_scaled, y)
+
+    return model, scaler, X_scaled
+
+
+def evaluate_model(model, X_scaled, y):
+    """Accuracy, precision, recall, F1 and ROC-AUC of the model on (X_scaled, y)"""
+    predictions = model.predict(X_scaled)
+    return {
+        'accuracy': accuracy_score(y, predictions),
+        'precision': precision_score(y, predictions),
+        'recall': recall_score(y, predictions),
+        'f1_score': f1_score(y, predictions),
+        'roc_auc': roc_auc_score(y, model.predict_proba(X_scaled)[:, 1]),
+    }
+
+
+def save_artifacts(model, scaler, icd_mapping, cpt_mapping, output_dir=SCRIPT_DIR):
+    """Write model.pkl, scaler.pkl, features.pkl and the ICD/CPT mappings"""
+    artifacts = {
+        'model.pkl': model,
+        'scaler.pkl': scaler,
+        'features.pkl': FEATURES,
+        'icd_mapping.pkl': icd_mapping,
+        'cpt_mapping.pkl': cpt_mapping
+    }
+    for filename, obj in artifacts.items():
+        with open(os.path.join(output_dir, filename), 'wb') as f:
+            pickle.dump(obj, f)
+
+
+def save_bundle(model, scaler, icd_mapping, cpt_mapping, metrics, output_dir=SCRIPT_DIR):
+    """Write everything serving needs as one model.bundle (see model_bundle.py)"""
+    path = os.path.join(output_dir, DEFAULT_BUNDLE_PATH)
+    export_bundle(path, model, scaler, FEATURES, metrics, icd_mapping=icd_mapping, cpt_mapping=cpt_mapping)
+    return path
+
+
+def load_pickled_artifacts(artifact_dir=SCRIPT_DIR):
+    """Read model.pkl, scaler.pkl and the ICD/CPT mappings from a previous export"""
+    loaded = []
+    for filename in ('model.pkl', 'scaler.pkl', 'icd_mapping.pkl', 'cpt_mapping.pkl'):
+        with open(os.path.join(artifact_dir, filename), 'rb') as f:
+            loaded.append(pickle.load(f))
+    return tuple(loaded)
+
+
+def bundle_existing_artifacts(data_path, output_dir, use_cache=True):
+    """Re-package the pickles in output_dir as model.bundle without retraining"""
+    model, scaler, icd_mapping, cpt_mapping = load_pickled_artifacts(output_dir)
+    X, y, _, _ = prepare_training_data(data_path, use_cache)
+    metrics = evaluate_model(model, scaler.transform(X), y)
+    path = save_bundle(model, scaler, icd_mapping, cpt_mapping, metrics, output_dir)
+    print(f"✅ Bundle saved: {path} ({os.path.getsize(path):,} bytes)")
+    print(f"   Accuracy on training data: {metrics['accuracy']:.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the eligibility model and export its artifacts')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='Raw claims CSV')
+    parser.add_argument('--output-dir', default=SCRIPT_DIR, help='Where to write the .pkl artifacts')
+    parser.add_argument('--bundle-only', action='store_true',
+                        help='Skip training; write model.bundle from the existing pickles in --output-dir')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-run preprocessing without reading or writing the feature cache')
+    args = parser.parse_args(argv)
+
+    if args.bundle_only:
+        bundle_existing_artifacts(args.data, args.output_dir, use_cache=not args.no_cache)
+        return
+
+    # Load and prepare data (from the feature cache when the CSV is unchanged)
+    start = time.perf_counter()
+    X, y, icd_mapping, cpt_mapping = prepare_training_data(args.data, use_cache=not args.no_cache)
+    prep_seconds = time.perf_counter() - start
+
+    # Train model
+    start = time.perf_counter()
+    model, scaler, X_scaled = train_model(X, y)
+    train_seconds = time.perf_counter() - start
+
+    # Save model, scaler, feature names and ICD/CPT mappings
+    os.makedirs(args.output_dir, exist_ok=True)
+    save_artifacts(model, scaler, icd_mapping, cpt_mapping, args.output_dir)
+    metrics = evaluate_model(model, X_scaled, y)
+    bundle_path = save_bundle(model, scaler, icd_mapping, cpt_mapping, metrics, args.output_dir)
+
+    print("✅ Model saved: model.pkl")
+    print("✅ Scaler saved: scaler.pkl")
+    print("✅ Features saved: features.pkl")
+    print("✅ ICD mapping saved: icd_mapping.pkl")
+    print("✅ CPT mapping saved: cpt_mapping.pkl")
+    print(f"✅ Bundle saved: {os.path.basename(bundle_path)} ({os.path.getsize(bundle_path):,} bytes)")
+    print(f"\n⏱️  Preprocessing: {prep_seconds:.2f}s ({len(X):,} rows), training: {train_seconds:.2f}s")
+    print(f"\n📊 Model Performance on Training Data:")
+    for name, value in metrics.items():
+        print(f"   {name}: {value:.4f}")
+    print(f"\n🎯 Model Coefficients:")
+    for feat, coef in zip(FEATURES, model.coef_[0]):
+        print(f"   {feat}: {coef:.6f}")
+    print(f"\n📌 Intercept: {model.intercept_[0]:.6f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of the cleaned training matrix.
+
+prepare_training_data() re-parses the claims CSV and repeats age extraction,
+de-duplication, frequency counting and date parsing on every run. This
+module stores its result, X, y and the ICD/CPT mappings, as one model_bundle
+file. A later run memory-maps that file instead of running the pipeline.
+
+The cache key is the SHA-256 of the source file's bytes, combined with the
+SHA-256 of the preprocessing code (feature_pipeline.py and code_index.py).
+Editing the data or the pipeline gives a new key, so stale entries are never
+read. When an entry is written, older entries for the same source file are
+removed.
+
+Usage:
+    from feature_cache import load_training_data
+    X, y, icd_mapping, cpt_mapping = load_training_data('csv file -gmu radiology.csv')
+
+    python feature_cache.py status          # list cached entries
+    python feature_cache.py clear
+
+Set FEATURE_CACHE_DIR to move the cache (default: .feature_cache next to
+this file).
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import code_index
+import feature_pipeline
+from model_bundle import BundleError, load_bundle, table_arrays, table_from_arrays, write_bundle
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.environ.get('FEATURE_CACHE_DIR', os.path.join(SCRIPT_DIR, '.feature_cache'))
+
+# Modules whose source defines the cleaned matrix
+PIPELINE_MODULES = (feature_pipeline, code_index)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pipeline_version():
+    """SHA-256 over the preprocessing modules' source files (first 16 hex chars)."""
+    digest = hashlib.sha256()
+    for module in PIPELINE_MODULES:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def cache_key(source_path):
+    """Cache key for a claims CSV under the current preprocessing code."""
+    return f"{_file_sha256(source_path)[:24]}-{pipeline_version()}"
+
+
+class FeatureCache:
+    """
+    Directory of cached training matrices, one bundle file per key.
+
+    Args:
+        cache_dir: Directory for the entries (created on first write)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.bundle')
+
+    def load(self, key):
+        """
+        Cached (X, y, icd_mapping, cpt_mapping) for a key, or None on a miss.
+
+        An entry that cannot be read (truncated, failed checksum, missing
+        arrays) counts as a miss; the caller rebuilds and overwrites it.
+        X and y are read-only views over the memory-mapped entry.
+        """
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return _unpack(load_bundle(path))
+        except (BundleError, ValueError, KeyError) as e:
+            print(f"⚠️  Ignoring unreadable feature cache entry {path}: {e}")
+            return None
+
+    def store(self, key, source_path, X, y, icd_mapping, cpt_mapping):
+        """Write the entry for key; drop older entries for the same source file and unreadable ones."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source = os.path.abspath(source_path)
+        icd_codes, icd_counts = table_arrays(icd_mapping)
+        cpt_codes, cpt_counts = table_arrays(cpt_mapping)
+        write_bundle(self._entry_path(key), {
+            'X': np.asarray(X, dtype=np.float64),
+            'y': np.asarray(y, dtype=np.int64),
+            'icd_codes': icd_codes, 'icd_counts': icd_counts,
+            'cpt_codes': cpt_codes, 'cpt_counts': cpt_counts,
+        }, {
+            'cache': 'feature_cache',
+            'source': source,
+            'pipeline_version': pipeline_version(),
+            'features': list(feature_pipeline.FEATURES),
+            'rows': len(y),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        })
+        for entry in self.entries():
+            if entry['key'] != key and (entry['corrupt'] or entry['source'] == source):
+                os.remove(entry['path'])
+
+    def entries(self):
+        """
+        Header summaries of the cached entries.
+
+        Files whose header cannot be read are listed with corrupt=True (and
+        no source) so that store() and clear() remove them.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for filename in sorted(os.listdir(self.cache_dir)):
+            if not filename.endswith('.bundle'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                header, corrupt = load_bundle(path, verify=False).header, False
+            except (BundleError, ValueError):
+                header, corrupt = {}, True
+            entries.append({
+                'key': filename[:-len('.bundle')], 'path': path, 'source': header.get('source'),
+                'rows': header.get('rows'), 'created_at': header.get('created_at'),
+                'bytes': os.path.getsize(path), 'corrupt': corrupt,
+            })
+        return entries
+
+    def clear(self):
+        """Remove every cached entry; returns how many were removed."""
+        entries = self.entries()
+        for entry in entries:
+            os.remove(entry['path'])
+        return len(entries)
+
+
+def _unpack(bundle):
+    arrays = bundle.arrays
+    # copy=False keeps X backed by the memory map
+    X = pd.DataFrame(arrays['X'], columns=bundle.header['features'], copy=False)
+    y = pd.Series(arrays['y'], name=feature_pipeline.TARGET, copy=False)
+    icd_mapping = table_from_arrays(arrays['icd_codes'], arrays['icd_counts'])
+    cpt_mapping = table_from_arrays(arrays['cpt_codes'], arrays['cpt_counts'])
+    return X, y, icd_mapping, cpt_mapping
+
+
+def load_training_data(source_path, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """
+    (X, y, icd_mapping, cpt_mapping) for a claims CSV, from the cache when possible.
+
+    On a miss, runs load_claims + build_training_frame and stores the result.
+
+    Args:
+        source_path: Raw claims CSV
+        cache_dir: Cache directory
+        use_cache: False runs the pipeline without reading or writing the cache
+
+    Returns:
+        Same as feature_pipeline.build_training_frame (X with a RangeIndex)
+    """
+    if not use_cache:
+        return feature_pipeline.build_training_frame(feature_pipeline.load_claims(source_path))
+
+    cache = FeatureCache(cache_dir)
+    key = cache_key(source_path)
+    cached = cache.load(key)
+    if cached is not None:
+        return cached
+
+    X, y, icd_mapping, cpt_mapping = feature_pipeline.build_training_frame(
+        feature_pipeline.load_claims(source_path)
+    )
+    cache.store(key, source_path, X, y, icd_mapping, cpt_mapping)
+    return cache.load(key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cached training matrices')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='List cached entries')
+    subparsers.add_parser('clear', help='Remove all cached entries')
+    args = parser.parse_args(argv)
+
+    cache = FeatureCache(args.cache_dir)
+    if args.command == 'clear':
+        print(f"✅ Removed {cache.clear()} cached entries from {args.cache_dir}")
+        return
+    entries = cache.entries()
+    print(f"📦 {len(entries)} cached entries in {args.cache_dir} (pipeline version {pipeline_version()})")
+    for entry in entries:
+        if entry['corrupt']:
+            print(f"   ⚠️  {entry['key']}  unreadable ({entry['bytes']:,} bytes), removed on the next write")
+            continue
+        print(f"   {entry['key']}  {entry['rows']:>9,} rows  {entry['bytes']:>11,} bytes  "
+              f"{entry['created_at']}  {entry['source']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
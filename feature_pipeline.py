@@ -0,0 +1,170 @@
+"""
+Feature derivation for raw radiology claim rows.
+
+Turns the raw columns of `csv file -gmu radiology.csv` (Age "40Y : 2M",
+Gender, ICD, CPT, ApprovedDate) into the five model features with vectorized
+pandas operations. Used for training (load_claims + build_training_frame,
+called from export_model.py) and for chunked scoring (derive_features).
+
+Raw columns are read as categoricals: ages, dates and codes repeat heavily,
+so string parsing is done once per distinct value instead of once per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+# pyarrow's multithreaded CSV reader is used when installed (optional dependency)
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+FEATURES = ['Age_Years', 'Gender_Encoded', 'ICD_Frequency', 'CPT_Frequency', 'Month_of_Approval']
+
+TARGET = 'Insurance_Eligible'
+
+CLAIM_COLUMNS = ['Age', 'Gender', 'ICD', 'CPT', 'servicename', 'ApprovedDate', 'Insurance']
+CLAIM_DTYPES = {column: 'category' for column in CLAIM_COLUMNS}
+
+# "40Y : 2M" -> 40 years, 2 months. Infant ages such as "3M : 28 D" are not
+# parsed, matching the original row-wise extract_age(), which dropped those rows.
+AGE_PATTERN = r'^\s*(\d+)\s*Y\s*:\s*(\d+)\s*M\s*$'
+
+GENDER_MAPPING = {'Male': 1, 'Female': 0}
+
+APPROVED_DATE_FORMAT = '%m/%d/%y'
+
+# Median approval month of the training data, used when ApprovedDate is missing
+DEFAULT_APPROVAL_MONTH = 3
+
+
+def _per_category(values, func):
+    """Apply a vectorized Series -> float Series function once per category."""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return func(values)
+    per_category = func(pd.Series(values.cat.categories)).to_numpy(dtype=np.float64)
+    # Code -1 (missing) picks the trailing NaN
+    result = np.append(per_category, np.nan)[values.cat.codes.to_numpy()]
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def _parse_age(age):
+    parts = age.astype('string').str.extract(AGE_PATTERN)
+    years = pd.to_numeric(parts[0], errors='coerce')
+    months = pd.to_numeric(parts[1], errors='coerce')
+    return (years + months / 12).astype('float64')
+
+
+def _parse_month(approved_date):
+    dates = pd.to_datetime(approved_date, format=APPROVED_DATE_FORMAT, errors='coerce')
+    return dates.dt.month.astype('float64')
+
+
+def extract_age_years(age):
+    """Vectorized "40Y : 2M" -> 40.1667; unparseable values become NaN."""
+    return _per_category(age, _parse_age)
+
+
+def encode_gender(gender):
+    """Male -> 1, Female -> 0, anything else -> NaN."""
+    return gender.map(GENDER_MAPPING).astype('float64')
+
+
+def approval_month(approved_date):
+    """Month number from ApprovedDate (m/d/yy); unparseable dates become NaN."""
+    return _per_category(approved_date, _parse_month)
+
+
+def load_claims(path, nrows=None):
+    """Read a raw claims CSV with explicit columns and categorical dtypes."""
+    engine = CSV_ENGINE if nrows is None else 'c'  # pyarrow does not support nrows
+    return pd.read_csv(path, usecols=CLAIM_COLUMNS, dtype=CLAIM_DTYPES, nrows=nrows, engine=engine)
+
+
+def iter_claims(path, chunksize):
+    """load_claims() in chunks of `chunksize` rows, for files larger than memory."""
+    # pyarrow does not support chunksize; categories are per chunk
+    return pd.read_csv(path, usecols=CLAIM_COLUMNS, dtype=CLAIM_DTYPES, chunksize=chunksize)
+
+
+def build_training_frame(df):
+    """
+    Clean raw claims and derive the training features and target.
+
+    Same steps as the original export_model.py: drop rows with unparseable
+    ages, drop duplicate rows, encode gender, count ICD/CPT frequencies,
+    take the approval month, and median-fill what is still missing.
+    ICD/CPT frequencies are counted per raw code, as the shipped model was
+    trained: padded variants of a code ("A09" and "A09       ") are counted
+    separately. The ICD_Frequency/CPT_Frequency ranges in validation.py
+    (1-683, 1-1815) are those counts.
+
+    Args:
+        df: Raw claims, e.g. from load_claims()
+
+    Returns:
+        (X, y, icd_mapping, cpt_mapping): X is a DataFrame in FEATURES order,
+        y the 0/1 target, and the mappings are raw code -> frequency
+    """
+    df = df.assign(Age_Years=extract_age_years(df['Age']))
+    df = df[df['Age_Years'].notna()].drop_duplicates()
+
+    month = approval_month(df['ApprovedDate'])
+    df = df.assign(
+        Gender_Encoded=encode_gender(df['Gender']),
+        ICD_Frequency=df.groupby('ICD', observed=True)['ICD'].transform('size').astype('float64'),
+        CPT_Frequency=df.groupby('CPT', observed=True)['CPT'].transform('size').astype('float64'),
+        Month_of_Approval=month.fillna(month.median()),
+    )
+    df[TARGET] = _per_category(
+        df['Insurance'], lambda values: (values.str.strip() == 'Yes').astype('float64')
+    ).fillna(0).astype(int)
+
+    for column in ['Age_Years', 'ICD_Frequency', 'CPT_Frequency']:
+        df[column] = df[column].fillna(df[column].median())
+
+    valid = df[FEATURES].notna().all(axis=1)
+    X = df.loc[valid, FEATURES]
+    y = df.loc[valid, TARGET]
+
+    icd_counts = df['ICD'].value_counts()
+    cpt_counts = df['CPT'].value_counts()
+    icd_mapping = {code: int(n) for code, n in icd_counts[icd_counts > 0].items()}
+    cpt_mapping = {code: int(n) for code, n in cpt_counts[cpt_counts > 0].items()}
+
+    return X, y, icd_mapping, cpt_mapping
+
+
+def derive_features(chunk, icd_index, cpt_index):
+    """
+    Derive the model feature matrix for a chunk of raw claim rows.
+
+    Args:
+        chunk: DataFrame with Age, Gender, ICD, CPT and ApprovedDate columns
+        icd_index: CodeFrequencyIndex built from icd_mapping.pkl
+        cpt_index: CodeFrequencyIndex built from cpt_mapping.pkl
+
+    Returns:
+        (X, errors): X is an (N, 5) float array in FEATURES order; errors is
+        an object array holding a reason for rows that cannot be scored
+        (None for valid rows). Invalid rows have NaN features.
+    """
+    age_years = extract_age_years(chunk['Age'])
+    gender_encoded = encode_gender(chunk['Gender'])
+    icd_frequency = icd_index.map_series(chunk['ICD'])
+    cpt_frequency = cpt_index.map_series(chunk['CPT'])
+    month = approval_month(chunk['ApprovedDate']).fillna(DEFAULT_APPROVAL_MONTH)
+
+    X = np.column_stack([
+        age_years.to_numpy(),
+        gender_encoded.to_numpy(),
+        icd_frequency.to_numpy(dtype=np.float64),
+        cpt_frequency.to_numpy(dtype=np.float64),
+        month.to_numpy(),
+    ])
+
+    errors = np.full(len(chunk), None, dtype=object)
+    errors[gender_encoded.isna().to_numpy()] = 'invalid_gender'
+    errors[age_years.isna().to_numpy()] = 'invalid_age'
+    return X, errors
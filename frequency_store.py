@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Incremental ICD/CPT frequency store.
+
+export_model.py counts code frequencies with a groupby over the whole claims
+history. FrequencyStore keeps those counts on disk and folds in new claim
+batches, so adding a day of claims costs time proportional to that day. It
+applies the same cleaning as feature_pipeline.build_training_frame: rows
+with unparseable ages are skipped, exact duplicate rows are counted once
+(also across batches), and codes are normalized. Ingesting the history in
+any number of batches therefore gives the same tables as a full recompute.
+
+Files (next to each other):
+    frequency_store.bundle      counts (model_bundle format, written atomically)
+    frequency_store.hashes/     sorted uint64 hashes of ingested rows, for
+                                cross-batch de-duplication (see RowHashIndex)
+
+Cross-batch de-duplication never loads the whole history. The row hashes
+are kept as a few sorted run files, which are memory-mapped and probed with
+np.searchsorted, so a batch of k rows costs O(k log N) and touches only the
+pages it probes. Runs are merged logarithmically: each save writes the
+batch's hashes as a new run and merges it with previous runs of similar
+size. Each hash is rewritten O(log N) times over its life. Runs stop
+merging at MAX_MERGED_RUN hashes, so a merge never holds more than about
+256 MB in memory. Past that size, history adds one run per 16M rows.
+--no-dedupe turns the index off completely.
+
+`publish()` writes a code-table snapshot (code_frequencies.bundle by default)
+that api.py reloads when it changes (see PublishedCodeTables).
+
+Counts only grow, but the served model was fitted on frequencies of 1-683
+(ICD) and 1-1815 (CPT), the ranges validation.API_SCHEMA accepts for
+frequencies sent directly. Frequencies resolved from a code are clipped to
+those ranges (validation.Field.clip). A code whose count passes the top of
+the range is therefore scored like the most frequent code in training, not
+extrapolated. stats() counts the codes past the range (icd_above_range /
+cpt_above_range); once those are common, retrain on the new counts.
+
+Usage:
+    python frequency_store.py ingest "csv file -gmu radiology.csv"    # seed with history
+    python frequency_store.py ingest claims_2026-10-17.csv --publish   # daily batch
+    python frequency_store.py status
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from code_index import frequency_fallback
+from model_bundle import (
+    BundleError, bundle_version, export_code_tables, load_bundle, table_arrays, table_from_arrays, write_bundle,
+)
+
+DEFAULT_STORE_PATH = 'frequency_store.bundle'
+DEFAULT_SNAPSHOT_PATH = 'code_frequencies.bundle'
+MAX_MERGED_RUN = 1 << 24  # hashes (128 MB); larger runs are never merged
+
+
+class RowHashIndex:
+    """
+    Set of uint64 row hashes stored as sorted runs (a logarithmic LSM).
+
+    Args:
+        directory: Where run files live, or None to keep runs in memory
+        runs: [(file name, length), ...] as recorded by a previous save
+    """
+
+    def __init__(self, directory=None, runs=()):
+        self.directory = directory
+        self._runs = []  # sorted uint64 arrays (memory-mapped for on-disk runs), largest first
+        self._names = []
+        for name, length in runs:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path) or os.path.getsize(path) != length * 8:
+                raise BundleError(f"Row hash run {path} is missing or does not hold {length} hashes")
+            self._runs.append(np.memmap(path, dtype='<u8', mode='r') if length else np.zeros(0, '<u8'))
+            self._names.append(name)
+        self._pending = []  # sorted arrays added since the last flush()
+        self._next_run = 1 + max((int(name[4:10]) for name in self._names), default=0)
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs) + sum(len(run) for run in self._pending)
+
+    def contains(self, hashes):
+        """Boolean mask: which of `hashes` are already in the index."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=bool)
+        if not len(hashes):
+            return found
+        order = np.argsort(hashes, kind='stable')  # sorted probes touch each page once
+        probes = hashes[order]
+        for run in self._runs + self._pending:
+            if len(run):
+                i = np.searchsorted(run, probes)
+                found[order] |= (i < len(run)) & (run[np.minimum(i, len(run) - 1)] == probes)
+        return found
+
+    def add(self, hashes):
+        """Add hashes that are not in the index yet (kept in memory until flush())."""
+        if len(hashes):
+            self._pending.append(np.unique(np.asarray(hashes, dtype=np.uint64)))
+
+    def flush(self):
+        """
+        Write the pending hashes as a run and merge runs of similar size.
+
+        Returns:
+            [(file name, length), ...] to record; files of merged-away runs
+            stay on disk until cleanup(), so a crash before the caller records
+            the new list leaves the old one intact
+        """
+        if self._pending:
+            self._append_run(np.unique(np.concatenate(self._pending)))
+            self._pending = []
+        while (len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1])
+               and len(self._runs[-2]) + len(self._runs[-1]) <= MAX_MERGED_RUN):
+            merged = np.union1d(self._runs.pop(), self._runs.pop())
+            self._names[-2:] = []
+            self._append_run(merged)
+        return [(name, len(run)) for name, run in zip(self._names, self._runs)]
+
+    def _append_run(self, hashes):
+        name = f'run-{self._next_run:06d}.u64'
+        self._next_run += 1
+        if self.directory is None:
+            self._runs.append(hashes)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(hashes.astype('<u8').tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            self._runs.append(np.memmap(path, dtype='<u8', mode='r') if len(hashes) else hashes)
+        self._names.append(name)
+
+    def cleanup(self):
+        """Delete run files that are no longer part of the index."""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        for name in set(os.listdir(self.directory)) - set(self._names):
+            os.remove(os.path.join(self.directory, name))
+
+
+class FrequencyStore:
+    """
+    On-disk ICD/CPT code counts that grow one claim batch at a time.
+
+    Args:
+        path: Store file; created on the first save() if missing. None keeps
+            the counts in memory only (save() is then unavailable)
+        dedupe: Count exact duplicate rows once, across all batches
+            (matches the full-recompute training pipeline). Costs a probe
+            of the on-disk RowHashIndex per batch, and 8 bytes per counted
+            row on disk (in memory when path is None and hash_dir is not set)
+        hash_dir: Directory for the row hash runs (default: next to path)
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, dedupe=True, hash_dir=None):
+        self.path = path
+        self.hash_dir = hash_dir or (os.path.splitext(path)[0] + '.hashes' if path else None)
+        self.dedupe = dedupe
+        self.icd_counts = {}
+        self.cpt_counts = {}
+        self.rows = 0
+        self.batches = 0
+        self.row_hashes = None
+        if path and os.path.exists(path):
+            self._load()
+        if self.row_hashes is None:
+            self.row_hashes = RowHashIndex(self.hash_dir)
+
+    def _load(self):
+        bundle = load_bundle(self.path)
+        header = bundle.header
+        self.icd_counts = table_from_arrays(bundle.arrays['icd_codes'], bundle.arrays['icd_counts'])
+        self.cpt_counts = table_from_arrays(bundle.arrays['cpt_codes'], bundle.arrays['cpt_counts'])
+        self.rows = header['rows']
+        self.batches = header['batches']
+        self.row_hashes = RowHashIndex(self.hash_dir, header.get('hash_runs', ()))
+
+    def ingest_frame(self, df):
+        """
+        Fold a batch of raw claims into the counts.
+
+        Args:
+            df: Raw claims with the feature_pipeline.CLAIM_COLUMNS columns,
+                e.g. from feature_pipeline.load_claims()
+
+        Returns:
+            dict with rows_read, rows_counted, invalid_age, duplicates,
+            new_icd_codes, new_cpt_codes, and `counted`: a boolean array
+            marking the input rows that were counted
+        """
+        import pandas as pd
+        from code_index import normalize_codes
+        from feature_pipeline import CLAIM_COLUMNS, extract_age_years
+
+        rows_read = len(df)
+        counted = extract_age_years(df['Age']).notna().to_numpy().copy()
+        df = df[counted]
+        invalid_age = rows_read - len(df)
+
+        duplicates = 0
+        if self.dedupe:
+            hashes = pd.util.hash_pandas_object(df[CLAIM_COLUMNS], index=False).to_numpy(np.uint64)
+            keep = ~pd.Series(hashes).duplicated().to_numpy() & ~self.row_hashes.contains(hashes)
+            duplicates = int((~keep).sum())
+            counted[counted] = keep
+            df = df[keep]
+            self.row_hashes.add(hashes[keep])
+
+        new_codes = {}
+        for column, counts in (('ICD', self.icd_counts), ('CPT', self.cpt_counts)):
+            batch_counts = normalize_codes(df[column]).value_counts()
+            new_codes[column] = 0
+            for code, n in batch_counts[batch_counts > 0].items():
+                code = str(code)
+                if code not in counts:
+                    new_codes[column] += 1
+                counts[code] = counts.get(code, 0) + int(n)
+
+        self.rows += len(df)
+        self.batches += 1
+        return {
+            'rows_read': rows_read,
+            'rows_counted': len(df),
+            'invalid_age': invalid_age,
+            'duplicates': duplicates,
+            'new_icd_codes': new_codes['ICD'],
+            'new_cpt_codes': new_codes['CPT'],
+            'counted': counted,
+        }
+
+    def ingest_file(self, path):
+        """ingest_frame() for a raw claims CSV."""
+        from feature_pipeline import load_claims
+
+        return self.ingest_frame(load_claims(path))
+
+    def save(self):
+        """
+        Persist the counts (stores opened with a path only).
+
+        New row hashes are written as a hash run first, then the counts file
+        is replaced atomically; it lists the runs it covers, so a crash in
+        between leaves the previous consistent state. Runs merged away are
+        deleted only after that.
+        """
+        if not self.path:
+            raise ValueError("In-memory FrequencyStore (path=None) cannot be saved")
+        hash_runs = self.row_hashes.flush()
+
+        icd_codes, icd_counts = table_arrays(self.icd_counts)
+        cpt_codes, cpt_counts = table_arrays(self.cpt_counts)
+        write_bundle(self.path, {
+            'icd_codes': icd_codes, 'icd_counts': icd_counts,
+            'cpt_codes': cpt_codes, 'cpt_counts': cpt_counts,
+        }, {
+            'store': 'frequency_store',
+            'rows': self.rows,
+            'batches': self.batches,
+            'row_hashes': sum(length for _, length in hash_runs),
+            'hash_runs': hash_runs,
+            'dedupe': self.dedupe,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        })
+        self.row_hashes.cleanup()
+
+    def mappings(self):
+        """(icd_mapping, cpt_mapping): normalized code -> frequency dicts."""
+        return dict(self.icd_counts), dict(self.cpt_counts)
+
+    def publish(self, path=DEFAULT_SNAPSHOT_PATH):
+        """
+        Write the current tables as a code-table snapshot for the services.
+
+        Returns:
+            The snapshot's header
+        """
+        icd_mapping, cpt_mapping = self.mappings()
+        return export_code_tables(path, icd_mapping, cpt_mapping, header={
+            'source': os.path.basename(self.path), 'rows': self.rows, 'batches': self.batches,
+        })
+
+    def stats(self):
+        icd_mapping, cpt_mapping = self.mappings()
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'icd_codes': len(icd_mapping),
+            'cpt_codes': len(cpt_mapping),
+            'icd_fallback': frequency_fallback(icd_mapping) if icd_mapping else None,
+            'cpt_fallback': frequency_fallback(cpt_mapping) if cpt_mapping else None,
+            'row_hashes': len(self.row_hashes),
+            'icd_above_range': _above_range(icd_mapping, 'icd'),
+            'cpt_above_range': _above_range(cpt_mapping, 'cpt'),
+        }
+
+
+def _above_range(mapping, code_key):
+    """Codes whose count is past the range the served model was trained on."""
+    from validation import API_SCHEMA
+
+    field = next(field for field in API_SCHEMA.fields if field.code_key == code_key)
+    return sum(1 for count in mapping.values() if count > field.high)
+
+
+class PublishedCodeTables:
+    """
+    ICD/CPT indexes that follow a published snapshot file.
+
+    `get()` returns (icd_index, cpt_index) from the snapshot at `path`,
+    re-checking its mtime/size at most every `check_interval` seconds and
+    reloading when it changes. Until a snapshot exists, `default` is
+    returned (e.g. the tables from model.bundle).
+
+    A snapshot that fails to load (truncated, corrupt, missing a table) is
+    reported in stats()['last_error'] and the previous tables keep serving;
+    it is not retried until the file changes again.
+    """
+
+    def __init__(self, path, default, check_interval=1.0):
+        self.path = path
+        self.default = default
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tables = default
+        self._signature = None
+        self._failed_signature = None
+        self._next_check = 0.0
+        self.version = None
+        self.reload_count = 0
+        self.failed_reloads = 0
+        self.last_error = None
+
+    def get(self):
+        if time.monotonic() < self._next_check:
+            return self._tables
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return self._tables
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signature = None
+            self._next_check = time.monotonic() + self.check_interval
+            if signature != self._signature and signature != self._failed_signature:
+                if signature is None:
+                    self._tables, self.version = self.default, None
+                    self._signature = None
+                else:
+                    self._load(signature)
+            return self._tables
+
+    def _load(self, signature):
+        """Swap in the snapshot's tables; on failure keep the current ones. Caller holds the lock."""
+        try:
+            snapshot = load_bundle(self.path)
+            tables = (snapshot.code_index('icd'), snapshot.code_index('cpt'))
+        except (BundleError, OSError, KeyError, ValueError) as e:
+            self._failed_signature = signature  # skipped until the file changes again
+            self.failed_reloads += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️  Code table snapshot {self.path} not loaded, keeping version {self.version}: "
+                  f"{self.last_error}")
+            return
+        self._tables = tables
+        self.version = snapshot.version
+        self.reload_count += 1
+        self._signature = signature
+        self._failed_signature = None
+        self.last_error = None
+
+    def stats(self):
+        return {'path': self.path, 'snapshot_version': self.version, 'reload_count': self.reload_count,
+                'failed_reloads': self.failed_reloads, 'last_error': self.last_error}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Incremental ICD/CPT frequency store')
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help='Store file (default: %(default)s)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Add claim batches (raw claims CSVs)')
+    ingest.add_argument('files', nargs='+')
+    ingest.add_argument('--publish', nargs='?', const=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                        help='Publish a snapshot afterwards (default path: %(const)s)')
+    ingest.add_argument('--no-dedupe', action='store_true', help='Count duplicate rows every time')
+
+    publish = subparsers.add_parser('publish', help='Write a code-table snapshot for the services')
+    publish.add_argument('path', nargs='?', default=DEFAULT_SNAPSHOT_PATH)
+
+    subparsers.add_parser('status', help='Print store totals')
+    args = parser.parse_args(argv)
+
+    store = FrequencyStore(args.store, dedupe=not getattr(args, 'no_dedupe', False))
+    if args.command == 'ingest':
+        for path in args.files:
+            start = time.perf_counter()
+            summary = store.ingest_file(path)
+            store.save()
+            print(f"✅ {path}: {summary['rows_counted']:,} of {summary['rows_read']:,} rows counted "
+                  f"({summary['duplicates']:,} duplicates, {summary['invalid_age']:,} invalid ages, "
+                  f"{summary['new_icd_codes']} new ICD / {summary['new_cpt_codes']} new CPT codes) "
+                  f"in {time.perf_counter() - start:.2f}s")
+        if args.publish:
+            args.path = args.publish
+    if args.command == 'publish' or getattr(args, 'publish', None):
+        header = store.publish(args.path)
+        print(f"✅ Snapshot published: {args.path} (version {bundle_version(header)})")
+    stats = store.stats()
+    print(f"📊 {stats['rows']:,} rows over {stats['batches']} batches; "
+          f"{stats['icd_codes']:,} ICD codes, {stats['cpt_codes']:,} CPT codes")
+    if stats['icd_above_range'] or stats['cpt_above_range']:
+        print(f"⚠️  {stats['icd_above_range']} ICD / {stats['cpt_above_range']} CPT codes are counted past the "
+              f"model's training range and are scored at its edge; consider retraining")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
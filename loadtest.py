@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Load generator for the prediction APIs.
+
+Replays a mix of requests against a running api.py or app/api.py. The mix
+covers single /predict calls, /predict-batch calls of varying size and
+invalid inputs. Results are written as JSON for capacity planning: overall
+and per request kind, you get throughput, p50/p95/p99/max latency, status
+counts and error rates. It uses only asyncio and the standard library. A
+keep-alive pool of raw HTTP/1.1 connections talks to the server, so the
+client adds little work of its own.
+
+Two modes:
+
+    closed  --concurrency N users each send the next request as soon as
+            the previous one is answered (throughput at a given concurrency)
+    open    requests start at a constant --rate per second whatever the
+            response times (latency at a given arrival rate). Latency is
+            measured from each request's scheduled start. Time spent waiting
+            for one of the --connections connections therefore counts, and
+            an overloaded server shows up as growing latency instead of a
+            lower send rate (no coordinated omission).
+
+A request counts as an error on a transport failure, or if its status is
+not the expected one: 200 for valid payloads, 4xx for invalid ones.
+Requests that start during --warmup are sent but not reported.
+
+Usage:
+    python serve.py --workers 2 &
+    python loadtest.py --mode closed --concurrency 16 --duration 30
+    python loadtest.py --mode open --rate 300 --duration 60 -o peak.json
+    python loadtest.py --mix predict=0.5,batch=0.4,invalid=0.1 --batch-sizes 10,100,1000
+    python loadtest.py --target app --url http://localhost:5000    # app/api.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+# Endpoints per service; app/api.py has no batch endpoint
+TARGETS = {
+    'api': {'predict': '/predict', 'batch': '/predict-batch'},
+    'app': {'predict': '/api/predict', 'batch': None},
+}
+DEFAULT_MIX = {
+    'api': {'predict': 0.7, 'batch': 0.2, 'invalid': 0.1},
+    'app': {'predict': 0.9, 'invalid': 0.1},
+}
+KINDS = ('predict', 'batch', 'invalid')
+VARIANTS = 16  # pre-encoded payloads per kind (and batch size)
+
+
+class Payload:
+    """One pre-encoded request."""
+
+    def __init__(self, kind, path, body, rows, expect_error=False):
+        self.kind = kind
+        self.path = path
+        self.body = body
+        self.rows = rows
+        self.expect_error = expect_error
+
+
+def make_patient(rng):
+    """One random in-range patient in the APIs' JSON format."""
+    return {
+        'age': rng.randint(1, 120),
+        'gender': rng.choice(('Male', 'Female')),
+        'icd_frequency': rng.randint(1, 683),
+        'cpt_frequency': rng.randint(1, 1815),
+        'month': rng.randint(1, 6),
+    }
+
+
+def invalid_bodies(rng, target):
+    """(endpoint, body) pairs of well-formed JSON with invalid records, which must get a 4xx."""
+    missing = make_patient(rng)
+    del missing['month']
+    bodies = [('predict', missing), ('predict', dict(make_patient(rng), age='forty'))]
+    if target == 'api':
+        # app/api.py passes these through to the model
+        bodies += [
+            ('predict', dict(make_patient(rng), age=150)),
+            ('predict', dict(make_patient(rng), gender='Unknown')),
+            ('predict', dict(make_patient(rng), month=13)),
+            ('batch', {'records': [make_patient(rng)]}),
+        ]
+    return [(endpoint, json.dumps(body)) for endpoint, body in bodies]
+
+
+def build_payloads(target, mix, batch_sizes, seed=0):
+    """Pre-encoded payloads per kind, so the timed loop does no JSON work."""
+    rng = random.Random(seed)
+    paths = TARGETS[target]
+    payloads = {}
+    if mix.get('predict'):
+        payloads['predict'] = [Payload('predict', paths['predict'], json.dumps(make_patient(rng)).encode(), 1)
+                               for _ in range(VARIANTS)]
+    if mix.get('batch'):
+        payloads['batch'] = [
+            Payload(f'batch[{n}]', paths['batch'],
+                    json.dumps({'patients': [make_patient(rng) for _ in range(n)]}).encode(), n)
+            for n in batch_sizes for _ in range(max(VARIANTS // len(batch_sizes), 1))
+        ]
+    if mix.get('invalid'):
+        payloads['invalid'] = [Payload('invalid', paths[endpoint], body.encode(), 0, expect_error=True)
+                               for endpoint, body in invalid_bodies(rng, target)]
+    return payloads
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection; reopened when the server closes it."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, path, body):
+        """POST body to path; returns (status, response body)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f'POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n'.encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            content = b''.join(chunks)
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close' or version == b'HTTP/1.0':
+            self.close()
+        return int(status), content
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadTest:
+    """
+    Drives one load test and collects per-request results.
+
+    Args:
+        url: Base URL of the service (http only)
+        payloads: build_payloads() output
+        mix: Kind -> weight
+        timeout: Seconds before a request counts as a transport error
+        seed: Seed for the request sequence
+    """
+
+    def __init__(self, url, payloads, mix, timeout=30.0, seed=0):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise ValueError(f"Only http:// URLs are supported, got {url!r}")
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 80
+        self.payloads = payloads
+        self.kinds = [kind for kind in KINDS if mix.get(kind)]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.results = []  # (kind, scheduled start, latency, status, ok, rows)
+
+    def next_payload(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        return self.rng.choice(self.payloads[kind])
+
+    async def send(self, connection, payload, scheduled):
+        """Send one payload and record its result; latency counts from `scheduled`."""
+        try:
+            status, _ = await asyncio.wait_for(connection.request(payload.path, payload.body), self.timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            connection.close()
+            status = 0
+        latency = time.perf_counter() - scheduled
+        ok = (400 <= status < 500) if payload.expect_error else status == 200
+        self.results.append((payload.kind, scheduled, latency, status, ok, payload.rows))
+
+    async def closed_loop(self, concurrency, duration):
+        """`concurrency` users sending back to back for `duration` seconds."""
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            connection = Connection(self.host, self.port)
+            try:
+                while time.perf_counter() < deadline:
+                    await self.send(connection, self.next_payload(), time.perf_counter())
+            finally:
+                connection.close()
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def open_loop(self, rate, duration, connections):
+        """Requests started at `rate` per second for `duration` seconds over a pool of connections."""
+        pool = asyncio.Queue()
+        for _ in range(connections):
+            pool.put_nowait(Connection(self.host, self.port))
+
+        async def request(payload, scheduled):
+            connection = await pool.get()
+            try:
+                await self.send(connection, payload, scheduled)
+            finally:
+                pool.put_nowait(connection)
+
+        start = time.perf_counter()
+        tasks = []
+        for i in range(int(rate * duration)):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(request(self.next_payload(), scheduled)))
+        await asyncio.gather(*tasks)
+        while not pool.empty():
+            pool.get_nowait().close()
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+
+def summarize(results, window):
+    """Throughput, latency percentiles (ms), status counts and error rate for a list of results."""
+    latencies = sorted(r[2] for r in results)
+    errors = sum(1 for r in results if not r[4])
+    statuses = {}
+    for r in results:
+        statuses[str(r[3])] = statuses.get(str(r[3]), 0) + 1
+    summary = {
+        'requests': len(results),
+        'throughput_rps': len(results) / window,
+        'rows_per_s': sum(r[5] for r in results if r[4]) / window,
+        'errors': errors,
+        'error_rate': errors / len(results) if results else 0.0,
+        'transport_errors': statuses.get('0', 0),
+        'status_counts': dict(sorted(statuses.items())),
+    }
+    if latencies:
+        summary['latency_ms'] = {
+            'mean': sum(latencies) / len(latencies) * 1e3,
+            'p50': percentile(latencies, 0.50) * 1e3,
+            'p95': percentile(latencies, 0.95) * 1e3,
+            'p99': percentile(latencies, 0.99) * 1e3,
+            'max': latencies[-1] * 1e3,
+        }
+    return summary
+
+
+def report(test, args, started_at, started, measured_from, finished):
+    """Machine-readable report of the requests that started after the warm-up."""
+    results = [r for r in test.results if r[1] >= measured_from]
+    window = max(finished - measured_from, 1e-9)
+    by_kind = {}
+    for r in results:
+        by_kind.setdefault(r[0], []).append(r)
+    return {
+        'target': args.target,
+        'url': args.url,
+        'mode': args.mode,
+        'concurrency': args.concurrency if args.mode == 'closed' else None,
+        'rate': args.rate if args.mode == 'open' else None,
+        'connections': args.connections if args.mode == 'open' else None,
+        'mix': dict(zip(test.kinds, test.weights)),
+        'batch_sizes': args.batch_sizes if 'batch' in test.kinds else None,
+        'warmup_s': args.warmup,
+        'duration_s': window,
+        'elapsed_s': finished - started,
+        'started_at': started_at,
+        **summarize(results, window),
+        'by_kind': {kind: summarize(rs, window) for kind, rs in sorted(by_kind.items())},
+    }
+
+
+def parse_mix(text):
+    """'predict=0.7,batch=0.2,invalid=0.1' -> {'predict': 0.7, ...}"""
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}; use {', '.join(KINDS)}")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight in {item!r}") from None
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs at least one positive weight')
+    return mix
+
+
+def parse_sizes(text):
+    try:
+        sizes = [int(size) for size in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad batch sizes {text!r}") from None
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError('batch sizes must be positive')
+    return sizes
+
+
+def print_summary(result, out=sys.stderr):
+    mode = (f"{result['concurrency']} concurrent" if result['mode'] == 'closed'
+            else f"{result['rate']:g} req/s offered")
+    print(f"📈 {result['target']} at {result['url']} ({result['mode']} loop, {mode}, "
+          f"{result['duration_s']:.1f}s measured)", file=out)
+    rows = [('all', result)] + list(result['by_kind'].items())
+    print(f"   {'kind':<16} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'errors':>8}", file=out)
+    for kind, summary in rows:
+        latency = summary.get('latency_ms', dict.fromkeys(('p50', 'p95', 'p99', 'max'), float('nan')))
+        print(f"   {kind:<16} {summary['requests']:>9,} {summary['throughput_rps']:>9.1f} {latency['p50']:>9.2f} "
+              f"{latency['p95']:>9.2f} {latency['p99']:>9.2f} {latency['max']:>9.2f} "
+              f"{summary['error_rate']:>7.2%}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the prediction APIs')
+    parser.add_argument('--url', default='http://localhost:5000', help='Service base URL (default: %(default)s)')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='api',
+                        help='api (api.py) or app (app/api.py) endpoints (default: api)')
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed')
+    parser.add_argument('--concurrency', type=int, default=8, help='Closed loop: concurrent users (default: 8)')
+    parser.add_argument('--rate', type=float, default=100.0, help='Open loop: requests per second (default: 100)')
+    parser.add_argument('--connections', type=int, default=64,
+                        help='Open loop: connection pool size (default: 64)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load, warm-up included')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds not reported (default: 2)')
+    parser.add_argument('--mix', type=parse_mix, help='Kind weights, e.g. predict=0.7,batch=0.2,invalid=0.1 '
+                                                      '(default depends on --target)')
+    parser.add_argument('--batch-sizes', type=parse_sizes, default=[10, 100, 1000],
+                        help='Rows per /predict-batch request, picked uniformly (default: 10,100,1000)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--max-error-rate', type=float,
+                        help='Exit with status 1 if the overall error rate is above this')
+    args = parser.parse_args(argv)
+
+    mix = args.mix or DEFAULT_MIX[args.target]
+    if mix.get('batch') and TARGETS[args.target]['batch'] is None:
+        parser.error(f"--target {args.target} has no batch endpoint; drop batch from --mix")
+    if args.warmup >= args.duration:
+        parser.error('--warmup must be shorter than --duration')
+
+    payloads = build_payloads(args.target, mix, args.batch_sizes, args.seed)
+    try:
+        test = LoadTest(args.url, payloads, mix, args.timeout, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    started = time.perf_counter()
+    if args.mode == 'closed':
+        asyncio.run(test.closed_loop(args.concurrency, args.duration))
+    else:
+        asyncio.run(test.open_loop(args.rate, args.duration, args.connections))
+    result = report(test, args, started_at, started, started + args.warmup, time.perf_counter())
+
+    print_summary(result)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.max_error_rate is not None and result['error_rate'] > args.max_error_rate:
+        print(f"❌ Error rate {result['error_rate']:.2%} above {args.max_error_rate:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
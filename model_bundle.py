@@ -0,0 +1,340 @@
+"""
+Single-file, versioned model bundle.
+
+Replaces the loose pickles (model.pkl, scaler.pkl, features.pkl and the
+ICD/CPT mappings) with one file that loads with NumPy alone: no sklearn
+import and no unpickling of arbitrary objects.
+
+Layout (all integers little-endian):
+
+    offset 0   8 bytes   magic b'IECBNDL\\0'
+    offset 8   4 bytes   uint32 length of the JSON header
+    offset 12  ...       UTF-8 JSON header
+    (padding to a 64-byte boundary)
+    data       ...       raw arrays, each starting on a 64-byte boundary
+
+The header holds the schema version, feature order, metrics, the SHA-256 of
+the data section, and for every array its dtype, shape and offset into the
+data section. `header_sha256` covers the rest of the header (including
+data_sha256), and the bundle's version is taken from it, so a change to
+either the arrays or the header gives a new version. The header is always
+checked on load. Arrays are returned as read-only views over a memory map,
+so loading costs a header parse plus (optionally) one checksum pass over
+the data.
+
+Arrays:
+    coef, scaler_min, scaler_scale     (n_features,) float64
+    intercept                          (1,) float64
+    <table>_codes, <table>_counts      normalized code table, e.g. icd_codes
+
+A bundle may also hold only the code tables (export_code_tables); that is
+how frequency_store.py publishes updated ICD/CPT frequency snapshots.
+
+Usage:
+    export_bundle('model.bundle', model, scaler, FEATURES, metrics, icd_mapping=..., cpt_mapping=...)
+    bundle = load_bundle('model.bundle')
+    engine = bundle.engine()
+    icd_index = bundle.code_index('icd')
+
+Run `python model_bundle.py inspect model.bundle` to print a bundle's header.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+BUNDLE_MAGIC = b'IECBNDL\0'
+SCHEMA_VERSION = 2
+ALIGNMENT = 64
+DEFAULT_BUNDLE_PATH = 'model.bundle'
+
+_PREFIX = struct.Struct('<8sI')
+
+
+class BundleError(ValueError):
+    """The file is not a valid model bundle (bad magic, schema, layout or checksum)."""
+
+
+def _header_bytes(header):
+    return json.dumps(header, sort_keys=True).encode('utf-8')
+
+
+def _header_sha256(header):
+    """SHA-256 of the header without its own digest field."""
+    return hashlib.sha256(_header_bytes({k: v for k, v in header.items() if k != 'header_sha256'})).hexdigest()
+
+
+def bundle_version(header):
+    """Content version of a bundle header: changes with any array or header field."""
+    return header['header_sha256'][:12]
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def table_arrays(counts):
+    """
+    (codes, counts) arrays for a code -> count dict, sorted by code.
+
+    String codes are stored as UTF-8 bytes. Numeric codes (raw CPT codes,
+    which pandas reads as floats) are stored as float64.
+    """
+    codes = sorted(counts)
+    if all(isinstance(code, str) for code in codes):
+        code_array = np.array([code.encode('utf-8') for code in codes], dtype=np.bytes_)
+    else:
+        code_array = np.array(codes, dtype=np.float64)
+    return code_array, np.array([counts[code] for code in codes], dtype=np.int64)
+
+
+def table_from_arrays(codes, counts):
+    """Inverse of table_arrays()."""
+    if codes.dtype.kind == 'S':
+        return dict(zip((code.decode('utf-8') for code in codes.tolist()), counts.tolist()))
+    return dict(zip(codes.tolist(), counts.tolist()))
+
+
+def _code_table_arrays(mapping):
+    """Normalized (codes, counts, fallback) for a raw ICD/CPT frequency mapping."""
+    from code_index import CodeFrequencyIndex
+
+    index = CodeFrequencyIndex(mapping)
+    codes, counts = table_arrays(index.table)
+    return codes, counts, index.fallback
+
+
+def write_bundle(path, arrays, header):
+    """
+    Write arrays plus a JSON header as a bundle file (atomically).
+
+    Args:
+        path: Output file
+        arrays: dict of name -> numpy array (numeric or fixed-width bytes)
+        header: JSON-serializable dict; `schema_version`, `arrays`,
+            `data_sha256` and `header_sha256` are filled in here
+
+    Returns:
+        The header as written
+    """
+    layout = {}
+    chunks = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.kind not in 'fiuS':
+            raise TypeError(f"Array {name!r} has unsupported dtype {array.dtype}")
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        offset = _aligned(offset)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        chunks.append((offset, array.tobytes()))
+        offset += array.nbytes
+
+    data = bytearray(offset)
+    for start, raw in chunks:
+        data[start:start + len(raw)] = raw
+
+    header = dict(header, schema_version=SCHEMA_VERSION, arrays=layout,
+                  data_sha256=hashlib.sha256(data).hexdigest())
+    header['header_sha256'] = _header_sha256(header)
+    header_bytes = _header_bytes(header)
+    data_start = _aligned(_PREFIX.size + len(header_bytes))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(BUNDLE_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - _PREFIX.size - len(header_bytes)))
+        f.write(data)
+    os.replace(tmp_path, path)
+    return header
+
+
+def export_bundle(path, model, scaler, features, metrics=None, icd_mapping=None, cpt_mapping=None):
+    """
+    Export a fitted MinMaxScaler + binary LogisticRegression as a bundle.
+
+    Args:
+        path: Output file (e.g. model.bundle)
+        model: Fitted LogisticRegression
+        scaler: Fitted MinMaxScaler
+        features: Feature names, in model order
+        metrics: Optional dict of evaluation metrics
+        icd_mapping, cpt_mapping: Optional raw code -> frequency mappings
+
+    Returns:
+        The header as written
+    """
+    arrays = {
+        'coef': np.asarray(model.coef_, dtype=np.float64).ravel(),
+        'intercept': np.asarray(model.intercept_, dtype=np.float64).ravel(),
+        'scaler_min': np.asarray(scaler.min_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    header = {
+        'model_type': type(model).__name__,
+        'scaler_type': type(scaler).__name__,
+        'features': list(features),
+        'metrics': {name: float(value) for name, value in (metrics or {}).items()},
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    _add_code_tables(arrays, header, icd_mapping, cpt_mapping)
+    return write_bundle(path, arrays, header)
+
+
+def export_code_tables(path, icd_mapping, cpt_mapping, header=None):
+    """
+    Write a bundle holding only the ICD/CPT frequency tables.
+
+    Args:
+        path: Output file
+        icd_mapping, cpt_mapping: code -> frequency mappings
+        header: Optional extra JSON-serializable header fields
+
+    Returns:
+        The header as written
+    """
+    arrays = {}
+    header = dict(header or {}, created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    _add_code_tables(arrays, header, icd_mapping, cpt_mapping)
+    return write_bundle(path, arrays, header)
+
+
+def _add_code_tables(arrays, header, icd_mapping, cpt_mapping):
+    header['code_tables'] = {}
+    for table, mapping in (('icd', icd_mapping), ('cpt', cpt_mapping)):
+        if mapping is None:
+            continue
+        codes, counts, fallback = _code_table_arrays(mapping)
+        arrays[f'{table}_codes'] = codes
+        arrays[f'{table}_counts'] = counts
+        header['code_tables'][table] = {'fallback': fallback, 'size': len(codes)}
+
+
+class ModelBundleFile:
+    """A loaded bundle: header fields plus read-only array views."""
+
+    def __init__(self, path, header, arrays):
+        self.path = path
+        self.header = header
+        self.arrays = arrays
+        self.schema_version = header['schema_version']
+        self.features = header.get('features', [])
+        self.metrics = header.get('metrics', {})
+        self.version = bundle_version(header)
+
+    def engine(self):
+        """FusedLogisticScorer with the scaler folded into the coefficients."""
+        from scoring_engine import FusedLogisticScorer
+
+        coef = self.arrays['coef']
+        return FusedLogisticScorer(
+            weights=self.arrays['scaler_scale'] * coef,
+            bias=float(self.arrays['scaler_min'] @ coef + self.arrays['intercept'][0]),
+            feature_names=self.features
+        )
+
+    def code_index(self, table):
+        """CodeFrequencyIndex for the 'icd' or 'cpt' table."""
+        from code_index import CodeFrequencyIndex
+
+        if table not in self.header.get('code_tables', {}):
+            raise KeyError(f"Bundle has no {table!r} code table")
+        mapping = table_from_arrays(self.arrays[f'{table}_codes'], self.arrays[f'{table}_counts'])
+        return CodeFrequencyIndex(mapping, fallback=self.header['code_tables'][table]['fallback'])
+
+    def info(self):
+        """Model description for the /info endpoints."""
+        return {
+            'model_type': self.header['model_type'],
+            'model_version': self.version,
+            'schema_version': self.schema_version,
+            'created_at': self.header.get('created_at'),
+            'features': self.features,
+            'coefficients': dict(zip(self.features, self.arrays['coef'].tolist())),
+            'intercept': float(self.arrays['intercept'][0]),
+            'metrics': self.metrics,
+        }
+
+
+def load_bundle(path=DEFAULT_BUNDLE_PATH, verify=True):
+    """
+    Memory-map a bundle file.
+
+    Args:
+        path: Bundle file
+        verify: Check the data section against its SHA-256 (reads the whole
+            file); the header is checked either way
+
+    Returns:
+        ModelBundleFile
+
+    Raises:
+        BundleError for a wrong magic, unsupported schema, a header or array
+        layout that does not fit the file, or a bad checksum
+    """
+    try:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    except ValueError:  # numpy cannot map an empty file
+        raise BundleError(f"{path} is too short to be a model bundle") from None
+    if buffer.size < _PREFIX.size:
+        raise BundleError(f"{path} is too short to be a model bundle")
+    magic, header_length = _PREFIX.unpack(buffer[:_PREFIX.size].tobytes())
+    if magic != BUNDLE_MAGIC:
+        raise BundleError(f"{path} is not a model bundle (bad magic {magic!r})")
+
+    header_end = _PREFIX.size + header_length
+    if header_end > buffer.size:
+        raise BundleError(f"{path}: header length {header_length} runs past the end of the file")
+    header_bytes = buffer[_PREFIX.size:header_end].tobytes()
+    try:
+        header = json.loads(header_bytes.decode('utf-8'))
+    except ValueError as e:  # UnicodeDecodeError and JSONDecodeError
+        raise BundleError(f"{path}: unreadable header ({e})") from None
+    if not isinstance(header, dict):
+        raise BundleError(f"{path}: header is not a JSON object")
+    if header.get('schema_version') != SCHEMA_VERSION:
+        raise BundleError(f"{path} has schema version {header.get('schema_version')}, "
+                          f"this loader reads version {SCHEMA_VERSION}")
+    if header.get('header_sha256') != _header_sha256(header) or _header_bytes(header) != header_bytes:
+        raise BundleError(f"{path} failed its header checksum; the file is corrupt")
+    if not isinstance(header.get('arrays'), dict) or not isinstance(header.get('data_sha256'), str):
+        raise BundleError(f"{path}: header has no array layout or data checksum")
+
+    data = buffer[_aligned(header_end):]
+    if verify and hashlib.sha256(data).hexdigest() != header['data_sha256']:
+        raise BundleError(f"{path} failed its checksum; the file is corrupt or truncated")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        try:
+            dtype = np.dtype(spec['dtype'])
+            shape = [int(n) for n in spec['shape']]
+            offset = int(spec['offset'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise BundleError(f"{path}: array {name!r} has an invalid layout ({e})") from None
+        if dtype.kind not in 'fiuS':
+            raise BundleError(f"{path}: array {name!r} has unsupported dtype {dtype}")
+        count = int(np.prod(shape, dtype=np.int64))
+        if offset < 0 or min(shape, default=0) < 0 or offset + count * dtype.itemsize > data.size:
+            raise BundleError(f"{path}: array {name!r} runs past the end of the file")
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    return ModelBundleFile(path, header, arrays)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'inspect':
+        sys.exit("Usage: python model_bundle.py inspect [model.bundle]\n"
+                 "Bundles are written by: python export_model.py")
+    bundle = load_bundle(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BUNDLE_PATH)
+    print(f"✓ {bundle.path}: schema v{bundle.schema_version}, version {bundle.version}, "
+          f"{os.path.getsize(bundle.path):,} bytes")
+    print(json.dumps({k: v for k, v in bundle.header.items() if k != 'arrays'}, indent=2))
+    for name, array in bundle.arrays.items():
+        print(f"   {name}: {array.dtype} {array.shape}")
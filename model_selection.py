@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Model selection with inference cost next to accuracy.
+
+Runs stratified k-fold cross-validation for each candidate model, with the
+folds spread over all cores (n_jobs=-1). Each candidate is a MinMaxScaler
+followed by the classifier, and the scaler is refit inside every fold.
+Each candidate is then fit on the full data, as export_model.train_model
+does, and timed the way it would be served:
+
+    - linear models (coef_ + intercept_) through the FusedLogisticScorer
+      that api.py, predictor.py and the app service use
+    - anything else through scaler.transform + predict_proba
+
+Reported per candidate: CV accuracy / F1 / ROC-AUC (mean ± std), training
+time, single-row p50/p99 latency, batch throughput and serialized size
+(pickle, and model.bundle where the model can be bundled). Sizes leave out
+the ICD/CPT tables, which are the same for every candidate.
+
+The winner is the candidate with the highest CV ROC-AUC that fits the
+latency budget and can be served from model.bundle. With --export it is
+written through export_model.save_artifacts / save_bundle. Non-linear
+candidates are reported for comparison only: the services' scoring
+engine is a fused logistic model.
+
+Usage:
+    python model_selection.py
+    python model_selection.py --folds 10 --p99-budget-ms 0.05 --export --output-dir build/
+    python model_selection.py --candidates logistic_regression,random_forest --json selection.json
+"""
+
+import argparse
+import json
+import os
+import pickle
+import statistics
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedKFold, cross_validate
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from export_model import DEFAULT_DATA_PATH, SCRIPT_DIR, evaluate_model, prepare_training_data, save_artifacts, \
+    save_bundle
+from feature_pipeline import FEATURES
+from model_bundle import export_bundle
+from scoring_engine import FusedLogisticScorer
+
+CANDIDATES = {
+    # Same settings as export_model.train_model
+    'logistic_regression': lambda: LogisticRegression(
+        random_state=42, max_iter=1000, solver='lbfgs', class_weight='balanced'),
+    'sgd_logistic': lambda: SGDClassifier(
+        loss='log_loss', class_weight='balanced', random_state=42),
+    'decision_tree': lambda: DecisionTreeClassifier(
+        max_depth=8, class_weight='balanced', random_state=42),
+    # The notebook's alternative model
+    'random_forest': lambda: RandomForestClassifier(
+        n_estimators=100, class_weight='balanced', random_state=42, n_jobs=1),
+    'hist_gradient_boosting': lambda: HistGradientBoostingClassifier(
+        class_weight='balanced', random_state=42),
+}
+
+SCORING = {'accuracy': 'accuracy', 'f1': 'f1', 'roc_auc': 'roc_auc'}
+
+
+def is_bundleable(model):
+    """True for binary linear models that model.bundle / FusedLogisticScorer can serve."""
+    coef = getattr(model, 'coef_', None)
+    return coef is not None and np.shape(coef)[0] == 1 and list(model.classes_) == [0, 1]
+
+
+def cross_validate_candidate(estimator, X, y, folds, n_jobs):
+    """Stratified k-fold metrics for MinMaxScaler + estimator."""
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    scores = cross_validate(make_pipeline(MinMaxScaler(), estimator), X, y, cv=cv, scoring=SCORING, n_jobs=n_jobs)
+    return {
+        **{f'cv_{name}': float(np.mean(scores[f'test_{name}'])) for name in SCORING},
+        **{f'cv_{name}_std': float(np.std(scores[f'test_{name}'])) for name in SCORING},
+        'cv_fit_seconds': float(np.mean(scores['fit_time'])),
+    }
+
+
+def serving_scorer(model, scaler):
+    """(predict_positive_probability, engine_name) as the model would be served."""
+    if is_bundleable(model):
+        engine = FusedLogisticScorer.from_sklearn(model, scaler, FEATURES)
+        return engine.eligible_probability, 'fused'
+    return (lambda X: model.predict_proba(scaler.transform(X))[:, 1]), 'sklearn'
+
+
+def measure_inference(score, X, single_calls=500, batch_repeats=5):
+    """Single-row latency percentiles and whole-matrix throughput."""
+    rows = [X[i:i + 1] for i in range(min(single_calls, len(X)))]
+    for row in rows[:20]:
+        score(row)  # warm-up
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        score(row)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    batch = []
+    for _ in range(batch_repeats):
+        start = time.perf_counter()
+        score(X)
+        batch.append(time.perf_counter() - start)
+    return {
+        'p50_ms': timings[len(timings) // 2] * 1e3,
+        'p99_ms': timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e3,
+        'batch_rows_per_second': len(X) / statistics.median(batch),
+    }
+
+
+def serialized_sizes(model, scaler):
+    """Pickle size of model + scaler, and model.bundle size where bundleable."""
+    sizes = {'pickle_bytes': len(pickle.dumps(model)) + len(pickle.dumps(scaler)), 'bundle_bytes': None}
+    if is_bundleable(model):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.bundle')
+            export_bundle(path, model, scaler, FEATURES)
+            sizes['bundle_bytes'] = os.path.getsize(path)
+    return sizes
+
+
+def evaluate_candidate(name, X, y, folds=5, n_jobs=-1, single_calls=500):
+    """
+    Cross-validate one candidate, then fit it on all rows and time inference.
+
+    Returns:
+        (report dict, fitted model, fitted scaler)
+    """
+    estimator = CANDIDATES[name]()
+    report = {'name': name}
+    report.update(cross_validate_candidate(estimator, X, y, folds, n_jobs))
+
+    start = time.perf_counter()
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    X_scaled = scaler.fit_transform(X)
+    model = clone(estimator).fit(X_scaled, y)
+    report['train_seconds'] = time.perf_counter() - start
+
+    score, report['engine'] = serving_scorer(model, scaler)
+    report.update(measure_inference(score, X, single_calls))
+    report.update(serialized_sizes(model, scaler))
+    report['bundleable'] = is_bundleable(model)
+    return report, model, scaler
+
+
+def pick_winner(reports, p99_budget_ms=None):
+    """Highest CV ROC-AUC among bundleable candidates within the p99 budget (or None)."""
+    eligible = [
+        report for report in reports
+        if report['bundleable'] and (p99_budget_ms is None or report['p99_ms'] <= p99_budget_ms)
+    ]
+    return max(eligible, key=lambda report: report['cv_roc_auc'], default=None)
+
+
+def format_bytes(n):
+    if n is None:
+        return '-'
+    return f"{n / 1024:.1f} KB" if n < 1 << 20 else f"{n / (1 << 20):.1f} MB"
+
+
+def print_table(reports, winner):
+    print(f"\n{'candidate':<24} {'accuracy':>8} {'f1':>6} {'roc_auc':>13} {'train':>8} {'engine':>7} "
+          f"{'p50':>9} {'p99':>9} {'rows/s':>12} {'pickle':>9} {'bundle':>9}")
+    for report in reports:
+        marker = ' 🏆' if winner is not None and report['name'] == winner['name'] else ''
+        print(f"{report['name']:<24} {report['cv_accuracy']:>8.4f} {report['cv_f1']:>6.4f} "
+              f"{report['cv_roc_auc']:>6.4f}±{report['cv_roc_auc_std']:.4f} {report['train_seconds']:>7.2f}s "
+              f"{report['engine']:>7} {report['p50_ms']:>7.3f}ms {report['p99_ms']:>7.3f}ms "
+              f"{report['batch_rows_per_second']:>12,.0f} {format_bytes(report['pickle_bytes']):>9} "
+              f"{format_bytes(report['bundle_bytes']):>9}{marker}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate candidate models and report inference cost')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='Raw claims CSV')
+    parser.add_argument('--candidates', default=','.join(CANDIDATES),
+                        help='Comma-separated candidates (default: all of %(default)s)')
+    parser.add_argument('--folds', type=int, default=5, help='Stratified k-fold splits')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Parallel fold fits (-1: all cores)')
+    parser.add_argument('--single-calls', type=int, default=500, help='Single-row calls timed per candidate')
+    parser.add_argument('--p99-budget-ms', type=float, help='Only candidates with single-row p99 within this can win')
+    parser.add_argument('--export', action='store_true', help='Export the winner through export_model')
+    parser.add_argument('--output-dir', default=SCRIPT_DIR, help='Where --export writes the artifacts')
+    parser.add_argument('--json', help='Write the full report to this file')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.candidates.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(CANDIDATES))
+    if unknown:
+        parser.error(f"unknown candidates: {', '.join(unknown)} (choose from {', '.join(CANDIDATES)})")
+
+    X, y, icd_mapping, cpt_mapping = prepare_training_data(args.data)
+    X = X.to_numpy(dtype=np.float64)
+    y = y.to_numpy()
+    print(f"📊 {len(X):,} rows, {args.folds}-fold stratified CV, n_jobs={args.n_jobs} "
+          f"({os.cpu_count() or 1} core(s))")
+
+    reports, fitted = [], {}
+    for name in names:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=UserWarning)
+            report, model, scaler = evaluate_candidate(name, X, y, args.folds, args.n_jobs, args.single_calls)
+        reports.append(report)
+        fitted[name] = (model, scaler)
+        print(f"   ✓ {name}: ROC-AUC {report['cv_roc_auc']:.4f}, p99 {report['p99_ms']:.3f}ms", flush=True)
+
+    winner = pick_winner(reports, args.p99_budget_ms)
+    print_table(reports, winner)
+
+    best_overall = max(reports, key=lambda report: report['cv_roc_auc'])
+    if winner is None:
+        print("\n⚠️  No bundleable candidate fits the latency budget; nothing to export")
+    else:
+        print(f"\n🏆 Winner: {winner['name']} (CV ROC-AUC {winner['cv_roc_auc']:.4f}, p99 {winner['p99_ms']:.3f}ms)")
+        if best_overall is not winner:
+            print(f"   {best_overall['name']} scores higher (ROC-AUC {best_overall['cv_roc_auc']:.4f}) but "
+                  f"{'cannot be served from model.bundle' if not best_overall['bundleable'] else 'misses the budget'}")
+
+    if args.export and winner is not None:
+        model, scaler = fitted[winner['name']]
+        os.makedirs(args.output_dir, exist_ok=True)
+        metrics = evaluate_model(model, scaler.transform(X), y)
+        save_artifacts(model, scaler, icd_mapping, cpt_mapping, args.output_dir)
+        bundle_path = save_bundle(model, scaler, icd_mapping, cpt_mapping, metrics, args.output_dir)
+        print(f"✅ Exported {winner['name']} to {args.output_dir} (pickles + {os.path.basename(bundle_path)})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'rows': len(X), 'folds': args.folds, 'p99_budget_ms': args.p99_budget_ms,
+                'winner': winner['name'] if winner else None, 'candidates': reports,
+            }, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Zero-downtime hot-swap of the serving model.
+
+ModelSlot holds the ServingModel that requests are scored with behind a
+single reference. A request reads `slot.get()` once and uses that snapshot
+throughout, so a swap never changes the model under an in-flight request: it
+finishes on the version it started with and the next request gets the new
+one. Replacing the bundle file does not disturb the old snapshot either:
+write_bundle renames the new file into place, and the old memory map keeps
+the old inode.
+
+A reload is triggered by:
+    - the file watch: get() re-checks the bundle's mtime/size/inode at most
+      every `check_interval` seconds, like PublishedCodeTables
+    - SIGHUP, with install_sighup_handler(slot)
+    - an admin endpoint calling slot.reload()
+
+The new bundle is loaded on a background thread. The checksum is verified,
+then the bundle is validated:
+
+- same features as the serving model
+- ICD/CPT tables present
+- canary rows across the training range score to finite probabilities in
+  [0, 1]
+
+It is then warmed up by scoring a batch and resolving codes, and only after
+that swapped in. A bundle that fails is reported in stats()['last_error'],
+and the current model keeps serving.
+
+Usage:
+    slot = ModelSlot('model.bundle')
+    served = slot.get()
+    probabilities = served.engine.eligible_probability(X)
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from model_bundle import BundleError, load_bundle
+
+
+class ServingModel(NamedTuple):
+    """Immutable snapshot of everything a request scores with."""
+    bundle: object
+    engine: object
+    code_indexes: tuple
+    version: str
+    signature: tuple
+    loaded_at: float
+    load_seconds: float
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _training_range_rows(bundle, fractions):
+    """Raw feature rows at the given fractions of the scaler's training range."""
+    scale = bundle.arrays['scaler_scale']
+    offset = bundle.arrays['scaler_min']
+    safe_scale = np.where(scale == 0, 1.0, scale)
+    return (np.asarray(fractions, dtype=np.float64)[:, None] - offset) / safe_scale
+
+
+def load_serving_model(path, expected_features=None, warmup_rows=1024):
+    """
+    Load, validate and warm up a model bundle.
+
+    Args:
+        path: Bundle file
+        expected_features: Feature order the service sends (the serving
+            model's); None skips the check
+        warmup_rows: Rows scored once before the model is handed out
+
+    Returns:
+        ServingModel
+
+    Raises:
+        BundleError if the bundle is corrupt or fails validation
+        OSError if the file cannot be read
+    """
+    start = time.perf_counter()
+    signature = _file_signature(path)
+    bundle = load_bundle(path, verify=True)
+    if expected_features is not None and list(bundle.features) != list(expected_features):
+        raise BundleError(f"{path} expects features {bundle.features}, the service sends {list(expected_features)}")
+    try:
+        code_indexes = (bundle.code_index('icd'), bundle.code_index('cpt'))
+        engine = bundle.engine()
+    except KeyError as e:
+        raise BundleError(f"{path}: {e.args[0]}") from None
+
+    canary = engine.eligible_probability(_training_range_rows(bundle, [0.0, 0.25, 0.5, 0.75, 1.0]))
+    if canary.shape != (5,) or not np.all(np.isfinite(canary)) or canary.min() < 0 or canary.max() > 1:
+        raise BundleError(f"{path}: canary rows scored {canary.tolist()}, expected probabilities in [0, 1]")
+
+    # Warm-up: fault in the mapped pages and first-call paths before serving
+    rng = np.random.default_rng(0)
+    engine.eligible_probability(_training_range_rows(bundle, rng.random(1)))
+    engine.eligible_probability(_training_range_rows(bundle, rng.random(warmup_rows)))
+    for index in code_indexes:
+        index.lookup_many(['__warmup__'])
+
+    return ServingModel(
+        bundle=bundle,
+        engine=engine,
+        code_indexes=code_indexes,
+        version=bundle.version,
+        signature=signature,
+        loaded_at=time.time(),
+        load_seconds=time.perf_counter() - start,
+    )
+
+
+class ModelSlot:
+    """
+    The serving model, swappable at runtime.
+
+    Args:
+        path: Bundle file to serve and watch
+        check_interval: Seconds between file checks in get(); 0 disables the watch
+        on_swap: Optional callable(ServingModel), called after each load
+            (including the first)
+        expected_features: Feature order the first bundle must have (later
+            ones must match the serving model's)
+
+    Raises:
+        BundleError / OSError if the initial load fails
+    """
+
+    def __init__(self, path, check_interval=1.0, on_swap=None, expected_features=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_swap = on_swap
+        self._swap_count = 0
+        self._failed_reloads = 0
+        self._last_error = None
+        self._last_reason = None
+        self._failed_signature = None
+        self._next_check = 0.0
+        self._reset()
+        # A load thread does not survive fork (gunicorn --preload workers)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+        self._current = load_serving_model(path, expected_features)
+        self._next_check = time.monotonic() + check_interval
+        if on_swap is not None:
+            on_swap(self._current)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._loader = None
+
+    def get(self):
+        """The current ServingModel; may start a background reload if the file changed."""
+        current = self._current
+        if self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                signature = _file_signature(self.path)
+            except FileNotFoundError:
+                signature = None  # mid-deploy; keep serving
+            if signature is not None and signature != current.signature and signature != self._failed_signature:
+                self.reload('file change')
+        return current
+
+    def reload(self, reason='manual', wait=False):
+        """
+        Load the bundle again on a background thread and swap it in if valid.
+
+        A reload already in progress is reused rather than started twice.
+
+        Args:
+            reason: Recorded in stats() (e.g. 'SIGHUP', 'admin')
+            wait: Block until the load finished
+
+        Returns:
+            The ServingModel in use afterwards when wait=True, else None
+        """
+        with self._lock:
+            loader = self._loader
+            if loader is None or not loader.is_alive():
+                loader = threading.Thread(target=self._swap, args=(reason,), name='model-reload', daemon=True)
+                self._loader = loader
+                loader.start()
+        if wait:
+            loader.join()
+            return self._current
+        return None
+
+    def _swap(self, reason):
+        previous = self._current
+        try:
+            signature = _file_signature(self.path)
+        except OSError:
+            signature = None
+        try:
+            model = load_serving_model(self.path, expected_features=previous.bundle.features)
+        except Exception as e:  # keep serving the current model whatever went wrong
+            self._failed_signature = signature  # the watch skips this file until it changes again
+            self._failed_reloads += 1
+            self._last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️  Model reload ({reason}) failed, still serving {previous.version}: {self._last_error}")
+            return
+
+        self._current = model  # the swap: one reference assignment
+        self._swap_count += 1
+        self._last_reason = reason
+        self._last_error = None
+        self._failed_signature = None
+        if self.on_swap is not None:
+            self.on_swap(model)
+        print(f"🔄 Model swapped ({reason}): {previous.version} -> {model.version} "
+              f"in {model.load_seconds * 1e3:.1f}ms")
+
+    def stats(self):
+        """Serving version and reload history for /health."""
+        current = self._current
+        loader = self._loader
+        return {
+            'model_version': current.version,
+            'path': self.path,
+            'loaded_at': current.loaded_at,
+            'last_load_seconds': current.load_seconds,
+            'swap_count': self._swap_count,
+            'last_swap_reason': self._last_reason,
+            'failed_reloads': self._failed_reloads,
+            'last_error': self._last_error,
+            'reloading': loader is not None and loader.is_alive(),
+        }
+
+
+def install_sighup_handler(slot):
+    """
+    Reload the slot's model on SIGHUP.
+
+    Only possible from the main thread, on platforms with SIGHUP; returns
+    whether the handler was installed.
+    """
+    if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+        return False
+    def handle(signum, frame):
+        # The handler may interrupt a reload() holding the slot's lock; start from another thread
+        threading.Thread(target=slot.reload, args=('SIGHUP',), daemon=True).start()
+
+    signal.signal(signal.SIGHUP, handle)
+    return True
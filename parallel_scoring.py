@@ -0,0 +1,204 @@
+"""
+Multi-core bulk scoring over shared memory.
+
+ParallelScorer splits a raw feature matrix into row ranges and scores them
+on a process pool. The matrix is copied into a shared-memory block. Each
+worker maps that block and a shared output block, and writes its rows'
+probabilities in place. Only (start, stop) pairs travel through the pool's
+pipes; feature rows are never pickled. The blocks are kept between calls
+(and grown when needed) and workers attach to them once, so repeated calls
+don't pay for fresh page faults.
+
+input_buffer() hands out a feature matrix in its own shared block, which
+belongs to the caller. Workers read it in place. The scorer never writes to
+it, and it stays valid across other calls, regrows and close(). The block is
+freed when the array and every view of it are garbage collected. Workers
+keep at most MAX_ATTACHED_BLOCKS blocks mapped and close the least recently
+used one past that, so freed buffers do not stay mapped for the pool's
+lifetime.
+
+Usage:
+    predictor = InsuranceEligibilityPredictor.from_bundle()
+    with ParallelScorer.from_predictor(predictor, n_workers=4) as scorer:
+        probabilities = scorer.eligible_probability(X)   # X: (N, 5) raw features
+
+        # Zero-copy: build the features directly in shared memory
+        X = scorer.input_buffer(n_rows)
+        X[:] = ...
+        probabilities = scorer.eligible_probability(X)
+
+Run `python benchmarks/bench_parallel.py` for a 1..N core scaling run.
+"""
+
+import multiprocessing
+import os
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 262_144
+
+# Shared blocks a worker keeps mapped: the scorer's input and output blocks
+# plus a few caller-owned input buffers
+MAX_ATTACHED_BLOCKS = 4
+
+# Per-worker state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(engine):
+    _worker['engine'] = engine
+    _worker['blocks'] = OrderedDict()
+
+
+def _attached(name):
+    """This worker's mapping of a shared block, attached on first use."""
+    blocks = _worker['blocks']
+    block = blocks.pop(name, None)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+    blocks[name] = block
+    while len(blocks) > MAX_ATTACHED_BLOCKS:
+        _, oldest = blocks.popitem(last=False)
+        oldest.close()
+    return block
+
+
+def _release_block(block):
+    """Finalizer of an input_buffer() array: free its shared block."""
+    block.close()
+    block.unlink()
+
+
+def _score_range(task):
+    """Score rows [start, stop) of the shared input into the shared output."""
+    input_name, output_name, n_rows, n_features, start, stop = task
+    X = np.ndarray((n_rows, n_features), dtype=np.float64, buffer=_attached(input_name).buf)
+    out = np.ndarray((n_rows,), dtype=np.float64, buffer=_attached(output_name).buf)
+    out[start:stop] = _worker['engine'].eligible_probability(X[start:stop])
+    return stop - start
+
+
+class ParallelScorer:
+    """
+    Scores large feature matrices on a pool of worker processes.
+
+    Args:
+        engine: Scoring engine with eligible_probability(X), e.g. a
+            FusedLogisticScorer (sent to each worker once, at pool start)
+        n_workers: Worker processes (default: one per core)
+        chunk_size: Rows per task
+    """
+
+    def __init__(self, engine, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.engine = engine
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._input_block = None
+        self._output_block = None
+        self._buffers = {}  # id(array) -> (weakref to an input_buffer() array, its block name)
+
+    @classmethod
+    def from_predictor(cls, predictor, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Parallel scorer for an InsuranceEligibilityPredictor's engine."""
+        return cls(predictor.engine, n_workers=n_workers, chunk_size=chunk_size)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.n_workers, initializer=_init_worker, initargs=(self.engine,))
+        return self._pool
+
+    def eligible_probability(self, X):
+        """
+        P(eligible) for each row of X, as a 1-D array.
+
+        Small inputs (a single chunk) and n_workers=1 are scored in-process.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2-D feature matrix, got shape {X.shape}")
+        n_rows, n_features = X.shape
+        if self.n_workers == 1 or n_rows <= self.chunk_size:
+            return self.engine.eligible_probability(X)
+
+        buffer = self._buffers.get(id(X))
+        if buffer is not None and buffer[0]() is X:
+            input_name = buffer[1]  # an input_buffer() array: workers read it in place
+            _, output_block = self._shared_blocks(0, n_rows * 8)
+        else:
+            input_block, output_block = self._shared_blocks(X.nbytes, n_rows * 8)
+            np.ndarray(X.shape, dtype=np.float64, buffer=input_block.buf)[:] = X
+            input_name = input_block.name
+        tasks = [
+            (input_name, output_block.name, n_rows, n_features, start, min(start + self.chunk_size, n_rows))
+            for start in range(0, n_rows, self.chunk_size)
+        ]
+        scored = sum(self._get_pool().imap_unordered(_score_range, tasks))
+        if scored != n_rows:
+            raise RuntimeError(f"Scored {scored} of {n_rows} rows")
+        return np.ndarray((n_rows,), dtype=np.float64, buffer=output_block.buf).copy()
+
+    def input_buffer(self, n_rows, n_features=5):
+        """
+        A (n_rows, n_features) float64 array in a shared block of its own.
+
+        Fill it and pass it (the array itself, not a slice) to
+        eligible_probability() to skip copying the matrix into shared
+        memory. The caller owns it: later calls, regrows and close() leave
+        it intact, and its block is freed once the array and all views of
+        it are garbage collected.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(n_rows * n_features * 8, 1))
+        array = np.ndarray((n_rows, n_features), dtype=np.float64, buffer=block.buf)
+        weakref.finalize(array, _release_block, block)
+        # Stale ids (freed arrays) are dropped as new buffers are handed out
+        self._buffers = {key: entry for key, entry in self._buffers.items() if entry[0]() is not None}
+        self._buffers[id(array)] = (weakref.ref(array), block.name)
+        return array
+
+    def _shared_blocks(self, input_bytes, output_bytes):
+        """
+        Reuse the scorer's shared input/output blocks, replacing them if too
+        small. No array over these blocks is ever handed out, so replacing
+        them cannot pull memory from under a caller.
+        """
+        if self._input_block is None or self._input_block.size < input_bytes \
+                or self._output_block.size < output_bytes:
+            input_bytes = max(input_bytes, self._input_block.size if self._input_block else 1)
+            # Workers keep the old blocks mapped, so restart them with the pool
+            self.close()
+            self._input_block = shared_memory.SharedMemory(create=True, size=input_bytes)
+            self._output_block = shared_memory.SharedMemory(create=True, size=output_bytes)
+        return self._input_block, self._output_block
+
+    def predict_proba(self, X):
+        """(N, 2) class probabilities, same layout as the engine's predict_proba."""
+        p1 = self.eligible_probability(X)
+        return np.column_stack([1.0 - p1, p1])
+
+    def close(self):
+        """
+        Shut down the worker pool and free the scorer's shared blocks.
+
+        Arrays from input_buffer() stay valid; they are freed with the array.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for block in (self._input_block, self._output_block):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._input_block = self._output_block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
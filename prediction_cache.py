@@ -0,0 +1,113 @@
+"""
+Bounded memoization of single-row predictions.
+
+The model's inputs repeat a lot: gender has 2 values, month 6, and the
+ICD/CPT frequencies come from small fixed tables (the Streamlit form even
+pins cpt_frequency and month). PredictionCache keeps the most recently used
+feature rows and their eligible probability, so repeated rows never reach
+the model.
+
+Entries are keyed on (model version, feature tuple), so a model reload never
+serves a stale probability. Entries of the previous model are not dropped
+eagerly. During a hot swap, in-flight requests on the old snapshot and new
+requests on the new one interleave, and clearing on every version change
+would wipe the cache back and forth. The old model's rows simply stop being
+used and age out through LRU eviction.
+
+Usage:
+    cache = PredictionCache(maxsize=10000)
+    probability = cache.get(version, row)
+    if probability is None:
+        probability = score(row)
+        cache.put(version, row, probability)
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of eligible probabilities.
+
+    Args:
+        maxsize: Maximum number of feature rows kept; the least recently used
+            row is evicted when full
+    """
+
+    def __init__(self, maxsize=10000):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._version = None  # most recently used version, for stats()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _key(version, row):
+        # 45 and 45.0 are the same model input, so normalize to floats
+        return (version, *(float(value) for value in row))
+
+    def get(self, version, row):
+        """
+        Cached eligible probability for a feature row.
+
+        Returns:
+            The probability as a float, or None on a miss
+        """
+        key = self._key(version, row)
+        with self._lock:
+            self._version = version
+            probability = self._entries.get(key)
+            if probability is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return probability
+
+    def put(self, version, row, probability):
+        """Store a row's eligible probability under the given model version."""
+        key = self._key(version, row)
+        with self._lock:
+            self._version = version
+            self._entries[key] = float(probability)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            stats = {
+                'maxsize': self.maxsize,
+                'size': len(self._entries),
+                'model_version': self._version,
+                'hits': hits,
+                'misses': misses,
+                'evictions': self._evictions,
+            }
+        stats['hit_rate'] = hits / (hits + misses) if hits + misses else 0.0
+        return stats
+
+    def prometheus_lines(self):
+        """Cache counters in Prometheus text format (a ServiceMetrics extra collector)."""
+        stats = self.stats()
+        lines = []
+        for name in ('hits', 'misses', 'evictions'):
+            metric = f'prediction_cache_{name}_total'
+            lines += [f'# HELP {metric} Prediction cache {name}.', f'# TYPE {metric} counter',
+                      f'{metric} {stats[name]}']
+        lines += ['# HELP prediction_cache_size Rows currently cached.', '# TYPE prediction_cache_size gauge',
+                  f'prediction_cache_size {stats["size"]}']
+        return lines
@@ -4,6 +4,10 @@ import pickle
 import numpy as np
 from typing import Dict, Tuple
 
+from model_bundle import load_bundle
+from scoring_engine import FusedLogisticScorer
+from validation import PREDICTOR_SCHEMA
+
 class InsuranceEligibilityPredictor:
     """
     Production-ready insurance eligibility predictor.
@@ -19,6 +23,23 @@ class InsuranceEligibilityPredictor:
         self.model = pickle.load(open(model_path, 'rb'))
         self.scaler = pickle.load(open(scaler_path, 'rb'))
         self.features = pickle.load(open(features_path, 'rb'))
+        self.engine = FusedLogisticScorer.from_sklearn(self.model, self.scaler, self.features)
+    
+    @classmethod
+    def from_bundle(cls, bundle_path='model.bundle'):
+        """
+        Initialize from model.bundle instead of the pickles.
+        
+        Only NumPy is needed (sklearn is never imported); `model` and
+        `scaler` are None on predictors built this way.
+        """
+        bundle = load_bundle(bundle_path)
+        predictor = cls.__new__(cls)
+        predictor.model = None
+        predictor.scaler = None
+        predictor.features = bundle.features
+        predictor.engine = bundle.engine()
+        return predictor
     
     def predict(self, age: int, gender: str, icd_freq: int, cpt_freq: int, month: int) -> Dict:
         """
@@ -41,60 +62,66 @@ class InsuranceEligibilityPredictor:
                 'prediction_text': str
             }
         """
-        # Validate inputs
-        if not 1 <= age <= 120:
-            raise ValueError(f"Age must be 1-120, got {age}")
-        if gender.lower() not in ['male', 'female']:
-            raise ValueError(f"Gender must be 'male' or 'female', got {gender}")
-        if not 1 <= icd_freq <= 683:
-            raise ValueError(f"ICD frequency must be 1-683, got {icd_freq}")
-        if not 1 <= cpt_freq <= 1815:
-            raise ValueError(f"CPT frequency must be 1-1815, got {cpt_freq}")
-        if not 1 <= month <= 6:
-            raise ValueError(f"Month must be 1-6, got {month}")
-        
-        # Encode gender
-        gender_encoded = 1 if gender.lower() == 'male' else 0
+        # Validate and encode (raises ValueError listing every invalid field)
+        patient_data = PREDICTOR_SCHEMA.validate_one({
+            'age': age, 'gender': gender, 'icd_freq': icd_freq, 'cpt_freq': cpt_freq, 'month': month
+        }).reshape(1, -1)
         
-        # Prepare data
-        patient_data = np.array([[age, gender_encoded, icd_freq, cpt_freq, month]])
-        
-        # Scale
-        patient_scaled = self.scaler.transform(patient_data)
-        
-        # Predict
-        prediction = self.model.predict(patient_scaled)[0]
-        probabilities = self.model.predict_proba(patient_scaled)[0]
+        # Predict (decision is taken from the probabilities)
+        probabilities = self._predict_proba(patient_data)[0]
+        eligible = bool(probabilities[1] > 0.5)
         
         return {
-            'eligible': bool(prediction == 1),
+            'eligible': eligible,
             'confidence': float(max(probabilities)),
             'eligible_probability': float(probabilities[1]),
             'not_eligible_probability': float(probabilities[0]),
-            'prediction_text': 'ELIGIBLE' if prediction == 1 else 'NOT ELIGIBLE'
+            'prediction_text': 'ELIGIBLE' if eligible else 'NOT ELIGIBLE'
         }
     
     def predict_batch(self, patients: list) -> list:
         """
         Predict eligibility for multiple patients.
         
+        All rows are validated and encoded together (validation.PREDICTOR_SCHEMA)
+        and the valid ones are scored with a single call into the fused
+        scoring engine. Rows that fail validation get an
+        {'error': ..., 'errors': [...]} entry instead of a prediction and do
+        not abort the rest of the batch.
+        
         Args:
             patients: List of dictionaries with keys: age, gender, icd_freq, cpt_freq, month
         
         Returns:
-            List of prediction results
+            List of prediction results, in the same order as `patients`
         """
-        results = []
-        for patient in patients:
-            result = self.predict(
-                age=patient['age'],
-                gender=patient['gender'],
-                icd_freq=patient['icd_freq'],
-                cpt_freq=patient['cpt_freq'],
-                month=patient['month']
-            )
-            results.append(result)
+        if not patients:
+            return []
+        
+        validated = PREDICTOR_SCHEMA.validate(patients)
+        results = [None] * len(patients)
+        if validated.valid.any():
+            probabilities = self._predict_proba(validated.features[validated.valid])
+            eligible_probs = probabilities[:, 1].tolist()
+            not_eligible_probs = probabilities[:, 0].tolist()
+            for i, p1, p0 in zip(np.flatnonzero(validated.valid).tolist(), eligible_probs, not_eligible_probs):
+                eligible = p1 > 0.5
+                results[i] = {
+                    'eligible': eligible,
+                    'confidence': p1 if p1 > p0 else p0,
+                    'eligible_probability': p1,
+                    'not_eligible_probability': p0,
+                    'prediction_text': 'ELIGIBLE' if eligible else 'NOT ELIGIBLE'
+                }
+        for i in validated.invalid_rows():
+            errors = validated.row_errors(i)
+            results[i] = {'error': '; '.join(error['message'] for error in errors), 'errors': errors}
         return results
+    
+    def _predict_proba(self, patient_data: np.ndarray) -> np.ndarray:
+        """Score an unscaled (N, 5) feature matrix and return (N, 2) class probabilities."""
+        return self.engine.predict_proba(patient_data)
+
 
 # Example usage
 if __name__ == "__main__":
@@ -124,4 +151,7 @@ if __name__ == "__main__":
     batch_results = predictor.predict_batch(patients)
     print("\nBatch Predictions:")
     for i, result in enumerate(batch_results, 1):
-        print(f"  Patient {i}: {result['prediction_text']} ({result['confidence']:.2%} confidence)")
+        if 'error' in result:
+            print(f"  Patient {i}: ERROR ({result['error']})")
+        else:
+            print(f"  Patient {i}: {result['prediction_text']} ({result['confidence']:.2%} confidence)")
@@ -0,0 +1,184 @@
+"""
+Micro-batching for single-row predictions.
+
+Concurrent /predict requests each carry one feature row. RequestCoalescer
+collects rows that arrive within a short window (or until a maximum batch
+size is reached), scores them as one matrix on a background thread, and hands
+each caller back its own probability.
+
+A caller may pass its own score_fn to submit(), e.g. the engine of the model
+snapshot its request started with. Rows are then batched only with rows for
+the same scorer, so during a model swap every row is scored by the model its
+request reports.
+
+Usage:
+    coalescer = RequestCoalescer(engine.eligible_probability, window_ms=2, max_batch_size=64)
+    probability = coalescer.submit([45, 1, 15, 8, 6], timeout=1.0)
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class CoalescerTimeout(TimeoutError):
+    """The request's deadline passed before it was scored."""
+
+
+class _Pending:
+    __slots__ = ('row', 'score_fn', 'deadline', 'done', 'result', 'error')
+
+    def __init__(self, row, score_fn, deadline):
+        self.row = row
+        self.score_fn = score_fn
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Gathers single-row scoring requests into batches.
+
+    Args:
+        score_fn: Callable taking an (N, n_features) array and returning N
+            probabilities (e.g. FusedLogisticScorer.eligible_probability);
+            used for rows submitted without their own
+        window_ms: How long to wait for more rows after the first one arrives
+        max_batch_size: Flush as soon as this many rows are queued
+    """
+
+    def __init__(self, score_fn, window_ms=2.0, max_batch_size=64):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._reset()
+        # Threads do not survive fork (e.g. gunicorn --preload workers), so
+        # each child process starts its own queue and scoring thread.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        # batch_size_counts[n] = number of batches that scored n rows
+        self._batch_size_counts = [0] * (self.max_batch_size + 1)
+        self._requests = 0
+        self._expired = 0
+        self._errors = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='request-coalescer', daemon=True)
+        self._thread.start()
+
+    def submit(self, row, timeout=1.0, score_fn=None):
+        """
+        Score one feature row, batched with whatever else is in flight.
+
+        Args:
+            row: Feature row
+            timeout: Seconds to wait for the result
+            score_fn: Scorer for this row (default: the coalescer's); rows
+                are only batched with rows for an equal scorer
+
+        Returns:
+            The row's probability as a float
+
+        Raises:
+            CoalescerTimeout if the row was not scored within `timeout` seconds
+        """
+        pending = _Pending(row, score_fn or self.score_fn, time.monotonic() + timeout)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise CoalescerTimeout(f"Prediction not scored within {timeout * 1000:.0f} ms")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """Block for the first row, then gather more until the window or batch fills."""
+        batch = [self._queue.get()]
+        flush_at = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = flush_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            now = time.monotonic()
+            groups = {}  # score_fn -> live rows, in arrival order
+            expired = 0
+            for pending in batch:
+                if pending is None:
+                    continue
+                if pending.deadline <= now:
+                    # Caller has already given up; don't spend CPU on it
+                    pending.error = CoalescerTimeout("Deadline passed before scoring")
+                    pending.done.set()
+                    expired += 1
+                else:
+                    groups.setdefault(pending.score_fn, []).append(pending)
+
+            for score_fn, live in groups.items():
+                try:
+                    probabilities = score_fn(np.array([p.row for p in live], dtype=np.float64))
+                    for pending, probability in zip(live, probabilities.tolist()):
+                        pending.result = probability
+                        pending.done.set()
+                except Exception as e:
+                    for pending in live:
+                        pending.error = e
+                        pending.done.set()
+                    with self._lock:
+                        self._errors += 1
+
+            with self._lock:
+                for live in groups.values():
+                    self._batch_size_counts[len(live)] += 1
+                    self._requests += len(live)
+                if not groups:
+                    self._batch_size_counts[0] += 1
+                self._expired += expired
+
+    def close(self):
+        """Stop the background thread."""
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+    def stats(self):
+        """Batch-size distribution and request counters."""
+        with self._lock:
+            counts = list(self._batch_size_counts)
+            requests, expired, errors = self._requests, self._expired, self._errors
+
+        batches = sum(counts[1:])
+        percentiles = {}
+        if batches:
+            cumulative = np.cumsum(counts[1:])
+            for name, q in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+                percentiles[name] = int(np.searchsorted(cumulative, q * batches) + 1)
+
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch_size': self.max_batch_size,
+            'requests': requests,
+            'batches': batches,
+            'expired': expired,
+            'batch_errors': errors,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'batch_size_percentiles': percentiles,
+            'batch_size_counts': {size: n for size, n in enumerate(counts) if n and size}
+        }
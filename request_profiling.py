@@ -0,0 +1,278 @@
+"""
+Opt-in profiling of single requests for the Flask services.
+
+Set REQUEST_PROFILING=1 to enable it. Even then, a request is profiled only
+if it sends the X-Profile header:
+
+    X-Profile: cprofile    deterministic profile (cProfile) of the request
+    X-Profile: sample      sampling profile: the handler thread's stack every
+                           REQUEST_PROFILE_INTERVAL_MS (default 1; in practice
+                           no finer than sys.getswitchinterval(), 5 ms, while
+                           the handler holds the GIL)
+
+When REQUEST_PROFILE_TOKEN is set, the request must also send that value in
+X-Profile-Token. A profiled response carries these headers:
+
+    Server-Timing   the request's stage breakdown (parse, validate, ...) and total
+    X-Profile-Id    id of the profile
+    X-Profile-Top   the functions with the most own time (cprofile) or samples
+
+When REQUEST_PROFILE_DIR is set, the full profile is also written there:
+
+- <id>.prof (pstats; `python -m pstats <id>.prof`, snakeviz), or
+- <id>.folded (collapsed stacks for flamegraph.pl or speedscope),
+
+together with <id>.json, which holds the stages, the top functions and the request line.
+
+Streamed responses (/predict-stream) are profiled until the body is
+complete. Their headers are sent before that and cover only the time to the
+first byte; the complete profile exists only in REQUEST_PROFILE_DIR.
+cProfile sees only the handler thread. With PREDICT_COALESCE_WINDOW_MS,
+scoring runs in the coalescer thread and appears as waiting.
+
+Disabled (the default), no request hooks are installed; what remains is a
+None check per metrics.timer() call.
+
+Usage:
+    profiler = RequestProfiler.from_env()
+    profiler.install(app)
+    ...
+    timer = metrics.timer(profiler.stages())
+"""
+
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+HEADER = 'X-Profile'
+TOKEN_HEADER = 'X-Profile-Token'
+MODES = ('cprofile', 'sample')
+
+_profile_ids = itertools.count(1)
+
+
+def _frame_label(filename, line, function):
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack at a fixed interval.
+
+    Stacks are counted in collapsed form (root;...;leaf), the input format of
+    flamegraph.pl and speedscope. enable()/disable() may be called repeatedly.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='request-profile-sampler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def top(self, n):
+        """(leaf frame, seconds, samples) for the n most sampled leaf frames."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(label, count * self.interval, count) for label, count in leaves.most_common(n)]
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """Profiler, stage timings and start time of one profiled request."""
+
+    def __init__(self, mode, interval, method, path):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_ids)}"
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.stages = []
+        self.start = time.perf_counter()
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = StackSampler(threading.get_ident(), interval)
+        self._profiler.enable()
+
+    def pause(self):
+        self._profiler.disable()
+
+    def resume(self):
+        self._profiler.enable()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def top(self, n):
+        """(function, seconds, calls or samples) with the most own time; call while paused."""
+        if self.mode == 'sample':
+            return self._profiler.top(n)
+        stats = pstats.Stats(self._profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:n]
+        return [(_frame_label(*key), tottime, calls) for key, (_, calls, tottime, _, _) in ranked]
+
+    def stage_totals(self):
+        """Stage -> seconds, summed over repeated marks, in first-seen order."""
+        totals = {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self, total):
+        metrics = [f"{stage};dur={seconds * 1e3:.3f}" for stage, seconds in self.stage_totals().items()]
+        metrics.append(f"total;dur={total * 1e3:.3f}")
+        return ', '.join(metrics)
+
+    def details(self, status, total, top):
+        """JSON summary of the profile."""
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'method': self.method,
+            'path': self.path,
+            'status': status,
+            'total_ms': total * 1e3,
+            'stages_ms': {stage: seconds * 1e3 for stage, seconds in self.stage_totals().items()},
+            'top': [{'function': name, 'seconds': seconds, 'count': count} for name, seconds, count in top],
+        }
+
+    def save(self, directory, details):
+        """Write <id>.prof or <id>.folded and <id>.json to directory; call while paused."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(f'{base}.prof')
+        else:
+            self._profiler.dump(f'{base}.folded')
+        with open(f'{base}.json', 'w') as f:
+            json.dump(details, f, indent=2)
+
+
+class RequestProfiler:
+    """
+    Flask hooks that profile requests carrying the X-Profile header.
+
+    Args:
+        enabled: Install the hooks at all (REQUEST_PROFILING)
+        profile_dir: Where full profiles are written, or None for headers only
+        token: Value required in X-Profile-Token, or None to accept any request
+        interval_ms: Sampling interval for X-Profile: sample
+        top: Functions listed in X-Profile-Top
+    """
+
+    def __init__(self, enabled=False, profile_dir=None, token=None, interval_ms=1.0, top=10):
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self.token = token
+        self.interval = interval_ms / 1e3
+        self.top = top
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get('REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes', 'on'),
+            profile_dir=os.environ.get('REQUEST_PROFILE_DIR') or None,
+            token=os.environ.get('REQUEST_PROFILE_TOKEN') or None,
+            interval_ms=float(os.environ.get('REQUEST_PROFILE_INTERVAL_MS', 1.0)),
+        )
+
+    def install(self, app):
+        """Register the request hooks on a Flask app (nothing when disabled)."""
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    def stages(self):
+        """Stage list to pass to metrics.timer() while this request is profiled, else None."""
+        if not self.enabled:
+            return None
+        profile = g.get('request_profile')
+        return profile.stages if profile is not None else None
+
+    def _requested_mode(self):
+        mode = request.headers.get(HEADER, '').strip().lower()
+        if mode in ('1', 'true', 'on'):
+            mode = 'cprofile'
+        if mode not in MODES:
+            return None
+        if self.token is not None and not hmac.compare_digest(
+                request.headers.get(TOKEN_HEADER, '').encode(), self.token.encode()):
+            return None
+        return mode
+
+    def _start(self):
+        mode = self._requested_mode()
+        if mode is not None:
+            g.request_profile = RequestProfile(mode, self.interval, request.method, request.full_path.rstrip('?'))
+
+    def _finish(self, response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        profile.pause()
+        total = profile.elapsed()
+        top = profile.top(self.top)
+        response.headers['Server-Timing'] = profile.server_timing(total)
+        response.headers['X-Profile-Id'] = profile.id
+        response.headers['X-Profile-Top'] = '; '.join(
+            f"{name} {seconds * 1e3:.3f}ms" for name, seconds, _ in top)
+
+        if response.is_streamed:
+            # The body is produced after this hook; keep profiling until it ends
+            if self.profile_dir is not None:
+                profile.resume()
+                response.response = self._stream(profile, response.response, response.status_code)
+        elif self.profile_dir is not None:
+            profile.save(self.profile_dir, profile.details(response.status_code, total, top))
+        return response
+
+    def _stream(self, profile, chunks, status):
+        try:
+            yield from chunks
+        finally:
+            profile.pause()
+            profile.save(self.profile_dir, profile.details(status, profile.elapsed(), profile.top(self.top)))
+
+    def _teardown(self, exc):
+        # after_request is skipped when the view raised
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.pause()
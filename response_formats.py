@@ -0,0 +1,210 @@
+"""
+Response formats for the batch endpoints (/predict-batch, /predict-stream).
+
+The format is picked from ?format= or, failing that, the Accept header:
+
+    json      application/json (or application/x-ndjson for streams)
+              Row objects, as before: {"results": [{"eligible": ...}, ...]}
+    columnar  application/vnd.eligibility.columnar+json
+              Parallel arrays: {"total", "eligible", "confidence",
+              "eligible_probability", "errors": [{"index", "error", "errors"}]}
+              with null in the columns for rows that failed validation
+    arrow     application/vnd.apache.arrow.stream
+              Arrow IPC stream; columns index, eligible, confidence,
+              eligible_probability (null for invalid rows) and error
+
+Columnar JSON and Arrow are built from the probability array directly,
+without a Python dict per row. JSON is encoded with orjson when it is
+installed (optional dependency; NumPy arrays are written natively), and
+with the stdlib json module otherwise. Arrow needs pyarrow, imported on
+first use so it does not slow down service start-up.
+
+Run `python benchmarks/bench_response_formats.py` for payload sizes and
+serialization times.
+"""
+
+import json
+from typing import NamedTuple
+
+import numpy as np
+
+# orjson is used when installed (optional dependency)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON = 'json'
+COLUMNAR = 'columnar'
+ARROW = 'arrow'
+
+COLUMNAR_MIMETYPE = 'application/vnd.eligibility.columnar+json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Accept-header media types, in preference order for wildcards
+ACCEPTED_MIMETYPES = {
+    'application/json': JSON,
+    NDJSON_MIMETYPE: JSON,
+    COLUMNAR_MIMETYPE: COLUMNAR,
+    ARROW_MIMETYPE: ARROW,
+}
+
+# Response Content-Type per format, for whole batches and for streams
+BATCH_MIMETYPES = {JSON: 'application/json', COLUMNAR: COLUMNAR_MIMETYPE, ARROW: ARROW_MIMETYPE}
+STREAM_MIMETYPES = {JSON: NDJSON_MIMETYPE, COLUMNAR: NDJSON_MIMETYPE, ARROW: ARROW_MIMETYPE}
+
+ARROW_EOS = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+
+
+class UnsupportedFormat(ValueError):
+    """The requested response format is unknown or its library is not installed."""
+
+
+class BatchScores(NamedTuple):
+    """Scores for one batch: probabilities (NaN where invalid), valid mask, row -> errors."""
+    probability: np.ndarray
+    valid: np.ndarray
+    errors: dict
+
+
+def negotiate(accept_mimetypes, requested=None):
+    """
+    Response format for a request.
+
+    Args:
+        accept_mimetypes: The request's parsed Accept header (werkzeug MIMEAccept)
+        requested: ?format= value, which takes precedence over Accept
+
+    Returns:
+        JSON, COLUMNAR or ARROW (JSON when nothing acceptable matches)
+
+    Raises:
+        UnsupportedFormat for an unknown ?format= or arrow without pyarrow
+    """
+    if requested:
+        if requested not in BATCH_MIMETYPES:
+            raise UnsupportedFormat(f"Unknown format {requested!r}; use one of {', '.join(BATCH_MIMETYPES)}")
+        response_format = requested
+    else:
+        best = accept_mimetypes.best_match(list(ACCEPTED_MIMETYPES))
+        response_format = ACCEPTED_MIMETYPES.get(best, JSON)
+    if response_format == ARROW:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise UnsupportedFormat('Arrow responses need pyarrow, which is not installed') from None
+    return response_format
+
+
+def _builtin(value):
+    """Stdlib json fallback for NumPy values (NaN -> null)."""
+    if isinstance(value, np.ndarray):
+        values = value.tolist()
+        if value.dtype.kind == 'f':
+            for i in np.flatnonzero(np.isnan(value)).tolist():
+                values[i] = None
+        return values
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """JSON bytes for obj; NumPy arrays are allowed (NaN is written as null)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_builtin, separators=(',', ':')).encode('utf-8')
+
+
+def _error_entry(errors):
+    return {'error': '; '.join(error['message'] for error in errors), 'errors': errors}
+
+
+def rows(scores):
+    """Per-row result dicts (the original /predict-batch shape)."""
+    results = [None] * len(scores.probability)
+    for i, p1 in zip(np.flatnonzero(scores.valid).tolist(), scores.probability[scores.valid].tolist()):
+        results[i] = {
+            'eligible': p1 > 0.5,
+            'confidence': p1 if p1 > 0.5 else 1.0 - p1,
+            'eligible_probability': p1
+        }
+    for i, errors in scores.errors.items():
+        results[i] = _error_entry(errors)
+    return results
+
+
+def columnar(scores, offset=0):
+    """Parallel-array payload; invalid rows are null in every column."""
+    probability = scores.probability
+    eligible = probability > 0.5
+    if scores.errors:
+        eligible = eligible.tolist()
+        for i in scores.errors:
+            eligible[i] = None
+    return {
+        'offset': offset,
+        'total': len(probability),
+        'eligible': eligible,
+        'confidence': np.maximum(probability, 1.0 - probability),
+        'eligible_probability': probability,
+        'errors': [dict(index=offset + i, **_error_entry(errors)) for i, errors in sorted(scores.errors.items())],
+    }
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('index', pa.int64()), ('eligible', pa.bool_()), ('confidence', pa.float64()),
+        ('eligible_probability', pa.float64()), ('error', pa.string()),
+    ])
+
+
+def arrow_batch(scores, offset=0):
+    """One Arrow IPC record-batch message for the scores (no per-row Python objects for valid rows)."""
+    import pyarrow as pa
+
+    n = len(scores.probability)
+    probability = scores.probability
+    invalid = None if not scores.errors else ~scores.valid
+    if scores.errors:
+        messages = [None] * n
+        for i, errors in scores.errors.items():
+            messages[i] = _error_entry(errors)['error']
+        error = pa.array(messages, type=pa.string())
+    else:
+        error = pa.nulls(n, pa.string())
+    batch = pa.record_batch([
+        pa.array(np.arange(offset, offset + n, dtype=np.int64)),
+        pa.array(probability > 0.5, mask=invalid),
+        pa.array(np.maximum(probability, 1.0 - probability), mask=invalid),
+        pa.array(probability, mask=invalid),
+        error,
+    ], schema=arrow_schema())
+    return batch.serialize().to_pybytes()
+
+
+def arrow_stream_start():
+    """Schema message that opens an Arrow IPC stream."""
+    return arrow_schema().serialize().to_pybytes()
+
+
+def encode_batch(scores, response_format):
+    """Whole /predict-batch response body in the given format."""
+    if response_format == ARROW:
+        return arrow_stream_start() + arrow_batch(scores) + ARROW_EOS
+    if response_format == COLUMNAR:
+        return dumps(columnar(scores))
+    return dumps({'results': rows(scores), 'total': len(scores.probability)})
+
+
+def encode_stream_chunk(scores, response_format, offset):
+    """One chunk of a /predict-stream response (NDJSON lines or an Arrow batch)."""
+    if response_format == ARROW:
+        return arrow_batch(scores, offset)
+    if response_format == COLUMNAR:
+        return dumps(columnar(scores, offset)) + b'\n'
+    lines = [dumps(dict(index=offset + i, **result)) for i, result in enumerate(rows(scores))]
+    return b'\n'.join(lines) + b'\n'
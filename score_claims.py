@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Bulk scorer for raw claim CSVs.
+
+Reads a file shaped like `csv file -gmu radiology.csv` in fixed-size chunks,
+derives the model features from the raw Age/Gender/ICD/CPT/ApprovedDate
+columns, and appends predictions to the output as each chunk is scored, so
+memory stays constant regardless of input size.
+
+Usage:
+    python score_claims.py "csv file -gmu radiology.csv" -o scored.csv
+    python score_claims.py claims_2024_06.csv -o scored.csv --chunksize 200000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from code_index import CodeFrequencyIndex
+from feature_pipeline import derive_features
+from scoring_engine import FusedLogisticScorer
+
+RAW_DTYPES = {'Age': 'string', 'Gender': 'string', 'ICD': 'string', 'CPT': 'string', 'ApprovedDate': 'string'}
+
+
+def score_file(input_path, output_path, engine, icd_index, cpt_index,
+               chunksize=100_000, progress=sys.stderr):
+    """
+    Score a raw claim CSV chunk by chunk.
+
+    Every input column is passed through, followed by Eligible_Probability,
+    Predicted_Eligible and Score_Error (set for rows that could not be scored).
+
+    Returns:
+        Dictionary with total rows, scored rows, error rows and elapsed seconds
+    """
+    total_rows = 0
+    error_rows = 0
+    start = time.perf_counter()
+
+    reader = pd.read_csv(input_path, dtype=RAW_DTYPES, chunksize=chunksize)
+    with open(output_path, 'w', newline='') as out:
+        for chunk_number, chunk in enumerate(reader):
+            X, errors = derive_features(chunk, icd_index, cpt_index)
+            valid = errors == None  # noqa: E711 - elementwise comparison
+
+            probabilities = np.full(len(chunk), np.nan)
+            probabilities[valid] = engine.eligible_probability(X[valid])
+
+            chunk['Eligible_Probability'] = probabilities
+            chunk['Predicted_Eligible'] = pd.array(
+                np.where(valid, probabilities > 0.5, pd.NA), dtype='boolean'
+            )
+            chunk['Score_Error'] = errors
+            chunk.to_csv(out, header=(chunk_number == 0), index=False)
+
+            total_rows += len(chunk)
+            error_rows += int((~valid).sum())
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                print(f"  {total_rows:,} rows scored ({total_rows / elapsed:,.0f} rows/sec)",
+                      file=progress, flush=True)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'total_rows': total_rows,
+        'scored_rows': total_rows - error_rows,
+        'error_rows': error_rows,
+        'elapsed_seconds': elapsed
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score raw claim CSVs for insurance eligibility')
+    parser.add_argument('input', help='Raw claim CSV (Age, Gender, ICD, CPT, ApprovedDate columns)')
+    parser.add_argument('-o', '--output', required=True, help='Output CSV path')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='Rows per chunk (default: 100000)')
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--scaler', default='scaler.pkl')
+    parser.add_argument('--icd-mapping', default='icd_mapping.pkl')
+    parser.add_argument('--cpt-mapping', default='cpt_mapping.pkl')
+    parser.add_argument('--quiet', action='store_true', help='Suppress progress output')
+    args = parser.parse_args(argv)
+
+    engine = FusedLogisticScorer.from_pickles(args.model, args.scaler)
+    icd_index = CodeFrequencyIndex.from_pickle(args.icd_mapping)
+    cpt_index = CodeFrequencyIndex.from_pickle(args.cpt_mapping)
+
+    summary = score_file(
+        args.input, args.output, engine, icd_index, cpt_index,
+        chunksize=args.chunksize, progress=None if args.quiet else sys.stderr
+    )
+
+    print(f"✓ Scored {summary['scored_rows']:,} of {summary['total_rows']:,} rows "
+          f"in {summary['elapsed_seconds']:.2f}s "
+          f"({summary['total_rows'] / max(summary['elapsed_seconds'], 1e-9):,.0f} rows/sec)")
+    if summary['error_rows']:
+        print(f"⚠️  {summary['error_rows']:,} rows could not be scored (see Score_Error column)")
+    print(f"✓ Predictions written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
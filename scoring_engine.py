@@ -0,0 +1,163 @@
+"""
+Fused scoring engine for the insurance eligibility model.
+
+The deployed model is a MinMaxScaler followed by a binary LogisticRegression.
+Because min-max scaling is affine, it can be folded into the logistic
+coefficients ahead of time:
+
+    z = (X * scale + min) @ coef + intercept
+      = X @ (scale * coef) + (min @ coef + intercept)
+
+so scoring becomes one matmul plus a sigmoid on the raw feature matrix, with
+no sklearn input validation or estimator dispatch on the hot path.
+
+Usage:
+    engine = FusedLogisticScorer.from_pickles('model.pkl', 'scaler.pkl')
+    probabilities = engine.predict_proba([[45, 1, 15, 8, 6]])
+
+Run `python scoring_engine.py` to check parity against the sklearn objects;
+tests/test_scoring_engine.py runs the same checks under pytest.
+"""
+
+import hashlib
+import pickle
+import numpy as np
+
+
+class FusedLogisticScorer:
+    """
+    Drop-in replacement for `model.predict_proba(scaler.transform(X))`.
+
+    Exposes the same `predict_proba` / `predict` / `decision_function` names
+    as the sklearn estimator, but takes *unscaled* features.
+    """
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, weights, bias, feature_names=None):
+        """
+        Args:
+            weights: Folded coefficients, one per raw feature
+            bias: Folded intercept
+            feature_names: Optional feature order, for reference only
+        """
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.n_features_in_ = len(self.weights)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # Content fingerprint: identical coefficients give the same version
+        digest = hashlib.sha1(self.weights.tobytes() + np.float64(self.bias).tobytes())
+        self.version = digest.hexdigest()[:12]
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_names=None):
+        """Fold a fitted MinMaxScaler into a fitted binary LogisticRegression."""
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if coef.shape[0] != 1 or list(model.classes_) != [0, 1]:
+            raise ValueError("Only binary models with classes [0, 1] can be fused")
+        if getattr(scaler, 'clip', False):
+            raise ValueError("Scalers with clip=True cannot be folded into the coefficients")
+
+        coef = coef[0]
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        offset = np.asarray(scaler.min_, dtype=np.float64)
+        if scale.shape != coef.shape:
+            raise ValueError(f"Scaler has {scale.shape[0]} features, model has {coef.shape[0]}")
+
+        if feature_names is None and hasattr(scaler, 'feature_names_in_'):
+            feature_names = list(scaler.feature_names_in_)
+
+        return cls(
+            weights=scale * coef,
+            bias=float(offset @ coef + model.intercept_[0]),
+            feature_names=feature_names
+        )
+
+    @classmethod
+    def from_pickles(cls, model_path='model.pkl', scaler_path='scaler.pkl'):
+        """Build the engine from the pickled model and scaler."""
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        with open(scaler_path, 'rb') as f:
+            scaler = pickle.load(f)
+        return cls.from_sklearn(model, scaler)
+
+    def decision_function(self, X):
+        """Raw logit for each row of an (N, n_features) matrix."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self.weights + self.bias
+
+    def eligible_probability(self, X):
+        """P(eligible) for each row, as a 1-D array."""
+        z = self.decision_function(X)
+        with np.errstate(over='ignore'):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    def predict_proba(self, X):
+        """(N, 2) class probabilities, same layout as LogisticRegression.predict_proba."""
+        p1 = self.eligible_probability(X)
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, X):
+        """Class labels (1 = eligible), same decision rule as LogisticRegression.predict."""
+        return (self.decision_function(X) > 0).astype(int)
+
+
+def check_parity(engine, model, scaler, X, atol=1e-12):
+    """
+    Compare the engine against the sklearn pipeline on a raw feature matrix.
+
+    Returns:
+        Max absolute probability difference
+
+    Raises:
+        AssertionError if probabilities differ by more than `atol`
+        or any predicted label differs
+    """
+    X = np.asarray(X, dtype=np.float64)
+    X_scaled = scaler.transform(X)
+    expected_proba = model.predict_proba(X_scaled)
+    expected_labels = model.predict(X_scaled)
+
+    # Explicit raises, not assert statements: the check must survive python -O
+    max_diff = float(np.max(np.abs(engine.predict_proba(X) - expected_proba)))
+    if not max_diff <= atol:
+        raise AssertionError(f"Probability mismatch: max diff {max_diff:.3e} > {atol:.0e}")
+    if not np.array_equal(engine.predict(X), expected_labels):
+        raise AssertionError("Label mismatch")
+    return max_diff
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    with open('model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open('scaler.pkl', 'rb') as f:
+        scaler = pickle.load(f)
+    engine = FusedLogisticScorer.from_sklearn(model, scaler)
+
+    rng = np.random.default_rng(42)
+    n = 100_000
+    cases = {
+        'random in-range rows': np.column_stack([
+            rng.uniform(1, 120, n),
+            rng.integers(0, 2, n),
+            rng.integers(1, 684, n),
+            rng.integers(1, 1816, n),
+            rng.integers(1, 7, n),
+        ]),
+        'range corners': np.array(np.meshgrid(
+            [1, 120], [0, 1], [1, 683], [1, 1815], [1, 6]
+        )).reshape(5, -1).T,
+        'out-of-range rows': rng.uniform(-1e4, 1e4, (1000, 5)),
+        'single row': np.array([[45, 1, 15, 8, 6]]),
+    }
+
+    print("Fused engine parity vs sklearn:")
+    for name, X in cases.items():
+        max_diff = check_parity(engine, model, scaler, X)
+        print(f"  ✓ {name:<22} ({len(X)} rows, max |Δp| = {max_diff:.2e})")
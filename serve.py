@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Production server for the Flask prediction APIs.
+
+Runs the app under gunicorn with N worker processes. The app module is
+imported (and the model loaded) in the master process before the workers
+are forked, so every worker shares the same model pages copy-on-write
+instead of each loading its own copy.
+
+Usage:
+    python serve.py                              # api.py on :5000, one worker per core
+    python serve.py --workers 4 --threads 8
+    cd app && python ../serve.py --port 5000     # app/api.py (same module name)
+
+`python api.py` is still available as the single-process development server.
+"""
+
+import argparse
+import gc
+import importlib
+import multiprocessing
+import os
+import sys
+
+
+def load_app(module_name):
+    """Import the Flask app and load its model before any worker is forked."""
+    sys.path.insert(0, os.getcwd())
+    module = importlib.import_module(module_name)
+    warm_up = getattr(module, 'warm_up', None)
+    if warm_up is not None:
+        warm_up()
+    # Move everything allocated so far out of the garbage collector's view,
+    # so GC passes in the workers don't write to (and un-share) those pages.
+    gc.freeze()
+    return module.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the prediction API with gunicorn')
+    parser.add_argument('--module', default='api', help="Module holding the Flask `app` (default: api)")
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('API_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count())),
+                        help='Worker processes (default: $WEB_CONCURRENCY or one per core)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help='Threads per worker (default: $WEB_THREADS or 4)')
+    parser.add_argument('--timeout', type=int, default=30, help='Worker timeout in seconds')
+    args = parser.parse_args(argv)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is required for production serving: pip install gunicorn")
+
+    flask_app = load_app(args.module)
+    # Per-worker setup (e.g. api.py's SIGHUP model reload); gunicorn resets
+    # signal handlers in each worker, so this runs after that
+    worker_init = getattr(sys.modules[args.module], 'worker_init', None)
+
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{args.host}:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread' if args.threads > 1 else 'sync')
+            self.cfg.set('timeout', args.timeout)
+            self.cfg.set('preload_app', True)
+            self.cfg.set('accesslog', None)
+            if worker_init is not None:
+                self.cfg.set('post_worker_init', lambda worker: worker_init())
+
+        def load(self):
+            return flask_app
+
+    print(f"✓ Serving {args.module}:app on {args.host}:{args.port} "
+          f"({args.workers} workers x {args.threads} threads)")
+    PreloadedApplication().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Low-overhead Prometheus metrics for the prediction services.
+
+All label values are declared up front, so bucket counters are allocated once
+at import and observing a value is a bisect plus two additions under a lock.
+Per request the only allocation is a StageTimer.
+
+Usage:
+    metrics = ServiceMetrics()
+    timer = metrics.timer()
+    data = request.get_json(); timer.mark('parse')
+    ...
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+Metrics are per process; under a multi-worker server each worker reports its own.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGES = ('parse', 'validate', 'encode', 'transform', 'predict_proba', 'serialize')
+
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000, 100000, 1000000)
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Fixed-bucket histogram with a fixed set of label values."""
+
+    def __init__(self, name, help_text, buckets, label_name=None, label_values=('',)):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_name = label_name
+        self.label_values = tuple(label_values)
+        self._index = {value: i for i, value in enumerate(self.label_values)}
+        # One slot per bucket plus +Inf, per label value
+        self._counts = [[0] * (len(self.buckets) + 1) for _ in self.label_values]
+        self._sums = [0.0] * len(self.label_values)
+        self._lock = threading.Lock()
+
+    def observe(self, value, label=''):
+        i = self._index[label]
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i][slot] += 1
+            self._sums[i] += value
+
+    def observe_counts(self, slot_counts, total, label=''):
+        """
+        Add many pre-bucketed observations at once.
+
+        slot_counts[i] values fell in bucket i (bisect_left order; the last
+        slot is +Inf), and `total` is their sum.
+        """
+        i = self._index[label]
+        with self._lock:
+            counts = self._counts[i]
+            for slot, count in enumerate(slot_counts):
+                counts[slot] += count
+            self._sums[i] += total
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            counts = [list(c) for c in self._counts]
+            sums = list(self._sums)
+        for label, bucket_counts, total in zip(self.label_values, counts, sums):
+            prefix = f'{self.label_name}="{label}",' if self.label_name else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            labels = f'{{{prefix[:-1]}}}' if prefix else ''
+            lines.append(f'{self.name}_sum{labels} {repr(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Counter keyed by one label. New label values are added on first use."""
+
+    def __init__(self, name, help_text, label_name, label_values=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self._values = {value: 0 for value in label_values}
+        self._lock = threading.Lock()
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label, value in items:
+            lines.append(f'{self.name}{{{self.label_name}="{label}"}} {value}')
+        return lines
+
+
+class Gauge:
+    """Single-value gauge."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = float(value)
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                f'{self.name} {repr(self.value)}']
+
+
+class StageTimer:
+    """
+    Times consecutive request stages: each mark() records the time since the previous one.
+
+    With a `stages` list (request_profiling), each (stage, seconds) is also
+    appended to it, giving the breakdown of this one request.
+    """
+
+    __slots__ = ('_histogram', '_last', '_stages')
+
+    def __init__(self, histogram, stages=None):
+        self._histogram = histogram
+        self._stages = stages
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self._histogram.observe(now - self._last, stage)
+        if self._stages is not None:
+            self._stages.append((stage, now - self._last))
+        self._last = now
+
+
+class ServiceMetrics:
+    """The metric set exposed by both Flask services at /metrics."""
+
+    def __init__(self, endpoints=()):
+        self.stage_seconds = Histogram(
+            'prediction_stage_seconds', 'Time spent in each request stage.',
+            LATENCY_BUCKETS, label_name='stage', label_values=STAGES
+        )
+        self.batch_size = Histogram(
+            'prediction_batch_size', 'Rows per scoring call.', BATCH_SIZE_BUCKETS
+        )
+        self.requests = Counter(
+            'prediction_requests_total', 'Requests handled, by endpoint.', 'endpoint', endpoints
+        )
+        self.errors = Counter(
+            'prediction_errors_total', 'Failed requests or rows, by error type.', 'type'
+        )
+        self.model_load_seconds = Gauge(
+            'model_load_seconds', 'Time taken by the most recent model load.'
+        )
+        self.extra_collectors = []
+
+    def timer(self, stages=None):
+        return StageTimer(self.stage_seconds, stages)
+
+    def render(self):
+        lines = []
+        for metric in (self.stage_seconds, self.batch_size, self.requests, self.errors, self.model_load_seconds):
+            lines.extend(metric.render())
+        for collect in self.extra_collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,260 @@
+"""
+Shadow scoring of a candidate model on live traffic.
+
+ShadowScorer scores the rows a request was answered with a second,
+candidate model, off the response path. The request only appends the arrays
+it already has (features, primary probabilities, valid mask) to a bounded
+queue: no lock, no thread wake-up. A fixed pool of background threads drains
+the queue every `poll_interval` seconds. The threads score one request at a
+time and compare:
+
+    - agreement: the share of rows with the same eligible / not eligible decision
+    - probability delta: candidate - primary (mean, mean absolute, max
+      absolute, and a histogram of the absolute delta)
+    - candidate latency per scoring call (histogram, plus recent p50/p99)
+
+When `max_pending` requests are already queued, new ones are dropped and
+counted instead of waiting, so a slow candidate can never back up into the
+primary path. Waking a thread per request would cost every response a
+context switch and a GIL handoff. Polling in batches keeps that off the
+request path. Each thread is also held to a CPU budget of `max_cpu` (a
+fraction of one core). After every request it sleeps in proportion to the
+CPU time that request took. When the process is saturated, the shadow's
+share of the CPU stays bounded; the queue fills and further requests are
+dropped instead. The threads also run at a lower OS priority where the
+platform allows it (Linux per-thread nice values).
+
+Rows whose ICD/CPT frequency came from a raw code are re-resolved through the
+candidate's code index. The exception is when the service uses a published
+frequency snapshot, which applies to both models.
+
+Usage:
+    shadow = ShadowScorer(candidate_slot.get, max_workers=1, max_pending=64)
+    metrics.extra_collectors.append(shadow.prometheus_lines)
+    shadow.submit(validated.features, probability, validated.valid, patients, validated.from_code)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from service_metrics import LATENCY_BUCKETS, Counter, Histogram
+from validation import API_SCHEMA
+
+DELTA_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _lower_priority():
+    """Nice the calling thread so it yields the CPU to request threads."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+class ShadowScorer:
+    """
+    Compares a candidate model with the primary on a bounded background pool.
+
+    Args:
+        get_candidate: Callable returning the candidate model_slot.ServingModel
+            (e.g. a ModelSlot's get, so the candidate can be hot-swapped too)
+        max_workers: Background scoring threads
+        max_pending: Requests queued before new ones are dropped
+        sample_rate: Fraction of requests shadowed (0-1)
+        poll_interval: Seconds between queue drains
+        max_cpu: CPU budget per thread as a fraction of one core (0-1]
+        get_code_indexes: Optional callable returning the (icd, cpt) indexes
+            in effect for every model (a published snapshot), or None to use
+            the candidate's own
+        schema: validation.Schema the feature columns follow
+    """
+
+    def __init__(self, get_candidate, max_workers=1, max_pending=64, sample_rate=1.0, poll_interval=0.05,
+                 max_cpu=0.05, get_code_indexes=None, schema=API_SCHEMA):
+        # max_cpu=0 fails in the threads (1 / max_cpu), > 1 means no budget at all
+        if not 0 < max_cpu <= 1:
+            raise ValueError(f"max_cpu must be in (0, 1], got {max_cpu!r}")
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in [0, 1], got {sample_rate!r}")
+        self.get_candidate = get_candidate
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.sample_rate = sample_rate
+        self.poll_interval = poll_interval
+        self.max_cpu = max_cpu
+        self.get_code_indexes = get_code_indexes
+        self.code_columns = [(j, field) for j, field in enumerate(schema.fields) if field.code_key is not None]
+
+        self.latency = Histogram('shadow_candidate_seconds', 'Candidate model scoring time per request.',
+                                 LATENCY_BUCKETS)
+        self.abs_delta = Histogram('shadow_probability_abs_delta',
+                                   'Absolute candidate - primary eligible probability, per row.', DELTA_BUCKETS)
+        self.events = Counter('shadow_events_total', 'Shadow scoring outcomes.', 'event',
+                              ('scored', 'dropped', 'failed', 'rows', 'rows_agreed'))
+        self._reset()
+        # Threads do not survive fork (gunicorn --preload workers)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pending = deque()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._scored = 0
+        self._dropped = 0
+        self._failed = 0
+        self._rows = 0
+        self._agreed = 0
+        self._delta_sum = 0.0
+        self._abs_delta_sum = 0.0
+        self._max_abs_delta = 0.0
+        self._recent_latency = deque(maxlen=1000)
+        self._candidate_version = None
+        self._last_error = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f'shadow-scorer-{i}', daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, features, primary, valid, patients=None, from_code=None):
+        """
+        Queue one request for candidate scoring; never blocks.
+
+        The arrays are read later on a worker thread and must not be
+        modified afterwards (the services build them per request).
+
+        Args:
+            features: (N, n_fields) validated feature rows
+            primary: (N,) primary eligible probabilities
+            valid: (N,) mask of the rows that were scored
+            patients: The request's N records, for re-resolving raw codes
+            from_code: ValidationResult.from_code masks
+
+        Returns:
+            False if the request was dropped or not sampled
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        # len/append are atomic; concurrent submits may overshoot the bound by a few
+        if len(self._pending) >= self.max_pending:
+            with self._lock:
+                self._dropped += 1
+            self.events.inc('dropped')
+            return False
+        self._pending.append((features, primary, valid, patients, from_code))
+        return True
+
+    def _run(self):
+        _lower_priority()
+        while True:
+            time.sleep(self.poll_interval)
+            while True:
+                # Active before the pop: wait_idle must not see an empty queue while an item is in hand
+                with self._lock:
+                    self._active += 1
+                try:
+                    item = self._pending.popleft()
+                except IndexError:
+                    with self._lock:
+                        self._active -= 1
+                    break
+                cpu = time.thread_time()
+                try:
+                    self._score(*item)
+                finally:
+                    with self._lock:
+                        self._active -= 1
+                # Idle long enough that this thread's CPU share stays within max_cpu
+                time.sleep((time.thread_time() - cpu) * (1.0 / self.max_cpu - 1.0))
+
+    def _candidate_rows(self, candidate, features, valid, patients, from_code):
+        """The valid rows as the candidate sees them (through its own code tables)."""
+        X = features[valid]
+        if patients is None or not from_code or (self.get_code_indexes and self.get_code_indexes() is not None):
+            return X
+        for (j, field), index in zip(self.code_columns, candidate.code_indexes):
+            rows = np.flatnonzero(from_code[field.key] & valid)
+            if len(rows):
+                X[np.searchsorted(np.flatnonzero(valid), rows), j] = field.clip(index.lookup_many(
+                    [patients[i][field.code_key] for i in rows.tolist()]))
+        return X
+
+    def _score(self, features, primary, valid, patients, from_code):
+        try:
+            if not valid.any():
+                return
+            candidate = self.get_candidate()
+            X = self._candidate_rows(candidate, features, valid, patients, from_code)
+            primary = primary[valid]
+            start = time.perf_counter()
+            probability = candidate.engine.eligible_probability(X)
+            elapsed = time.perf_counter() - start
+
+            delta = probability - primary
+            abs_delta = np.abs(delta)
+            agreed = int(np.count_nonzero((probability > 0.5) == (primary > 0.5)))
+            self.latency.observe(elapsed)
+            slots = np.searchsorted(DELTA_BUCKETS, abs_delta, side='left')
+            self.abs_delta.observe_counts(np.bincount(slots, minlength=len(DELTA_BUCKETS) + 1).tolist(),
+                                          float(abs_delta.sum()))
+            self.events.inc('scored')
+            self.events.inc('rows', len(primary))
+            self.events.inc('rows_agreed', agreed)
+            with self._lock:
+                self._scored += 1
+                self._rows += len(primary)
+                self._agreed += agreed
+                self._delta_sum += float(delta.sum())
+                self._abs_delta_sum += float(abs_delta.sum())
+                self._max_abs_delta = max(self._max_abs_delta, float(abs_delta.max(initial=0.0)))
+                self._recent_latency.append(elapsed)
+                self._candidate_version = candidate.version
+        except Exception as e:  # a broken candidate must not affect serving
+            self.events.inc('failed')
+            with self._lock:
+                self._failed += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+
+    def stats(self):
+        """Agreement, probability deltas and candidate latency for /health."""
+        with self._lock:
+            rows = self._rows
+            latencies = sorted(self._recent_latency)
+            stats = {
+                'candidate_version': self._candidate_version,
+                'requests_scored': self._scored,
+                'requests_dropped': self._dropped,
+                'requests_failed': self._failed,
+                'last_error': self._last_error,
+                'rows_compared': rows,
+                'agreement_rate': self._agreed / rows if rows else None,
+                'mean_delta': self._delta_sum / rows if rows else None,
+                'mean_abs_delta': self._abs_delta_sum / rows if rows else None,
+                'max_abs_delta': self._max_abs_delta if rows else None,
+            }
+        if latencies:
+            stats['candidate_p50_ms'] = latencies[len(latencies) // 2] * 1e3
+            stats['candidate_p99_ms'] = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e3
+        stats.update(pending=len(self._pending), max_workers=self.max_workers, max_pending=self.max_pending,
+                     sample_rate=self.sample_rate, max_cpu=self.max_cpu)
+        return stats
+
+    def prometheus_lines(self):
+        """Shadow metrics for ServiceMetrics.extra_collectors."""
+        return self.latency.render() + self.abs_delta.render() + self.events.render()
+
+    def wait_idle(self, timeout=5.0):
+        """Block until no shadow work is queued or running (benchmarks and tests)."""
+        deadline = time.monotonic() + timeout
+        while self._pending or self._active:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
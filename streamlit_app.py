@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import pickle
 import os
 
+from model_bundle import load_bundle
+from scoring_engine import FusedLogisticScorer
+
 # Page configuration
 st.set_page_config(
     page_title="Insurance Eligibility Predictor",
@@ -56,7 +58,14 @@ st.markdown("""
 def load_model_artifacts():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # Try local paths first
+    # Prefer the single-file bundle: loads with NumPy only, no sklearn import
+    for bundle_dir in (script_dir, os.path.dirname(script_dir)):
+        bundle_path = os.path.join(bundle_dir, 'model.bundle')
+        if os.path.exists(bundle_path):
+            bundle = load_bundle(bundle_path)
+            return bundle.engine(), bundle.features
+    
+    # Otherwise the pickles; try local paths first
     paths = {
         'model': os.path.join(script_dir, 'model.pkl'),
         'scaler': os.path.join(script_dir, 'scaler.pkl'),
@@ -73,10 +82,13 @@ def load_model_artifacts():
     scaler = pickle.load(open(paths['scaler'], 'rb'))
     features = pickle.load(open(paths['features'], 'rb'))
     
-    return model, scaler, features
+    # Scaler folded into the model; scores unscaled inputs directly
+    engine = FusedLogisticScorer.from_sklearn(model, scaler, features)
+    
+    return engine, features
 
 try:
-    model, scaler, features = load_model_artifacts()
+    engine, features = load_model_artifacts()
 except Exception as e:
     st.error(f"❌ Error loading model: {str(e)}")
     st.stop()
@@ -160,12 +172,9 @@ if st.button("🔍 Check Eligibility", use_container_width=True):
         
         input_data = np.array([[age, gender_encoded, service_frequency, cpt_frequency, month]])
         
-        # Scale input
-        input_scaled = scaler.transform(input_data)
-        
         # Make prediction
-        prediction = model.predict(input_scaled)[0]
-        probability = model.predict_proba(input_scaled)[0]
+        probability = engine.predict_proba(input_data)[0]
+        prediction = int(probability[1] > 0.5)
         
         # Display results
         st.markdown("")
@@ -0,0 +1,70 @@
+"""Shared fixtures: the repo's trained artifacts, loaded once per session."""
+
+import os
+import pickle
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+def pytest_configure(config):
+    # The scaler was fitted on a DataFrame; the tests pass plain arrays
+    config.addinivalue_line('filterwarnings', 'ignore:X does not have valid feature names')
+
+
+def _unpickle(name):
+    with open(os.path.join(REPO_DIR, name), 'rb') as f:
+        return pickle.load(f)
+
+
+@pytest.fixture(scope='session')
+def repo_dir():
+    """The repository root, where the shipped artifacts live."""
+    return REPO_DIR
+
+
+@pytest.fixture(scope='session')
+def bundle_path(repo_dir):
+    """The shipped model.bundle."""
+    return os.path.join(repo_dir, 'model.bundle')
+
+
+@pytest.fixture(scope='session')
+def sklearn_model():
+    pytest.importorskip('sklearn')
+    return _unpickle('model.pkl')
+
+
+@pytest.fixture(scope='session')
+def sklearn_scaler():
+    pytest.importorskip('sklearn')
+    return _unpickle('scaler.pkl')
+
+
+@pytest.fixture(scope='session')
+def icd_mapping():
+    """Raw ICD code -> frequency table the shipped model was trained with."""
+    return _unpickle('icd_mapping.pkl')
+
+
+@pytest.fixture(scope='session')
+def cpt_mapping():
+    """Raw CPT code -> frequency table the shipped model was trained with."""
+    return _unpickle('cpt_mapping.pkl')
+
+
+@pytest.fixture(scope='session')
+def claims_csv(repo_dir):
+    """The radiology claims extract the model was trained on."""
+    return os.path.join(repo_dir, 'csv file -gmu radiology.csv')
+
+
+@pytest.fixture(scope='session')
+def claims(claims_csv):
+    """The claims extract loaded with feature_pipeline.load_claims (needs pandas)."""
+    pytest.importorskip('pandas')
+    from feature_pipeline import load_claims
+    return load_claims(claims_csv)
@@ -0,0 +1,74 @@
+"""Normalized ICD/CPT frequency lookups."""
+
+import math
+
+import numpy as np
+import pytest
+
+from code_index import CodeFrequencyIndex, frequency_fallback, normalize_code, normalize_codes
+
+
+@pytest.mark.parametrize('raw, normalized', [
+    ('A09       ', 'A09'),
+    (' a09 ', 'A09'),
+    ('m54. 5', 'M54.5'),
+    (70100.0, '70100'),
+    ('70100.0', '70100'),
+    (70100, '70100'),
+    ('70100.5', '70100.5'),
+    (None, None),
+    (math.nan, None),
+    ('   ', None),
+])
+def test_normalize_code(raw, normalized):
+    assert normalize_code(raw) == normalized
+
+
+def test_raw_keys_are_merged():
+    index = CodeFrequencyIndex({'A09       ': 3, 'A09': 2, 'b20': 1})
+    assert index.table == {'A09': 5, 'B20': 1}
+    assert index.lookup('A09       ') == 5
+    assert index.lookup(' a09') == 5
+    assert len(index) == 2
+    assert 'a09' in index and 'Z99' not in index
+
+
+def test_unseen_and_missing_codes_get_the_fallback():
+    index = CodeFrequencyIndex({'A09': 1, 'B20': 3}, fallback=7)
+    assert index.lookup('Z99') == 7.0
+    assert index.lookup(None) == 7.0
+    np.testing.assert_array_equal(index.lookup_many(['A09', 'Z99', 'b20']), [1.0, 7.0, 3.0])
+
+
+def test_default_fallback_is_frequency_weighted_median():
+    # Three rows with a frequency-3 code, one row with a frequency-1 code
+    assert frequency_fallback({'A': 3, 'B': 1}) == 3.0
+    assert CodeFrequencyIndex({'A': 3, 'B': 1}).fallback == 3.0
+
+
+def test_shipped_tables_resolve_every_raw_key(icd_mapping, cpt_mapping):
+    for mapping in (icd_mapping, cpt_mapping):
+        index = CodeFrequencyIndex(mapping)
+        for code, frequency in mapping.items():
+            assert index.lookup(code) >= frequency
+        assert sum(index.table.values()) == sum(mapping.values())
+
+
+def test_map_series_matches_lookup(icd_mapping, cpt_mapping):
+    pd = pytest.importorskip('pandas')
+    for mapping, extra in ((icd_mapping, [' a09', 'ZZZ', None]), (cpt_mapping, [70100, 1.0, math.nan])):
+        index = CodeFrequencyIndex(mapping)
+        raw = list(mapping)[:200] + extra
+        expected = index.lookup_many(raw)
+        np.testing.assert_array_equal(index.map_series(pd.Series(raw, dtype=object)).to_numpy(), expected)
+        np.testing.assert_array_equal(index.map_series(pd.Series(raw).astype('category')).to_numpy(), expected)
+
+
+def test_normalize_codes_merges_categories():
+    pd = pytest.importorskip('pandas')
+    codes = pd.Series(['A09       ', 'a09', 'B20', None]).astype('category')
+    normalized = normalize_codes(codes)
+    assert isinstance(normalized.dtype, pd.CategoricalDtype)
+    assert list(normalized.cat.categories) == ['A09', 'B20']
+    assert normalized.tolist()[:3] == ['A09', 'A09', 'B20']
+    assert pd.isna(normalized.iloc[3])
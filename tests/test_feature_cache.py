@@ -0,0 +1,126 @@
+"""feature_cache: hits, misses, invalidation and unreadable entries."""
+
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('pandas')
+
+import feature_cache  # noqa: E402
+import feature_pipeline  # noqa: E402
+
+
+@pytest.fixture
+def source(tmp_path, claims_csv):
+    path = tmp_path / 'claims.csv'
+    shutil.copy(claims_csv, path)
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+@pytest.fixture
+def pipeline_runs(monkeypatch):
+    runs = []
+    build_training_frame = feature_pipeline.build_training_frame
+
+    def counting_build_training_frame(df):
+        runs.append(len(df))
+        return build_training_frame(df)
+
+    monkeypatch.setattr(feature_pipeline, 'build_training_frame', counting_build_training_frame)
+    return runs
+
+
+def assert_same_training_data(cached, expected):
+    X, y, icd_mapping, cpt_mapping = cached
+    assert X.equals(expected[0].reset_index(drop=True))
+    assert (y.to_numpy() == expected[1].to_numpy()).all()
+    assert icd_mapping == expected[2]
+    assert cpt_mapping == expected[3]
+
+
+def test_miss_then_hit(source, cache_dir, pipeline_runs):
+    expected = feature_cache.load_training_data(source, use_cache=False)
+    first = feature_cache.load_training_data(source, cache_dir=cache_dir)
+    second = feature_cache.load_training_data(source, cache_dir=cache_dir)
+    assert len(pipeline_runs) == 2  # the uncached call and the miss
+    assert_same_training_data(first, expected)
+    assert_same_training_data(second, expected)
+    assert not second[0].to_numpy().flags.writeable  # backed by the memory map
+
+    [entry] = feature_cache.FeatureCache(cache_dir).entries()
+    assert entry['source'] == os.path.abspath(source) and entry['rows'] == len(expected[1])
+
+
+def test_csv_edit_rebuilds_and_replaces_the_entry(source, cache_dir, pipeline_runs):
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    [old] = feature_cache.FeatureCache(cache_dir).entries()
+
+    with open(source) as f:
+        lines = f.readlines()
+    with open(source, 'w') as f:
+        f.writelines(lines[:-100])
+    X, _, _, _ = feature_cache.load_training_data(source, cache_dir=cache_dir)
+    assert len(pipeline_runs) == 2
+
+    [new] = feature_cache.FeatureCache(cache_dir).entries()
+    assert new['key'] != old['key'] and new['rows'] == len(X)
+
+
+def test_pipeline_edit_rebuilds_the_entry(source, cache_dir, pipeline_runs, monkeypatch):
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    old_key = feature_cache.cache_key(source)
+
+    monkeypatch.setattr(feature_cache, 'pipeline_version', lambda: '0' * 16)
+    assert feature_cache.cache_key(source) != old_key
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    assert len(pipeline_runs) == 2
+    assert [entry['key'] for entry in feature_cache.FeatureCache(cache_dir).entries()] == \
+        [feature_cache.cache_key(source)]
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'header', 'data'])
+def test_corrupt_entry_is_a_miss_and_is_overwritten(source, cache_dir, pipeline_runs, damage):
+    expected = feature_cache.load_training_data(source, use_cache=False)
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    path = feature_cache.FeatureCache(cache_dir)._entry_path(feature_cache.cache_key(source))
+    with open(path, 'rb') as f:
+        raw = bytearray(f.read())
+    if damage == 'truncate':
+        raw = raw[:len(raw) // 2]
+    elif damage == 'header':
+        raw[raw.index(b'"features"')] = 0xFF  # not UTF-8
+    else:
+        raw[-1] ^= 0x01
+    with open(f'{path}.tmp', 'wb') as f:  # replace, never rewrite a mapped file in place
+        f.write(bytes(raw))
+    os.replace(f'{path}.tmp', path)
+
+    assert_same_training_data(feature_cache.load_training_data(source, cache_dir=cache_dir), expected)
+    assert len(pipeline_runs) == 3  # uncached, first miss, rebuild
+    assert_same_training_data(feature_cache.load_training_data(source, cache_dir=cache_dir), expected)
+    assert len(pipeline_runs) == 3  # the rebuilt entry is a hit
+
+
+def test_unreadable_files_are_listed_and_pruned(source, cache_dir):
+    os.makedirs(cache_dir)
+    stray = os.path.join(cache_dir, 'stale-entry.bundle')
+    with open(stray, 'wb') as f:
+        f.write(b'not a bundle')
+    cache = feature_cache.FeatureCache(cache_dir)
+    assert [(entry['key'], entry['corrupt']) for entry in cache.entries()] == [('stale-entry', True)]
+
+    feature_cache.load_training_data(source, cache_dir=cache_dir)
+    assert not os.path.exists(stray)
+    assert [entry['corrupt'] for entry in cache.entries()] == [False]
+
+    with open(stray, 'wb') as f:
+        f.write(b'')
+    assert cache.clear() == 2
+    assert cache.entries() == []
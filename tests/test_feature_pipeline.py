@@ -0,0 +1,37 @@
+"""feature_pipeline.build_training_frame reproduces the original export_model.py preprocessing."""
+
+import os
+import sys
+
+import pytest
+
+from validation import API_SCHEMA
+
+
+@pytest.fixture(scope='module')
+def training_frame(claims):
+    from feature_pipeline import build_training_frame
+    return build_training_frame(claims)
+
+
+def test_matches_legacy_preprocessing(repo_dir, claims_csv, training_frame):
+    sys.path.insert(0, os.path.join(repo_dir, 'benchmarks'))
+    from bench_feature_pipeline import legacy_prepare, output_differences
+
+    X, y, _, _ = training_frame
+    X_legacy, y_legacy = legacy_prepare(claims_csv)
+    assert output_differences((X_legacy, y_legacy), (X, y)) == {}
+
+
+def test_mappings_are_the_shipped_raw_code_tables(training_frame, icd_mapping, cpt_mapping):
+    _, _, icd, cpt = training_frame
+    assert icd == icd_mapping
+    assert cpt == cpt_mapping
+
+
+def test_frequencies_stay_in_the_validated_ranges(training_frame):
+    X = training_frame[0]
+    fields = {field.key: field for field in API_SCHEMA.fields}
+    for column, key in (('ICD_Frequency', 'icd_frequency'), ('CPT_Frequency', 'cpt_frequency')):
+        assert X[column].min() >= fields[key].low
+        assert X[column].max() <= fields[key].high
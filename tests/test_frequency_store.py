@@ -0,0 +1,117 @@
+"""FrequencyStore: incremental ingest matches a full recompute; the on-disk row hash index."""
+
+import os
+
+import numpy as np
+import pytest
+
+from frequency_store import FrequencyStore, RowHashIndex
+
+
+def test_batches_match_full_recompute(tmp_path, claims):
+    full = FrequencyStore(None)
+    full.ingest_frame(claims)
+
+    path = str(tmp_path / 'store.bundle')
+    for rows in np.array_split(np.arange(len(claims)), 8):
+        store = FrequencyStore(path)  # reopened per batch, like the CLI
+        store.ingest_frame(claims.iloc[rows])
+        store.save()
+
+    store = FrequencyStore(path)
+    assert store.mappings() == full.mappings()
+    assert store.rows == full.rows
+
+
+def test_replayed_batch_is_not_counted_twice(tmp_path, claims):
+    path = str(tmp_path / 'store.bundle')
+    store = FrequencyStore(path)
+    store.ingest_frame(claims.iloc[:2000])
+    store.save()
+    counts = store.mappings()
+
+    summary = FrequencyStore(path).ingest_frame(claims.iloc[:2000])
+    assert summary['rows_counted'] == 0
+    assert summary['duplicates'] == summary['rows_read'] - summary['invalid_age']
+    assert FrequencyStore(path).mappings() == counts
+
+
+def test_hash_runs_stay_logarithmic(tmp_path):
+    index = RowHashIndex(str(tmp_path))
+    rng = np.random.default_rng(0)
+    added = []
+    for _ in range(64):
+        batch = rng.integers(0, 2**63, 100, dtype=np.uint64)
+        index.add(batch)
+        added.append(batch)
+        runs = index.flush()
+        index.cleanup()
+    assert len(runs) <= 8  # log2(6400 / 100) + 1
+    assert sorted(os.listdir(tmp_path)) == sorted(name for name, _ in runs)
+
+    reopened = RowHashIndex(str(tmp_path), runs)
+    assert len(reopened) == len(np.unique(np.concatenate(added)))
+    assert reopened.contains(np.concatenate(added)).all()
+    assert not reopened.contains(rng.integers(0, 2**63, 1000, dtype=np.uint64)).any()
+
+
+def test_missing_run_file_is_an_error(tmp_path):
+    from model_bundle import BundleError
+
+    index = RowHashIndex(str(tmp_path))
+    index.add(np.arange(10, dtype=np.uint64))
+    runs = index.flush()
+    os.remove(tmp_path / runs[0][0])
+    with pytest.raises(BundleError):
+        RowHashIndex(str(tmp_path), runs)
+
+
+def test_corrupt_snapshot_keeps_previous_tables(tmp_path, claims):
+    from frequency_store import PublishedCodeTables
+
+    store = FrequencyStore(str(tmp_path / 'store.bundle'))
+    store.ingest_frame(claims.iloc[:2000])
+    snapshot = str(tmp_path / 'code_frequencies.bundle')
+    store.publish(snapshot)
+    tables = PublishedCodeTables(snapshot, default=None, check_interval=0)
+    good = tables.get()
+    assert good is not None and tables.stats()['last_error'] is None
+
+    with open(snapshot, 'r+b') as f:
+        f.truncate(100)
+    assert tables.get() is good  # no exception on the request path
+    assert tables.stats()['failed_reloads'] == 1
+    assert tables.stats()['last_error']
+    assert tables.get() is good
+    assert tables.stats()['failed_reloads'] == 1  # not retried until the file changes
+
+    store.ingest_frame(claims.iloc[2000:4000])
+    store.publish(snapshot)
+    assert tables.get() is not good
+    assert tables.stats()['last_error'] is None
+
+
+def test_corrupt_snapshot_at_start_falls_back_to_default(tmp_path):
+    from frequency_store import PublishedCodeTables
+
+    snapshot = tmp_path / 'code_frequencies.bundle'
+    snapshot.write_bytes(b'not a bundle')
+    tables = PublishedCodeTables(str(snapshot), default='bundle tables')
+    assert tables.get() == 'bundle tables'
+    assert tables.stats()['last_error']
+
+
+def test_counts_past_the_training_range_are_reported_and_clipped():
+    from code_index import CodeFrequencyIndex
+    from validation import API_SCHEMA
+
+    store = FrequencyStore(None)
+    store.icd_counts = {'A09': 5000, 'B20': 3}
+    store.cpt_counts = {'70100': 1815}
+    assert (store.stats()['icd_above_range'], store.stats()['cpt_above_range']) == (1, 0)
+
+    indexes = {'icd': CodeFrequencyIndex(store.icd_counts), 'cpt': CodeFrequencyIndex(store.cpt_counts)}
+    patient = {'age': 45, 'gender': 'Male', 'icd': 'A09', 'cpt': '70100', 'month': 6}
+    assert API_SCHEMA.validate_one(patient, indexes)[2] == 683  # scalar path
+    result = API_SCHEMA.validate([patient, dict(patient, icd='B20')], indexes)  # array path
+    assert result.features[:, 2].tolist() == [683, 3]
@@ -0,0 +1,51 @@
+"""
+Serving modules import without the training stack, within a start-up budget.
+
+Each statement from benchmarks/bench_import_time.py runs in a fresh
+interpreter. The test fails if sklearn, pandas or scipy ends up in
+sys.modules, or if the import takes longer than IMPORT_BUDGET_SECONDS. The
+budget covers the statement itself, not interpreter start-up. It is about 3x
+the time measured on one vCPU (api: ~0.3 s), so it fails on a reintroduced
+heavy import, not on machine noise. Set IMPORT_TIME_BUDGET to override it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+sys.path.insert(0, BENCHMARKS_DIR)
+from bench_import_time import FORBIDDEN, SERVING_IMPORTS, import_env  # noqa: E402
+
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_TIME_BUDGET', 1.0))
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'forbidden': sorted(m for m in {forbidden!r} if m in sys.modules)}}))
+'''
+
+
+def probe(statement, cwd):
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement, forbidden=FORBIDDEN)],
+        cwd=cwd, env=import_env(), capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('name', list(SERVING_IMPORTS))
+def test_serving_import(name):
+    statement, cwd = SERVING_IMPORTS[name]
+    # Best of two: the first run may pay for cold page cache and .pyc writes
+    results = [probe(statement, cwd) for _ in range(2)]
+    assert results[-1]['forbidden'] == [], f"{name} imports training-only packages"
+    seconds = min(result['seconds'] for result in results)
+    assert seconds <= IMPORT_BUDGET_SECONDS, (
+        f"{name} took {seconds:.3f}s to import, budget {IMPORT_BUDGET_SECONDS:.2f}s")
@@ -0,0 +1,98 @@
+"""app/insurance_predictor.py: the process-wide model registry."""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def insurance_predictor(repo_dir):
+    sys.path.insert(0, os.path.join(repo_dir, 'app'))
+    import insurance_predictor
+    return insurance_predictor
+
+
+@pytest.fixture
+def count_bundle_loads(insurance_predictor, monkeypatch):
+    calls = []
+    load_bundle = insurance_predictor.load_bundle
+
+    def counting_load_bundle(path):
+        calls.append(path)
+        return load_bundle(path)
+
+    monkeypatch.setattr(insurance_predictor, 'load_bundle', counting_load_bundle)
+    return calls
+
+
+def registry_for(insurance_predictor, directory):
+    return insurance_predictor.ModelRegistry(
+        model_path=str(directory / 'model.pkl'), scaler_path=str(directory / 'scaler.pkl'),
+        bundle_path=str(directory / 'model.bundle'), check_interval=0
+    )
+
+
+def test_bundle_is_loaded_once(tmp_path, bundle_path, insurance_predictor, count_bundle_loads):
+    shutil.copy(bundle_path, tmp_path / 'model.bundle')
+    registry = registry_for(insurance_predictor, tmp_path)
+    first = registry.get()
+    assert registry.get() is first
+    assert len(count_bundle_loads) == 1
+    assert registry.stats()['source'] == 'bundle'
+
+
+def test_corrupt_bundle_keeps_serving_and_is_not_retried(tmp_path, bundle_path, insurance_predictor,
+                                                         count_bundle_loads):
+    path = tmp_path / 'model.bundle'
+    shutil.copy(bundle_path, path)
+    registry = registry_for(insurance_predictor, tmp_path)
+    good = registry.get()
+
+    path.write_bytes(b'not a bundle')
+    assert registry.get() is good
+    assert registry.get() is good
+    assert len(count_bundle_loads) == 2  # the corrupt file was tried once
+    stats = registry.stats()
+    assert stats['failed_loads'] == 1 and 'BundleError' in stats['last_error']
+    assert stats['model_version'] == good.version
+
+    shutil.copy(bundle_path, path)
+    assert registry.get() is not good
+    assert registry.stats()['last_error'] is None
+
+
+def test_bad_pickle_without_a_previous_model(tmp_path, repo_dir, insurance_predictor, monkeypatch):
+    pytest.importorskip('sklearn')
+    (tmp_path / 'model.pkl').write_bytes(b'not a pickle')
+    shutil.copy(os.path.join(repo_dir, 'scaler.pkl'), tmp_path / 'scaler.pkl')
+    registry = registry_for(insurance_predictor, tmp_path)
+
+    loads = []
+    load_model_artifacts = insurance_predictor.load_model_artifacts
+
+    def counting_load_model_artifacts(*paths):
+        loads.append(paths)
+        return load_model_artifacts(*paths)
+
+    monkeypatch.setattr(insurance_predictor, 'load_model_artifacts', counting_load_model_artifacts)
+    for _ in range(3):
+        with pytest.raises(insurance_predictor.ModelLoadError):
+            registry.get()
+    assert len(loads) == 1
+    assert registry.stats()['failed_loads'] == 1
+
+    monkeypatch.setattr(insurance_predictor, '_registry', registry)
+    result = insurance_predictor.predict_insurance_eligibility(45, 'Male', 15, 8, 6)
+    assert result['status'] == 'error' and 'could not be loaded' in result['error']
+
+    shutil.copy(os.path.join(repo_dir, 'model.pkl'), tmp_path / 'model.pkl')
+    assert registry.get().source == 'pickle'
+    assert 'eligible' in insurance_predictor.predict_insurance_eligibility(45, 'Male', 15, 8, 6)
+
+
+def test_missing_files(tmp_path, insurance_predictor, monkeypatch):
+    monkeypatch.setattr(insurance_predictor, '_registry', registry_for(insurance_predictor, tmp_path))
+    result = insurance_predictor.predict_insurance_eligibility(45, 'Male', 15, 8, 6)
+    assert result['error'].startswith('Model files not found')
@@ -0,0 +1,143 @@
+"""Model bundle round trip, versioning and corruption handling."""
+
+import hashlib
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from code_index import CodeFrequencyIndex
+from model_bundle import BundleError, export_bundle, load_bundle, write_bundle
+
+
+def feature_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(1, 120, n), rng.integers(0, 2, n), rng.integers(1, 684, n),
+        rng.integers(1, 1816, n), rng.integers(1, 7, n),
+    ]).astype(np.float64)
+
+
+def sklearn_proba(model, scaler, X):
+    return model.predict_proba(scaler.transform(X))
+
+
+@pytest.fixture
+def exported(tmp_path, sklearn_model, sklearn_scaler, icd_mapping, cpt_mapping):
+    path = tmp_path / 'model.bundle'
+    export_bundle(str(path), sklearn_model, sklearn_scaler, list(sklearn_scaler.feature_names_in_),
+                  metrics={'accuracy': 0.6}, icd_mapping=icd_mapping, cpt_mapping=cpt_mapping)
+    return path
+
+
+def read_header(path):
+    raw = path.read_bytes()
+    _, length = struct.unpack('<8sI', raw[:12])
+    return raw, length, json.loads(raw[12:12 + length])
+
+
+def rewrite_header(path, header):
+    """Rewrite the file with a new header (and a valid header digest), keeping the data section."""
+    raw, length, _ = read_header(path)
+    data = raw[-(-(12 + length) // 64) * 64:]
+    header = {key: value for key, value in header.items() if key != 'header_sha256'}
+    header['header_sha256'] = hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    data_start = -(-(12 + len(header_bytes)) // 64) * 64
+    path.write_bytes(raw[:8] + struct.pack('<I', len(header_bytes)) + header_bytes
+                     + b'\0' * (data_start - 12 - len(header_bytes)) + data)
+
+
+def flip(path, position):
+    data = bytearray(path.read_bytes())
+    data[position] ^= 0x01
+    path.write_bytes(bytes(data))
+
+
+def test_round_trip(exported, sklearn_model, sklearn_scaler, icd_mapping, cpt_mapping):
+    bundle = load_bundle(str(exported))
+    assert bundle.features == list(sklearn_scaler.feature_names_in_)
+    assert bundle.metrics == {'accuracy': 0.6}
+    X = np.vstack([feature_rows(1000), sklearn_scaler.data_min_, sklearn_scaler.data_max_])
+    np.testing.assert_allclose(bundle.engine().predict_proba(X), sklearn_proba(sklearn_model, sklearn_scaler, X),
+                               rtol=0, atol=1e-12)
+
+    # Code tables come back as the same (normalized) index as the pickled mapping
+    for table, mapping in (('icd', icd_mapping), ('cpt', cpt_mapping)):
+        index, reference = bundle.code_index(table), CodeFrequencyIndex(mapping)
+        assert index.table == reference.table
+        assert index.fallback == reference.fallback
+
+
+def test_version_is_stable_and_covers_the_header(tmp_path):
+    arrays = {'coef': np.arange(5, dtype=np.float64)}
+    write_bundle(str(tmp_path / 'a.bundle'), arrays, {'features': list('abcde')})
+    write_bundle(str(tmp_path / 'b.bundle'), arrays, {'features': list('abcde')})
+    write_bundle(str(tmp_path / 'c.bundle'), arrays, {'features': list('abcdf')})
+    a, b, c = (load_bundle(str(tmp_path / f'{name}.bundle')) for name in 'abc')
+    assert a.version == b.version == load_bundle(str(tmp_path / 'a.bundle')).version
+    assert c.version != a.version  # same arrays, different header
+    assert c.header['data_sha256'] == a.header['data_sha256']
+
+
+def test_shipped_bundle_matches_pickles(bundle_path, sklearn_model, sklearn_scaler):
+    X = feature_rows(1000, seed=2)
+    np.testing.assert_allclose(load_bundle(bundle_path).engine().predict_proba(X),
+                               sklearn_proba(sklearn_model, sklearn_scaler, X), rtol=0, atol=1e-12)
+
+
+def test_corrupt_data_is_rejected(exported):
+    flip(exported, -1)
+    with pytest.raises(BundleError, match='checksum'):
+        load_bundle(str(exported))
+    load_bundle(str(exported), verify=False)  # only the header is checked without verify
+
+
+@pytest.mark.parametrize('verify', [True, False])
+def test_flipped_header_value_is_rejected(exported, verify):
+    raw, _, _ = read_header(exported)
+    flip(exported, raw.index(b'"accuracy": 0.6') + len(b'"accuracy": 0.'))  # 0.6 -> 0.7
+    with pytest.raises(BundleError, match='header checksum'):
+        load_bundle(str(exported), verify=verify)
+
+
+def test_non_utf8_header_is_rejected(exported):
+    raw, _, _ = read_header(exported)
+    data = bytearray(raw)
+    data[raw.index(b'"features"')] = 0xFF
+    exported.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match='unreadable header'):
+        load_bundle(str(exported))
+
+
+def test_broken_json_header_is_rejected(exported):
+    raw, _, _ = read_header(exported)
+    data = bytearray(raw)
+    data[12] = ord('[')
+    exported.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match='unreadable header'):
+        load_bundle(str(exported))
+
+
+def test_header_length_past_end_of_file(exported):
+    raw = exported.read_bytes()
+    exported.write_bytes(raw[:8] + struct.pack('<I', len(raw)) + raw[12:])
+    with pytest.raises(BundleError, match='runs past the end'):
+        load_bundle(str(exported))
+
+
+def test_array_offset_past_end_of_file(exported):
+    _, _, header = read_header(exported)
+    header['arrays']['coef']['offset'] = 10 ** 9
+    rewrite_header(exported, header)
+    with pytest.raises(BundleError, match="'coef' runs past the end"):
+        load_bundle(str(exported), verify=False)
+
+
+@pytest.mark.parametrize('contents', [b'', b'IECB', b'IECBNDL\0\x05\0\0\0{}'])
+def test_short_files_are_rejected(tmp_path, contents):
+    path = tmp_path / 'short.bundle'
+    path.write_bytes(contents)
+    with pytest.raises(BundleError):
+        load_bundle(str(path))
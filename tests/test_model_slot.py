@@ -0,0 +1,210 @@
+"""model_slot: validated hot-swaps of the serving bundle and /admin/reload-model."""
+
+import importlib.util
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+import model_slot
+from model_bundle import BundleError, load_bundle, write_bundle
+from model_slot import ModelSlot, load_serving_model
+
+ROWS = np.array([[45.0, 1, 15, 8, 6], [70.0, 0, 300, 900, 2]])
+
+
+def write_variant(source, path, scale=1.0, features=None):
+    """The bundle at source with its coefficients scaled (and optionally other features), written to path."""
+    bundle = load_bundle(str(source))
+    arrays = {name: np.array(array) for name, array in bundle.arrays.items()}
+    arrays['coef'] = arrays['coef'] * scale
+    header = {key: value for key, value in bundle.header.items()
+              if key not in ('arrays', 'data_sha256', 'header_sha256', 'schema_version')}
+    if features is not None:
+        header['features'] = features
+    write_bundle(str(path), arrays, header)
+
+
+def replace_with(path, contents):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(contents)
+    os.replace(tmp, path)
+
+
+@pytest.fixture
+def served_path(tmp_path, bundle_path):
+    path = tmp_path / 'model.bundle'
+    shutil.copy(bundle_path, path)
+    return path
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Paths passed to load_serving_model by the slot."""
+    calls = []
+
+    def counting_load_serving_model(path, *args, **kwargs):
+        calls.append(path)
+        return load_serving_model(path, *args, **kwargs)
+
+    monkeypatch.setattr(model_slot, 'load_serving_model', counting_load_serving_model)
+    return calls
+
+
+def wait_for_reload(slot):
+    loader = slot._loader
+    if loader is not None:
+        loader.join(10)
+
+
+def test_valid_swap_keeps_the_in_flight_snapshot(served_path):
+    swaps = []
+    slot = ModelSlot(str(served_path), check_interval=0, on_swap=swaps.append)
+    in_flight = slot.get()
+    before = in_flight.engine.eligible_probability(ROWS)
+
+    write_variant(served_path, served_path, scale=0.5)
+    served = slot.reload('test', wait=True)
+    assert served is slot.get() and served is not in_flight
+    assert served.version != in_flight.version
+    assert not np.array_equal(served.engine.eligible_probability(ROWS), before)
+    # The request that started on the old snapshot still scores with it (its mapping keeps the old inode)
+    np.testing.assert_array_equal(in_flight.engine.eligible_probability(ROWS), before)
+
+    stats = slot.stats()
+    assert stats['model_version'] == served.version
+    assert stats['swap_count'] == 1 and stats['last_swap_reason'] == 'test'
+    assert stats['last_error'] is None and stats['failed_reloads'] == 0
+    assert swaps == [in_flight, served]
+
+
+def test_file_watch_swaps_in_the_background(served_path, loads):
+    slot = ModelSlot(str(served_path), check_interval=0.001)
+    original = slot.get()
+    write_variant(served_path, served_path, scale=0.5)
+    time.sleep(0.01)
+    assert slot.get() is original  # the load runs on a background thread
+    wait_for_reload(slot)
+    assert slot.get().version != original.version
+    assert slot.stats()['last_swap_reason'] == 'file change'
+    assert len(loads) == 2  # the initial load and the swap
+
+
+@pytest.mark.parametrize('contents', [b'', b'not a bundle', 'truncated'])
+def test_corrupt_bundle_keeps_serving_and_is_not_retried(served_path, bundle_path, loads, contents):
+    slot = ModelSlot(str(served_path), check_interval=0.001)
+    original = slot.get()
+    if contents == 'truncated':
+        contents = served_path.read_bytes()[:-100]
+    replace_with(served_path, contents)
+
+    assert slot.reload('test', wait=True) is original
+    stats = slot.stats()
+    assert stats['model_version'] == original.version
+    assert stats['failed_reloads'] == 1 and stats['swap_count'] == 0
+    assert stats['last_error'].startswith('BundleError')
+    np.testing.assert_array_equal(slot.get().engine.eligible_probability(ROWS),
+                                  original.engine.eligible_probability(ROWS))
+
+    # The watch skips the file that failed until it changes again
+    for _ in range(5):
+        time.sleep(0.002)
+        assert slot.get() is original
+        wait_for_reload(slot)
+    assert len(loads) == 2  # the initial load and the failed reload
+
+    # A fixed file is picked up again
+    write_variant(bundle_path, served_path, scale=0.5)
+    time.sleep(0.002)
+    slot.get()
+    wait_for_reload(slot)
+    assert len(loads) == 3
+    assert slot.get().version != original.version and slot.stats()['last_error'] is None
+
+
+def test_bundle_with_other_features_is_rejected(served_path):
+    slot = ModelSlot(str(served_path), check_interval=0)
+    original = slot.get()
+    features = list(original.bundle.features)
+    write_variant(served_path, served_path, features=features[::-1])
+
+    assert slot.reload('test', wait=True) is original
+    assert 'expects features' in slot.stats()['last_error']
+
+    with pytest.raises(BundleError, match='expects features'):
+        load_serving_model(str(served_path), expected_features=features)
+    with pytest.raises(BundleError, match='expects features'):
+        ModelSlot(str(served_path), expected_features=features)
+
+
+def test_missing_tables_are_rejected(served_path):
+    slot = ModelSlot(str(served_path), check_interval=0)
+    bundle = load_bundle(str(served_path))
+    arrays = {name: np.array(array) for name, array in bundle.arrays.items() if not name.startswith('icd_')}
+    header = {key: value for key, value in bundle.header.items()
+              if key not in ('arrays', 'data_sha256', 'header_sha256', 'schema_version')}
+    write_bundle(str(served_path), arrays, header)
+    assert slot.reload('test', wait=True) is slot.get()
+    assert slot.stats()['failed_reloads'] == 1
+
+
+@pytest.fixture(scope='module')
+def service_module(repo_dir):
+    """The root api.py, loaded by path (tests for app/ put app/api.py first on sys.path)."""
+    pytest.importorskip('flask')
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('MODEL_BUNDLE_PATH', os.path.join(repo_dir, 'model.bundle'))
+        spec = importlib.util.spec_from_file_location('service_api', os.path.join(repo_dir, 'api.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def api(service_module, served_path, monkeypatch):
+    api = service_module
+    monkeypatch.setattr(api, 'model_slot', ModelSlot(str(served_path), check_interval=0))
+    monkeypatch.setattr(api, 'MODEL_ADMIN_TOKEN', 's3cret')
+    return api
+
+
+def assert_not_reloaded(slot):
+    stats = slot.stats()
+    assert slot._loader is None and stats['swap_count'] == 0 and stats['failed_reloads'] == 0
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': ''}, {'X-Admin-Token': 'wrong'},
+                                     {'X-Admin-Token': 's3cret '}])
+def test_admin_reload_rejects_bad_tokens(api, headers):
+    response = api.app.test_client().post('/admin/reload-model', headers=headers)
+    assert response.status_code == 403
+    assert_not_reloaded(api.model_slot)
+
+
+def test_admin_reload_is_disabled_without_a_token(api, monkeypatch):
+    monkeypatch.setattr(api, 'MODEL_ADMIN_TOKEN', None)
+    response = api.app.test_client().post('/admin/reload-model', headers={'X-Admin-Token': ''})
+    assert response.status_code == 403
+    assert_not_reloaded(api.model_slot)
+
+
+def test_admin_reload_swaps_or_reports_the_error(api, served_path):
+    client = api.app.test_client()
+    original = api.model_slot.get().version
+
+    write_variant(served_path, served_path, scale=0.5)
+    response = client.post('/admin/reload-model', headers={'X-Admin-Token': 's3cret'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['reloaded'] is True and body['error'] is None
+    assert body['previous_version'] == original and body['model_version'] == api.model_slot.get().version != original
+
+    replace_with(served_path, b'not a bundle')
+    response = client.post('/admin/reload-model', headers={'X-Admin-Token': 's3cret'})
+    body = response.get_json()
+    assert response.status_code == 500
+    assert body['reloaded'] is False and body['error'].startswith('BundleError')
+    assert body['model_version'] == body['previous_version'] == api.model_slot.get().version
@@ -0,0 +1,99 @@
+"""ParallelScorer results and the lifetime of input_buffer() arrays."""
+
+import subprocess
+import sys
+import textwrap
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from model_bundle import load_bundle
+from parallel_scoring import ParallelScorer
+
+
+@pytest.fixture(scope='module')
+def engine(bundle_path):
+    return load_bundle(bundle_path).engine()
+
+
+@pytest.fixture
+def scorer(engine):
+    with ParallelScorer(engine, n_workers=2, chunk_size=256) as scorer:
+        yield scorer
+
+
+def feature_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(1, 120, n), rng.integers(0, 2, n), rng.integers(1, 684, n),
+        rng.integers(1, 1816, n), rng.integers(1, 7, n),
+    ]).astype(np.float64)
+
+
+def test_matches_in_process_engine(engine, scorer):
+    X = feature_rows(2000)
+    np.testing.assert_array_equal(scorer.eligible_probability(X), engine.eligible_probability(X))
+    np.testing.assert_array_equal(scorer.predict_proba(X), engine.predict_proba(X))
+
+
+def test_input_buffer_survives_other_calls(engine, scorer):
+    X = feature_rows(1000, seed=1)
+    buffer = scorer.input_buffer(*X.shape)
+    buffer[:] = X
+    expected = engine.eligible_probability(X)
+    np.testing.assert_array_equal(scorer.eligible_probability(buffer), expected)
+
+    other = feature_rows(1000, seed=2)
+    np.testing.assert_array_equal(scorer.eligible_probability(other), engine.eligible_probability(other))
+    second = scorer.input_buffer(*other.shape)
+    second[:] = other
+
+    np.testing.assert_array_equal(buffer, X)  # not overwritten by the other calls
+    np.testing.assert_array_equal(scorer.eligible_probability(buffer), expected)
+    np.testing.assert_array_equal(scorer.eligible_probability(second), engine.eligible_probability(other))
+
+
+def test_buffer_block_is_freed_with_the_array(scorer):
+    buffer = scorer.input_buffer(1000)
+    name = scorer._buffers[id(buffer)][1]
+    view = buffer[10:20]
+    del buffer
+    shared_memory.SharedMemory(name=name).close()  # still alive through the view
+    del view
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_input_buffer_survives_regrow_and_close(bundle_path, repo_dir):
+    # Run in a child: a buffer unmapped under the array would crash the interpreter
+    script = textwrap.dedent(f'''
+        import sys
+        import numpy as np
+        sys.path.insert(0, {repo_dir!r})
+        from model_bundle import load_bundle
+        from parallel_scoring import ParallelScorer
+
+        engine = load_bundle({bundle_path!r}).engine()
+        X = np.tile([[45.0, 1, 15, 8, 6], [70.0, 0, 300, 900, 2]], (500, 1))
+        scorer = ParallelScorer(engine, n_workers=2, chunk_size=256)
+        buffer = scorer.input_buffer(*X.shape)
+        buffer[:] = X
+        expected = engine.eligible_probability(X)
+        assert np.array_equal(scorer.eligible_probability(buffer), expected)
+
+        big = np.repeat(X, 8, axis=0)  # regrows the scorer's own blocks
+        assert np.array_equal(scorer.eligible_probability(big), engine.eligible_probability(big))
+        assert np.array_equal(buffer, X)
+        assert np.array_equal(scorer.eligible_probability(buffer), expected)
+
+        scorer.close()
+        assert np.array_equal(buffer, X)
+        assert np.array_equal(scorer.eligible_probability(buffer), expected)  # restarts the pool
+        scorer.close()
+        buffer[0, 0] = 1.0
+        print('ok')
+    ''')
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert completed.stdout.strip() == 'ok'
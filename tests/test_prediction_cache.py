@@ -0,0 +1,54 @@
+"""PredictionCache keys, LRU eviction and behaviour across model versions."""
+
+import pytest
+
+from prediction_cache import PredictionCache
+
+
+def test_hit_and_int_float_rows_share_an_entry():
+    cache = PredictionCache(maxsize=10)
+    cache.put('v1', [45, 1, 15, 8, 6], 0.7)
+    assert cache.get('v1', [45.0, 1.0, 15.0, 8.0, 6.0]) == 0.7
+    assert cache.stats()['hits'] == 1
+
+
+def test_versions_never_share_entries():
+    cache = PredictionCache(maxsize=10)
+    cache.put('v1', [45, 1, 15, 8, 6], 0.7)
+    assert cache.get('v2', [45, 1, 15, 8, 6]) is None
+
+
+def test_interleaved_versions_do_not_wipe_the_cache():
+    # Mid-swap, requests on the old and the new snapshot alternate
+    cache = PredictionCache(maxsize=10)
+    cache.put('old', [1, 0, 1, 1, 1], 0.1)
+    cache.put('new', [1, 0, 1, 1, 1], 0.2)
+    assert cache.get('old', [1, 0, 1, 1, 1]) == 0.1
+    assert cache.get('new', [1, 0, 1, 1, 1]) == 0.2
+    assert cache.stats()['size'] == 2
+
+
+def test_old_version_ages_out_through_lru():
+    cache = PredictionCache(maxsize=3)
+    for i in range(3):
+        cache.put('old', [i, 0, 1, 1, 1], 0.1)
+    for i in range(3):
+        cache.put('new', [i, 0, 1, 1, 1], 0.2)
+    assert all(cache.get('old', [i, 0, 1, 1, 1]) is None for i in range(3))
+    assert all(cache.get('new', [i, 0, 1, 1, 1]) == 0.2 for i in range(3))
+    assert cache.stats()['evictions'] == 3
+
+
+def test_clear_keeps_counters():
+    cache = PredictionCache(maxsize=10)
+    cache.put('v1', [45, 1, 15, 8, 6], 0.7)
+    cache.get('v1', [45, 1, 15, 8, 6])
+    cache.clear()
+    assert cache.stats()['size'] == 0
+    assert cache.stats()['hits'] == 1
+    assert cache.get('v1', [45, 1, 15, 8, 6]) is None
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        PredictionCache(maxsize=0)
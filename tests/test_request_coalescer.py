@@ -0,0 +1,94 @@
+"""RequestCoalescer batching, per-request scorers and deadlines."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from request_coalescer import CoalescerTimeout, RequestCoalescer
+
+
+def constant_scorer(value, calls):
+    def score(X):
+        calls.append(len(X))
+        return np.full(len(X), value)
+    return score
+
+
+def submit_concurrently(coalescer, score_fns):
+    results = [None] * len(score_fns)
+
+    def worker(i):
+        results[i] = coalescer.submit([i, 0, 1, 1, 1], timeout=2.0, score_fn=score_fns[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(score_fns))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_rows_are_batched():
+    calls = []
+    coalescer = RequestCoalescer(constant_scorer(0.5, calls), window_ms=50, max_batch_size=8)
+    try:
+        assert submit_concurrently(coalescer, [None] * 8) == [0.5] * 8
+        assert sum(calls) == 8 and len(calls) < 8
+    finally:
+        coalescer.close()
+
+
+def test_each_row_is_scored_by_its_own_scorer():
+    # Mid-swap: requests on the old and the new model snapshot arrive together
+    old_calls, new_calls = [], []
+    old, new = constant_scorer(0.1, old_calls), constant_scorer(0.9, new_calls)
+    coalescer = RequestCoalescer(constant_scorer(0.5, []), window_ms=50, max_batch_size=16)
+    try:
+        score_fns = [old, new] * 6
+        results = submit_concurrently(coalescer, score_fns)
+        assert results == [0.1, 0.9] * 6
+        assert sum(old_calls) == 6 and sum(new_calls) == 6
+        assert coalescer.stats()['requests'] == 12
+    finally:
+        coalescer.close()
+
+
+def test_scorer_error_reaches_only_its_rows():
+    def broken(X):
+        raise RuntimeError('model unavailable')
+
+    coalescer = RequestCoalescer(constant_scorer(0.5, []), window_ms=50, max_batch_size=4)
+    try:
+        results = []
+
+        def worker(score_fn):
+            try:
+                results.append(coalescer.submit([1, 0, 1, 1, 1], timeout=2.0, score_fn=score_fn))
+            except RuntimeError as e:
+                results.append(str(e))
+
+        threads = [threading.Thread(target=worker, args=(fn,)) for fn in (broken, None)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(map(str, results)) == ['0.5', 'model unavailable']
+    finally:
+        coalescer.close()
+
+
+def test_deadline():
+    release = threading.Event()
+
+    def slow(X):
+        release.wait(2.0)
+        return np.zeros(len(X))
+
+    coalescer = RequestCoalescer(slow, window_ms=1, max_batch_size=4)
+    try:
+        with pytest.raises(CoalescerTimeout):
+            coalescer.submit([1, 0, 1, 1, 1], timeout=0.05)
+    finally:
+        release.set()
+        coalescer.close()
@@ -0,0 +1,116 @@
+"""request_profiling: which requests are profiled and what a profiled response carries."""
+
+import json
+import os
+import threading
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from request_profiling import RequestProfiler  # noqa: E402
+from service_metrics import ServiceMetrics  # noqa: E402
+
+
+def make_app(profiler):
+    """A service shaped like api.py: stages are timed through metrics.timer(profiler.stages())."""
+    app = flask.Flask(__name__)
+    metrics = ServiceMetrics()
+    profiler.install(app)
+
+    @app.route('/predict', methods=['POST'])
+    def predict():
+        timer = metrics.timer(profiler.stages())
+        data = flask.request.get_json()
+        timer.mark('parse')
+        result = {'eligible': data['age'] > 40}
+        timer.mark('predict_proba')
+        return flask.jsonify(result)
+
+    @app.route('/predict-stream', methods=['POST'])
+    def predict_stream():
+        timer = metrics.timer(profiler.stages())
+
+        def generate():
+            for i in range(3):
+                timer.mark('predict_proba')
+                yield f'{{"index": {i}}}\n'
+        return flask.Response(generate(), mimetype='application/x-ndjson')
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    return app.test_client()
+
+
+def post(client, headers=None, path='/predict'):
+    return client.post(path, json={'age': 45}, headers=headers or {})
+
+
+def assert_not_profiled(response):
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+    assert 'X-Profile-Id' not in response.headers
+    assert 'X-Profile-Top' not in response.headers
+
+
+@pytest.mark.parametrize('mode', ['cprofile', 'sample', '1'])
+def test_profiled_request_gets_the_headers(mode):
+    client = make_app(RequestProfiler(enabled=True))
+    response = post(client, {'X-Profile': mode})
+    assert response.status_code == 200 and response.get_json() == {'eligible': True}
+    timing = response.headers['Server-Timing'].split(', ')
+    assert [metric.split(';')[0] for metric in timing] == ['parse', 'predict_proba', 'total']
+    assert all(metric.split(';')[1].startswith('dur=') for metric in timing)
+    assert f'-{os.getpid()}-' in response.headers['X-Profile-Id']
+    assert 'X-Profile-Top' in response.headers
+
+
+def test_unprofiled_requests_get_no_headers():
+    client = make_app(RequestProfiler(enabled=True))
+    assert_not_profiled(post(client))
+    assert_not_profiled(post(client, {'X-Profile': 'flamegraph'}))  # unknown mode
+
+
+def test_disabled_profiler_ignores_the_header():
+    profiler = RequestProfiler(enabled=False)
+    client = make_app(profiler)
+    assert_not_profiled(post(client, {'X-Profile': 'cprofile'}))
+    assert profiler.stages() is None
+
+
+def test_token_is_required_when_set():
+    client = make_app(RequestProfiler(enabled=True, token='s3cret'))
+    assert_not_profiled(post(client, {'X-Profile': 'cprofile'}))
+    assert_not_profiled(post(client, {'X-Profile': 'cprofile', 'X-Profile-Token': 'wrong'}))
+    assert 'X-Profile-Id' in post(client, {'X-Profile': 'cprofile', 'X-Profile-Token': 's3cret'}).headers
+
+
+def test_profiles_are_written_to_the_profile_dir(tmp_path):
+    client = make_app(RequestProfiler(enabled=True, profile_dir=str(tmp_path)))
+    profile_id = post(client, {'X-Profile': 'cprofile'}).headers['X-Profile-Id']
+    assert (tmp_path / f'{profile_id}.prof').exists()
+    details = json.loads((tmp_path / f'{profile_id}.json').read_text())
+    assert details['mode'] == 'cprofile' and details['path'] == '/predict' and details['status'] == 200
+    assert list(details['stages_ms']) == ['parse', 'predict_proba']
+
+    profile_id = post(client, {'X-Profile': 'sample'}).headers['X-Profile-Id']
+    assert (tmp_path / f'{profile_id}.folded').exists()
+
+
+def test_streamed_profile_is_saved_when_the_body_ends(tmp_path):
+    client = make_app(RequestProfiler(enabled=True, profile_dir=str(tmp_path)))
+    response = post(client, {'X-Profile': 'cprofile'}, path='/predict-stream')
+    profile_id = response.headers['X-Profile-Id']
+    assert 'predict_proba' not in response.headers['Server-Timing']  # headers precede the body
+    assert response.get_data(as_text=True).count('\n') == 3
+    details = json.loads((tmp_path / f'{profile_id}.json').read_text())
+    assert list(details['stages_ms']) == ['predict_proba']
+
+
+def test_failing_view_is_not_left_profiling():
+    client = make_app(RequestProfiler(enabled=True))
+    assert client.get('/boom', headers={'X-Profile': 'sample'}).status_code == 500
+    assert 'request-profile-sampler' not in [thread.name for thread in threading.enumerate()]
+    assert_not_profiled(post(client))
@@ -0,0 +1,111 @@
+"""response_formats: every format round-trips the same scores, with and without orjson."""
+
+import json
+
+import numpy as np
+import pytest
+
+import response_formats
+from response_formats import ARROW, COLUMNAR, JSON, BatchScores, UnsupportedFormat
+
+ERRORS = [{'field': 'age', 'code': 'out_of_range', 'message': 'Age must be 1-120, got 400'}]
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def json_backend(request, monkeypatch):
+    """Run once with orjson (when installed) and once with the stdlib fallback."""
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(response_formats, 'orjson', None)
+    return request.param
+
+
+def batch_scores():
+    probability = np.array([0.9, np.nan, 0.2, 0.5, np.nan])
+    valid = ~np.isnan(probability)
+    errors = {1: ERRORS, 4: [{'field': None, 'code': 'malformed', 'message': 'Patient must be a JSON object'}]}
+    return BatchScores(probability, valid, errors)
+
+
+def test_json_round_trip(json_backend):
+    body = json.loads(response_formats.encode_batch(batch_scores(), JSON))
+    assert body['total'] == 5
+    assert body['results'][0] == {'eligible': True, 'confidence': 0.9, 'eligible_probability': 0.9}
+    assert body['results'][2] == {'eligible': False, 'confidence': 0.8, 'eligible_probability': 0.2}
+    assert body['results'][3]['eligible'] is False
+    assert body['results'][1] == {'error': 'Age must be 1-120, got 400', 'errors': ERRORS}
+    assert body['results'][4]['error'] == 'Patient must be a JSON object'
+
+
+def test_columnar_round_trip(json_backend):
+    body = json.loads(response_formats.encode_batch(batch_scores(), COLUMNAR))
+    assert body['total'] == 5 and body['offset'] == 0
+    assert body['eligible'] == [True, None, False, False, None]
+    assert body['eligible_probability'] == [0.9, None, 0.2, 0.5, None]  # NaN is written as null
+    assert body['confidence'] == [0.9, None, 0.8, 0.5, None]
+    assert [error['index'] for error in body['errors']] == [1, 4]
+    assert body['errors'][0]['errors'] == ERRORS
+
+
+def test_columnar_without_errors_keeps_a_boolean_array(json_backend):
+    scores = BatchScores(np.array([0.7, 0.1]), np.array([True, True]), {})
+    body = json.loads(response_formats.encode_batch(scores, COLUMNAR))
+    assert body['eligible'] == [True, False] and body['errors'] == []
+
+
+def test_backends_produce_the_same_documents(monkeypatch):
+    pytest.importorskip('orjson')
+    scores = batch_scores()
+    with_orjson = {fmt: json.loads(response_formats.encode_batch(scores, fmt)) for fmt in (JSON, COLUMNAR)}
+    monkeypatch.setattr(response_formats, 'orjson', None)
+    assert with_orjson == {fmt: json.loads(response_formats.encode_batch(scores, fmt)) for fmt in (JSON, COLUMNAR)}
+
+
+def test_json_stream_chunks_carry_the_offset(json_backend):
+    chunk = response_formats.encode_stream_chunk(batch_scores(), JSON, offset=100)
+    lines = [json.loads(line) for line in chunk.decode().splitlines()]
+    assert [line['index'] for line in lines] == [100, 101, 102, 103, 104]
+    assert 'error' in lines[1] and lines[0]['eligible'] is True
+
+    columnar = json.loads(response_formats.encode_stream_chunk(batch_scores(), COLUMNAR, offset=100))
+    assert columnar['offset'] == 100 and [error['index'] for error in columnar['errors']] == [101, 104]
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    table = pa.ipc.open_stream(response_formats.encode_batch(batch_scores(), ARROW)).read_all()
+    assert table.schema == response_formats.arrow_schema()
+    columns = table.to_pydict()
+    assert columns['index'] == [0, 1, 2, 3, 4]
+    assert columns['eligible'] == [True, None, False, False, None]
+    assert columns['eligible_probability'] == [0.9, None, 0.2, 0.5, None]
+    assert columns['confidence'] == [0.9, None, 0.8, 0.5, None]
+    assert columns['error'] == [None, 'Age must be 1-120, got 400', None, None, 'Patient must be a JSON object']
+
+
+def test_arrow_stream_chunks_concatenate():
+    pa = pytest.importorskip('pyarrow')
+    body = b''.join([
+        response_formats.arrow_stream_start(),
+        response_formats.encode_stream_chunk(batch_scores(), ARROW, offset=0),
+        response_formats.encode_stream_chunk(BatchScores(np.array([0.6]), np.array([True]), {}), ARROW, offset=5),
+        response_formats.ARROW_EOS,
+    ])
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.column('index').to_pylist() == [0, 1, 2, 3, 4, 5]
+    assert table.column('error').null_count == 4
+
+
+def test_negotiate():
+    datastructures = pytest.importorskip('werkzeug.datastructures')
+
+    def accept(*mimetypes):
+        return datastructures.MIMEAccept([(mimetype, 1) for mimetype in mimetypes])
+
+    assert response_formats.negotiate(accept()) == JSON
+    assert response_formats.negotiate(accept('text/html')) == JSON
+    assert response_formats.negotiate(accept(response_formats.COLUMNAR_MIMETYPE)) == COLUMNAR
+    assert response_formats.negotiate(accept(response_formats.COLUMNAR_MIMETYPE), 'json') == JSON
+    with pytest.raises(UnsupportedFormat, match='Unknown format'):
+        response_formats.negotiate(accept(), 'xml')
@@ -0,0 +1,75 @@
+"""Parity of the fused scoring engine with the sklearn pipeline."""
+
+import numpy as np
+import pytest
+
+from scoring_engine import FusedLogisticScorer, check_parity
+
+
+@pytest.fixture(scope='module')
+def engine(sklearn_model, sklearn_scaler):
+    return FusedLogisticScorer.from_sklearn(sklearn_model, sklearn_scaler)
+
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(1, 120, n),
+        rng.integers(0, 2, n),
+        rng.integers(1, 684, n),
+        rng.integers(1, 1816, n),
+        rng.integers(1, 7, n),
+    ]).astype(np.float64)
+
+
+def edge_rows(scaler):
+    """Every corner of the training range, plus rows at the range's min and max."""
+    low, high = scaler.data_min_, scaler.data_max_
+    corners = np.array(np.meshgrid(*zip(low, high))).reshape(len(low), -1).T
+    return np.vstack([corners, low, high])
+
+
+def expected(model, scaler, X):
+    X_scaled = scaler.transform(X)
+    return model.predict_proba(X_scaled), model.predict(X_scaled)
+
+
+@pytest.mark.parametrize('name, X', [
+    ('random in-range rows', random_rows(10_000)),
+    ('out-of-range rows', np.random.default_rng(1).uniform(-1e4, 1e4, (1000, 5))),
+    ('single row', np.array([[45, 1, 15, 8, 6]], dtype=np.float64)),
+])
+def test_matches_sklearn(engine, sklearn_model, sklearn_scaler, name, X):
+    proba, labels = expected(sklearn_model, sklearn_scaler, X)
+    np.testing.assert_allclose(engine.predict_proba(X), proba, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(engine.predict(X), labels)
+
+
+def test_matches_sklearn_at_training_range_edges(engine, sklearn_model, sklearn_scaler):
+    X = edge_rows(sklearn_scaler)
+    proba, labels = expected(sklearn_model, sklearn_scaler, X)
+    np.testing.assert_allclose(engine.predict_proba(X), proba, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(engine.predict(X), labels)
+
+
+def test_single_row_as_1d_array(engine):
+    row = [45, 1, 15, 8, 6]
+    np.testing.assert_array_equal(engine.predict_proba(row), engine.predict_proba([row]))
+
+
+def test_empty_batch(engine):
+    X = np.empty((0, engine.n_features_in_))
+    assert engine.predict_proba(X).shape == (0, 2)
+    assert engine.eligible_probability(X).shape == (0,)
+    assert engine.predict(X).shape == (0,)
+
+
+def test_probabilities_sum_to_one(engine):
+    proba = engine.predict_proba(random_rows(1000))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+
+
+def test_check_parity_raises_on_mismatch(engine, sklearn_model, sklearn_scaler):
+    shifted = FusedLogisticScorer(engine.weights, engine.bias + 1.0)
+    with pytest.raises(AssertionError):
+        check_parity(shifted, sklearn_model, sklearn_scaler, random_rows(100))
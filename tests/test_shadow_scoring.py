@@ -0,0 +1,193 @@
+"""ShadowScorer argument validation and comparison of a candidate with the primary."""
+
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from code_index import CodeFrequencyIndex
+from shadow_scoring import ShadowScorer
+from validation import API_SCHEMA
+
+ICD, CPT = 2, 3  # API_SCHEMA columns of the code-backed frequencies
+
+
+class RecordingEngine:
+    """Candidate engine scoring column 0 / 100 and keeping every matrix it was given."""
+
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+        self.started = threading.Event()
+
+    def eligible_probability(self, X):
+        self.calls.append(X.copy())
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return X[:, 0] / 100
+
+
+class FailingEngine:
+    def eligible_probability(self, X):
+        raise RuntimeError('candidate exploded')
+
+
+def candidate(engine, version='candidate-1', code_indexes=None):
+    return SimpleNamespace(engine=engine, version=version, code_indexes=code_indexes)
+
+
+@pytest.fixture
+def make_scorer():
+    scorers = []
+
+    def make(engine, code_indexes=None, **kwargs):
+        served = candidate(engine, code_indexes=code_indexes)
+        kwargs.setdefault('poll_interval', 0.001)
+        kwargs.setdefault('max_cpu', 1)
+        scorer = ShadowScorer(lambda: served, **kwargs)
+        scorers.append(scorer)
+        return scorer
+
+    yield make
+    for scorer in scorers:
+        assert scorer.wait_idle()
+
+
+def rows(ages, icd=15.0, cpt=8.0):
+    return np.array([[age, 1.0, icd, cpt, 6.0] for age in ages])
+
+
+@pytest.mark.parametrize('max_cpu', [0, -0.1, 1.5])
+def test_max_cpu_outside_budget_range_is_rejected(max_cpu):
+    with pytest.raises(ValueError, match='max_cpu'):
+        ShadowScorer(lambda: None, max_cpu=max_cpu)
+
+
+@pytest.mark.parametrize('sample_rate', [-0.5, 2])
+def test_sample_rate_outside_unit_range_is_rejected(sample_rate):
+    with pytest.raises(ValueError, match='sample_rate'):
+        ShadowScorer(lambda: None, sample_rate=sample_rate)
+
+
+@pytest.mark.parametrize('max_cpu', [0.05, 1])
+def test_valid_max_cpu(max_cpu):
+    assert ShadowScorer(lambda: None, max_cpu=max_cpu).max_cpu == max_cpu
+
+
+def test_agreement_and_deltas(make_scorer):
+    engine = RecordingEngine()
+    scorer = make_scorer(engine)
+    # Candidate: 0.30, 0.60, 0.90 (row 2 is invalid and skipped), 0.45
+    features = rows([30, 60, 99, 90, 45])
+    primary = np.array([0.40, 0.40, np.nan, 0.95, 0.45])
+    valid = np.array([True, True, False, True, True])
+    assert scorer.submit(features, primary, valid)
+    assert scorer.submit(rows([80]), np.array([0.70]), np.array([True]))
+    assert scorer.wait_idle()
+
+    deltas = np.array([-0.10, 0.20, -0.05, 0.0, 0.10])
+    stats = scorer.stats()
+    assert stats['requests_scored'] == 2 and stats['rows_compared'] == 5
+    assert stats['agreement_rate'] == pytest.approx(4 / 5)  # only 0.60 vs 0.40 flips the decision
+    assert stats['mean_delta'] == pytest.approx(deltas.mean())
+    assert stats['mean_abs_delta'] == pytest.approx(np.abs(deltas).mean())
+    assert stats['max_abs_delta'] == pytest.approx(0.20)
+    assert stats['candidate_version'] == 'candidate-1'
+    assert stats['requests_dropped'] == stats['requests_failed'] == 0
+    assert [len(X) for X in engine.calls] == [4, 1]
+
+    lines = scorer.prometheus_lines()
+    assert 'shadow_events_total{event="rows"} 5' in lines
+    assert 'shadow_events_total{event="rows_agreed"} 4' in lines
+    assert 'shadow_probability_abs_delta_count 5' in lines
+
+
+def test_requests_without_valid_rows_are_not_scored(make_scorer):
+    engine = RecordingEngine()
+    scorer = make_scorer(engine)
+    assert scorer.submit(rows([50]), np.array([np.nan]), np.array([False]))
+    assert scorer.wait_idle()
+    assert engine.calls == [] and scorer.stats()['rows_compared'] == 0
+
+
+def test_requests_are_dropped_at_max_pending(make_scorer):
+    gate = threading.Event()
+    engine = RecordingEngine(gate)
+    scorer = make_scorer(engine, max_pending=3)
+    request = (rows([50]), np.array([0.5]), np.array([True]))
+
+    assert scorer.submit(*request)
+    assert engine.started.wait(5)  # the only worker is busy with the first request
+    assert [scorer.submit(*request) for _ in range(5)] == [True, True, True, False, False]
+    assert scorer.stats()['pending'] == 3 and scorer.stats()['requests_dropped'] == 2
+    assert 'shadow_events_total{event="dropped"} 2' in scorer.prometheus_lines()
+
+    gate.set()
+    assert scorer.wait_idle()
+    stats = scorer.stats()
+    assert stats['requests_scored'] == 4 and stats['requests_dropped'] == 2 and stats['pending'] == 0
+
+
+def test_unsampled_requests_are_not_counted(make_scorer):
+    scorer = make_scorer(RecordingEngine(), sample_rate=0)
+    assert not scorer.submit(rows([50]), np.array([0.5]), np.array([True]))
+    assert scorer.stats()['requests_dropped'] == 0 and scorer.stats()['pending'] == 0
+
+
+def code_request():
+    """Four rows; rows 1 and 3 resolved their ICD frequency from a raw code, row 2 is invalid."""
+    patients = [
+        {'icd_frequency': 15, 'cpt_frequency': 8},
+        {'icd': 'A09', 'cpt_frequency': 8},
+        {'icd': 'A09', 'cpt_frequency': 8},
+        {'icd': 'M54.5', 'cpt': 70100},
+    ]
+    features = rows([40, 50, 60, 70], icd=15.0, cpt=8.0)
+    features[3, CPT] = 9.0
+    primary = np.array([0.4, 0.5, np.nan, 0.7])
+    valid = np.array([True, True, False, True])
+    from_code = {'icd_frequency': np.array([False, True, True, True]),
+                 'cpt_frequency': np.array([False, False, False, True])}
+    return features, primary, valid, patients, from_code
+
+
+def test_raw_codes_are_re_resolved_through_the_candidate_tables(make_scorer):
+    engine = RecordingEngine()
+    tables = (CodeFrequencyIndex({'A09': 100, 'M54.5': 5000}), CodeFrequencyIndex({'70100': 40}))
+    scorer = make_scorer(engine, code_indexes=tables)
+    features, primary, valid, patients, from_code = code_request()
+    submitted = features.copy()
+    assert scorer.submit(features, primary, valid, patients, from_code)
+    assert scorer.wait_idle()
+
+    [X] = engine.calls
+    icd_high = next(field.high for field in API_SCHEMA.fields if field.code_key == 'icd')
+    np.testing.assert_array_equal(X[:, ICD], [15.0, 100.0, icd_high])  # 5000 clipped to the training range
+    np.testing.assert_array_equal(X[:, CPT], [8.0, 8.0, 40.0])
+    np.testing.assert_array_equal(features, submitted)  # the request's arrays are left alone
+
+
+def test_published_snapshot_applies_to_the_candidate_too(make_scorer):
+    engine = RecordingEngine()
+    tables = (CodeFrequencyIndex({'A09': 100}), CodeFrequencyIndex({'70100': 40}))
+    snapshot = (CodeFrequencyIndex({'A09': 15}), CodeFrequencyIndex({'70100': 9}))
+    scorer = make_scorer(engine, code_indexes=tables, get_code_indexes=lambda: snapshot)
+    features, primary, valid, patients, from_code = code_request()
+    assert scorer.submit(features, primary, valid, patients, from_code)
+    assert scorer.wait_idle()
+    np.testing.assert_array_equal(engine.calls[0], features[valid])
+
+
+def test_failed_candidate_is_counted(make_scorer):
+    scorer = make_scorer(FailingEngine())
+    assert scorer.submit(rows([50]), np.array([0.5]), np.array([True]))
+    assert scorer.submit(rows([60]), np.array([0.6]), np.array([True]))
+    assert scorer.wait_idle()
+
+    stats = scorer.stats()
+    assert stats['requests_failed'] == 2 and stats['requests_scored'] == 0
+    assert stats['last_error'] == 'RuntimeError: candidate exploded'
+    assert stats['rows_compared'] == 0 and stats['agreement_rate'] is None
+    assert 'shadow_events_total{event="failed"} 2' in scorer.prometheus_lines()
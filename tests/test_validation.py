@@ -0,0 +1,157 @@
+"""Schema.validate: the single-record fast path agrees with the array path."""
+
+import math
+
+import numpy as np
+import pytest
+
+from code_index import CodeFrequencyIndex
+from validation import API_SCHEMA, PREDICTOR_SCHEMA
+
+VALID = {'age': 45, 'gender': 'Male', 'icd_frequency': 15, 'cpt_frequency': 8, 'month': 6}
+DROP = object()  # patient(key=DROP) removes the key
+
+
+@pytest.fixture(scope='module')
+def code_indexes(icd_mapping, cpt_mapping):
+    return {'icd': CodeFrequencyIndex(icd_mapping), 'cpt': CodeFrequencyIndex(cpt_mapping)}
+
+
+def patient(**changes):
+    record = dict(VALID)
+    for key, value in changes.items():
+        if value is DROP:
+            record.pop(key)
+        else:
+            record[key] = value
+    return record
+
+
+def case_id(value):
+    return repr(value)[:40]
+
+
+def assert_paths_agree(schema, record, code_indexes, valid_record=VALID):
+    """validate([record]) (fast path when it applies) == row 0 of a two-row batch (array path)."""
+    single = schema.validate([record], code_indexes)
+    batch = schema.validate([record, valid_record], code_indexes)
+    assert batch.valid[1]
+    assert single.valid[0] == batch.valid[0]
+    np.testing.assert_array_equal(single.codes[0], batch.codes[0])
+    np.testing.assert_array_equal(single.features[0], batch.features[0])
+    assert {key: mask[0] for key, mask in single.from_code.items()} == \
+        {key: mask[0] for key, mask in batch.from_code.items()}
+
+    if batch.valid[0]:
+        assert single.row_errors(0) == []
+        np.testing.assert_array_equal(schema.validate_one(record, code_indexes), batch.features[0])
+        row = schema._fast_row(record, code_indexes) if type(record) is dict else None
+        if row is not None:
+            np.testing.assert_array_equal(row, batch.features[0])
+    else:
+        assert single.row_errors(0) == batch.row_errors(0)
+        with pytest.raises(ValueError) as excinfo:
+            schema.validate_one(record, code_indexes)
+        assert str(excinfo.value) == batch.error_message(0)
+    return batch
+
+
+def test_valid_record_takes_the_fast_path(code_indexes):
+    assert API_SCHEMA._fast_row(VALID, code_indexes) == [45.0, 1.0, 15.0, 8.0, 6.0]
+    assert_paths_agree(API_SCHEMA, VALID, code_indexes)
+
+
+@pytest.mark.parametrize('changes, valid', [
+    # Numeric strings are parsed by the array path
+    ({'age': '45'}, True),
+    ({'age': ' 45.9 '}, True),
+    ({'icd_frequency': '15'}, True),
+    ({'age': 'abc'}, False),
+    ({'age': ''}, False),
+    ({'age': [45]}, False),
+    # Booleans count as 0/1
+    ({'gender': True}, False),
+    ({'age': True}, True),
+    ({'month': False}, False),
+    # NaN and infinities
+    ({'age': math.nan}, False),
+    ({'age': 'nan'}, False),
+    ({'age': math.inf}, False),
+    ({'cpt_frequency': -math.inf}, False),
+    ({'age': '1e400'}, False),
+    ({'age': 10 ** 400}, False),
+    ({'month': -10 ** 400}, False),
+    # Integer fields truncate toward zero before the range check
+    ({'age': 45.9}, True),
+    ({'age': 120.9}, True),
+    ({'age': 0.9}, False),
+    ({'month': 6.5}, True),
+    ({'month': 7.0}, False),
+    ({'icd_frequency': 683.99}, True),
+    ({'cpt_frequency': -0.5}, False),
+    # Enums are case-insensitive but not trimmed
+    ({'gender': 'FEMALE'}, True),
+    ({'gender': ' male'}, False),
+    ({'gender': None}, False),
+    ({'gender': DROP}, False),
+], ids=case_id)
+def test_scalar_values(code_indexes, changes, valid):
+    batch = assert_paths_agree(API_SCHEMA, patient(**changes), code_indexes)
+    assert batch.valid[0] == valid
+
+
+def test_integer_fields_truncate(code_indexes):
+    batch = assert_paths_agree(API_SCHEMA, patient(age=45.9, month=6.5, icd_frequency='15.7'), code_indexes)
+    np.testing.assert_array_equal(batch.features[0], [45.0, 1.0, 15.0, 8.0, 6.0])
+    # Non-integer fields keep the fraction
+    record = {'age': 45.9, 'gender': 'male', 'icd_freq': 15.5, 'cpt_freq': 8, 'month': 5.5}
+    batch = assert_paths_agree(PREDICTOR_SCHEMA, record, None,
+                               valid_record={'age': 45, 'gender': 'male', 'icd_freq': 15, 'cpt_freq': 8, 'month': 6})
+    np.testing.assert_array_equal(batch.features[0], [45.9, 1.0, 15.5, 8.0, 5.5])
+
+
+@pytest.mark.parametrize('changes, error', [
+    ({'icd_frequency': DROP, 'icd': 'A09'}, None),
+    ({'icd_frequency': None, 'icd': ' a09 '}, None),
+    ({'icd_frequency': DROP, 'icd': 'ZZZ99'}, None),            # unseen: the table's fallback
+    ({'icd_frequency': DROP, 'icd': 'M54.5'}, None),            # counted past the training range
+    ({'cpt_frequency': DROP, 'cpt': 70100}, None),
+    ({'cpt_frequency': DROP, 'cpt': '70100'}, None),
+    ({'icd': 'A09'}, None),                                     # the frequency wins
+    ({'cpt_frequency': DROP, 'cpt': 70100.0}, 'invalid_code'),
+    ({'icd_frequency': DROP, 'icd': True}, 'invalid_code'),
+    ({'icd_frequency': DROP, 'icd': ['A09']}, 'invalid_code'),
+    ({'icd_frequency': DROP, 'icd': {}}, 'invalid_code'),
+    ({'icd_frequency': DROP, 'icd': None}, 'missing'),
+    ({'icd_frequency': DROP}, 'missing'),
+    ({'icd_frequency': 'abc', 'icd': 'A09'}, 'not_a_number'),  # no fallback for a bad frequency
+], ids=case_id)
+def test_raw_code_fallback(code_indexes, changes, error):
+    record = patient(**changes)
+    batch = assert_paths_agree(API_SCHEMA, record, code_indexes)
+    if error is not None:
+        assert [e['code'] for e in batch.row_errors(0)] == [error]
+        return
+
+    j, field = next((j, field) for j, field in enumerate(API_SCHEMA.fields)
+                    if field.code_key is not None and field.code_key in record)
+    from_code = record.get(field.key) is None
+    assert batch.from_code[field.key][0] == from_code
+    if from_code:
+        frequency = code_indexes[field.code_key].lookup(record[field.code_key])
+        assert batch.features[0, j] == min(max(frequency, field.low), field.high)
+
+
+def test_non_dict_records(code_indexes):
+    records = ['not an object', VALID, ValueError('line 3: bad JSON'), None, [VALID]]
+    result = API_SCHEMA.validate(records, code_indexes)
+    assert result.valid.tolist() == [False, True, False, False, False]
+    np.testing.assert_array_equal(result.features[1], API_SCHEMA.validate_one(VALID, code_indexes))
+    assert result.row_errors(0) == [{'field': None, 'code': 'malformed',
+                                     'message': 'Patient must be a JSON object, got str'}]
+    assert result.error_message(2) == 'line 3: bad JSON'
+    assert result.error_message(4) == 'Patient must be a JSON object, got list'
+    assert {result.error_type(i) for i in result.invalid_rows()} == {'malformed'}
+
+    for record in ('not an object', None, 7):
+        assert_paths_agree(API_SCHEMA, record, code_indexes)
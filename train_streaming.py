@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Out-of-core training for claims histories larger than memory.
+
+export_model.py reads the whole CSV and fits LogisticRegression(lbfgs) in
+memory. This script makes several streaming passes over the CSV in chunks,
+so peak memory depends on --chunksize rather than on the file size:
+
+    1. statistics  ICD/CPT frequency counts (FrequencyStore, with the same
+                   age filter and duplicate handling as build_training_frame)
+                   and the approval-month histogram for the median fill.
+                   Duplicates are found with a row hash index in a temporary
+                   directory: 8 bytes of disk per row, probed through memory
+                   maps. Its memory use is bounded by the chunk and by
+                   frequency_store.MAX_MERGED_RUN, not by the history size.
+                   --no-dedupe skips it.
+    2. scaler      MinMaxScaler.partial_fit on the derived features
+    3. epochs      SGDClassifier(loss='log_loss').partial_fit on shuffled,
+                   scaled chunks, with 'balanced' class weights applied as
+                   sample weights. This is the same model family as the
+                   in-memory logistic regression, and L2 alpha = 1 / n_rows
+                   matches its default C=1.0
+    4. evaluation  training-data metrics (ROC-AUC from a 4096-bin histogram)
+
+The outputs are the artifacts the services load (model.pkl, scaler.pkl,
+features.pkl, icd_mapping.pkl, cpt_mapping.pkl, model.bundle).
+
+Usage:
+    python train_streaming.py --data claims_history.csv --chunksize 500000
+    python train_streaming.py --compare --output-dir /tmp/streaming   # report vs the in-memory path
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import MinMaxScaler
+
+from code_index import CodeFrequencyIndex
+from export_model import DEFAULT_DATA_PATH, SCRIPT_DIR, save_artifacts, save_bundle
+from feature_pipeline import (
+    FEATURES, approval_month, encode_gender, extract_age_years, iter_claims,
+)
+from frequency_store import FrequencyStore
+
+DEFAULT_CHUNKSIZE = 250_000
+AUC_BINS = 4096
+
+
+def _histogram_median(counts):
+    """Median of a value histogram (counts[v] = rows with value v), as pandas computes it."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.nan
+    cumulative = np.cumsum(counts)
+    lower = int(np.searchsorted(cumulative, (total - 1) // 2 + 1))
+    upper = int(np.searchsorted(cumulative, total // 2 + 1))
+    return (lower + upper) / 2
+
+
+def collect_statistics(path, chunksize, dedupe=True):
+    """
+    Pass 1: code frequency counts, month histogram and per-chunk row masks.
+
+    Returns:
+        dict with icd_mapping, cpt_mapping, month_fill, row_masks (one
+        boolean array per chunk: rows kept after the age filter and
+        de-duplication) and rows
+    """
+    with tempfile.TemporaryDirectory(prefix='train-rowhashes-') as hash_dir:
+        return _collect_statistics(path, chunksize, FrequencyStore(path=None, dedupe=dedupe, hash_dir=hash_dir))
+
+
+def _collect_statistics(path, chunksize, store):
+    month_counts = np.zeros(13, dtype=np.int64)
+    row_masks = []
+    for chunk in iter_claims(path, chunksize):
+        counted = store.ingest_frame(chunk)['counted']
+        if store.dedupe:
+            store.row_hashes.flush()  # this chunk's hashes go to disk
+            store.row_hashes.cleanup()
+        row_masks.append(np.packbits(counted))
+        months = approval_month(chunk['ApprovedDate']).to_numpy()[counted]
+        months = months[~np.isnan(months)].astype(np.int64)
+        month_counts += np.bincount(months, minlength=13)
+
+    icd_mapping, cpt_mapping = store.mappings()
+    return {
+        'icd_mapping': icd_mapping,
+        'cpt_mapping': cpt_mapping,
+        'month_fill': _histogram_median(month_counts),
+        'row_masks': row_masks,
+        'rows': store.rows,
+    }
+
+
+def iter_training_chunks(path, chunksize, stats, icd_index, cpt_index):
+    """
+    Yield (X, y) per chunk for the rows build_training_frame would keep.
+
+    Frequencies of missing codes use the index fallback (the median over
+    rows), and missing months use the statistics' median month.
+    """
+    for chunk, packed_mask in zip(iter_claims(path, chunksize), stats['row_masks']):
+        chunk = chunk[np.unpackbits(packed_mask, count=len(chunk)).astype(bool)]
+        gender = encode_gender(chunk['Gender']).to_numpy()
+        X = np.column_stack([
+            extract_age_years(chunk['Age']).to_numpy(),
+            gender,
+            icd_index.map_series(chunk['ICD']).to_numpy(dtype=np.float64),
+            cpt_index.map_series(chunk['CPT']).to_numpy(dtype=np.float64),
+            approval_month(chunk['ApprovedDate']).fillna(stats['month_fill']).to_numpy(),
+        ])
+        y = (chunk['Insurance'].astype('string').str.strip() == 'Yes').fillna(False).to_numpy(dtype=np.int64)
+        valid = ~np.isnan(gender)
+        yield X[valid], y[valid]
+
+
+def _chunks(path, chunksize, stats, indexes):
+    return iter_training_chunks(path, chunksize, stats, *indexes)
+
+
+def train_streaming(path=DEFAULT_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, epochs=5, dedupe=True, seed=42):
+    """
+    Fit scaler and model with streaming passes over the CSV.
+
+    Returns:
+        (model, scaler, icd_mapping, cpt_mapping, stats, timings)
+    """
+    timings = {}
+    start = time.perf_counter()
+    stats = collect_statistics(path, chunksize, dedupe)
+    indexes = (CodeFrequencyIndex(stats['icd_mapping']), CodeFrequencyIndex(stats['cpt_mapping']))
+    timings['statistics'] = time.perf_counter() - start
+
+    # Pass 2: scaler min/max and class counts
+    start = time.perf_counter()
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    class_counts = np.zeros(2, dtype=np.int64)
+    for X, y in _chunks(path, chunksize, stats, indexes):
+        if len(X):
+            scaler.partial_fit(X)
+            class_counts += np.bincount(y, minlength=2)
+    n_rows = int(class_counts.sum())
+    # class_weight='balanced': n_samples / (n_classes * count(class))
+    class_weight = n_rows / (2.0 * np.maximum(class_counts, 1))
+    stats['training_rows'] = n_rows
+    stats['class_counts'] = class_counts.tolist()
+    timings['scaler'] = time.perf_counter() - start
+
+    # Passes 3+: SGD epochs
+    start = time.perf_counter()
+    # eta = eta0 / sqrt(t): the decaying step settles near the lbfgs optimum
+    # (adaptive/optimal schedules were still oscillating after 20 epochs)
+    model = SGDClassifier(loss='log_loss', penalty='l2', alpha=1.0 / n_rows, learning_rate='invscaling',
+                          eta0=0.5, power_t=0.5, random_state=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        for X, y in _chunks(path, chunksize, stats, indexes):
+            if not len(X):
+                continue
+            order = rng.permutation(len(X))
+            X, y = scaler.transform(X[order]), y[order]
+            model.partial_fit(X, y, classes=np.array([0, 1]), sample_weight=class_weight[y])
+    timings['training'] = time.perf_counter() - start
+
+    return model, scaler, stats['icd_mapping'], stats['cpt_mapping'], stats, timings
+
+
+def evaluate_streaming(model, scaler, path, chunksize, stats):
+    """Accuracy, precision, recall, F1 and (binned) ROC-AUC on the training data."""
+    indexes = (CodeFrequencyIndex(stats['icd_mapping']), CodeFrequencyIndex(stats['cpt_mapping']))
+    tp = fp = tn = fn = 0
+    positive_bins = np.zeros(AUC_BINS, dtype=np.int64)
+    negative_bins = np.zeros(AUC_BINS, dtype=np.int64)
+    for X, y in _chunks(path, chunksize, stats, indexes):
+        if not len(X):
+            continue
+        probability = model.predict_proba(scaler.transform(X))[:, 1]
+        predicted = probability > 0.5
+        actual = y == 1
+        tp += int(np.sum(predicted & actual))
+        fp += int(np.sum(predicted & ~actual))
+        tn += int(np.sum(~predicted & ~actual))
+        fn += int(np.sum(~predicted & actual))
+        bins = np.minimum((probability * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+        positive_bins += np.bincount(bins[actual], minlength=AUC_BINS)
+        negative_bins += np.bincount(bins[~actual], minlength=AUC_BINS)
+
+    # AUC = P(score_pos > score_neg) + P(tie) / 2, with ties = same bin
+    negatives_below = np.cumsum(negative_bins) - negative_bins
+    pairs = positive_bins.sum() * negative_bins.sum()
+    auc = float((positive_bins * (negatives_below + negative_bins / 2)).sum() / pairs) if pairs else float('nan')
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'accuracy': (tp + tn) / max(tp + fp + tn + fn, 1),
+        'precision': precision,
+        'recall': recall,
+        'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'roc_auc': auc,
+    }
+
+
+def compare_with_in_memory(data_path, chunksize, stats, streaming_model, streaming_scaler, streaming_seconds):
+    """Train with export_model's in-memory path and evaluate both models the same way."""
+    from export_model import prepare_training_data, train_model
+
+    start = time.perf_counter()
+    X, y, _, _ = prepare_training_data(data_path, use_cache=False)
+    X = X.to_numpy(dtype=np.float64)
+    model, scaler, _ = train_model(X, y)
+    in_memory_seconds = time.perf_counter() - start
+
+    streaming = evaluate_streaming(streaming_model, streaming_scaler, data_path, chunksize, stats)
+    in_memory = evaluate_streaming(model, scaler, data_path, chunksize, stats)
+
+    # Decision agreement on the in-memory training matrix
+    agreement = float(np.mean(
+        streaming_model.predict(streaming_scaler.transform(X)) == model.predict(scaler.transform(X))
+    ))
+    return {
+        'in_memory': dict(in_memory, seconds=in_memory_seconds),
+        'streaming': dict(streaming, seconds=streaming_seconds),
+        'decision_agreement': agreement,
+        'coefficients': {
+            'in_memory': dict(zip(FEATURES, model.coef_[0].tolist()), intercept=float(model.intercept_[0])),
+            'streaming': dict(zip(FEATURES, streaming_model.coef_[0].tolist()),
+                              intercept=float(streaming_model.intercept_[0])),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the eligibility model out of core, in CSV chunks')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='Raw claims CSV')
+    parser.add_argument('--output-dir', default=SCRIPT_DIR, help='Where to write the artifacts')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Rows per chunk')
+    parser.add_argument('--epochs', type=int, default=5, help='SGD passes over the data')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help='Keep duplicate rows (skips the on-disk row hash index, 8 bytes per row)')
+    parser.add_argument('--compare', action='store_true', help='Also train in memory and report both')
+    parser.add_argument('--report', help='Write the comparison/metrics report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    model, scaler, icd_mapping, cpt_mapping, stats, timings = train_streaming(
+        args.data, args.chunksize, args.epochs, dedupe=not args.no_dedupe
+    )
+    streaming_seconds = time.perf_counter() - start
+
+    metrics = evaluate_streaming(model, scaler, args.data, args.chunksize, stats)
+    os.makedirs(args.output_dir, exist_ok=True)
+    save_artifacts(model, scaler, icd_mapping, cpt_mapping, args.output_dir)
+    bundle_path = save_bundle(model, scaler, icd_mapping, cpt_mapping, metrics, args.output_dir)
+
+    print(f"✅ Artifacts saved to {args.output_dir} (model.pkl, scaler.pkl, features.pkl, "
+          f"icd_mapping.pkl, cpt_mapping.pkl, {os.path.basename(bundle_path)})")
+    print(f"\n⏱️  {stats['training_rows']:,} training rows in chunks of {args.chunksize:,}: "
+          + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+    print(f"\n📊 Model Performance on Training Data:")
+    for name, value in metrics.items():
+        print(f"   {name}: {value:.4f}")
+
+    report = {'metrics': metrics, 'timings': timings, 'rows': stats['training_rows']}
+    if args.compare:
+        comparison = compare_with_in_memory(args.data, args.chunksize, stats, model, scaler, streaming_seconds)
+        report['comparison'] = comparison
+        print(f"\n🔍 Streaming vs in-memory (same evaluation):")
+        print(f"   {'':<12} {'streaming':>10} {'in-memory':>10}")
+        for name in ('accuracy', 'precision', 'recall', 'f1_score', 'roc_auc', 'seconds'):
+            print(f"   {name:<12} {comparison['streaming'][name]:>10.4f} {comparison['in_memory'][name]:>10.4f}")
+        print(f"   decision agreement: {comparison['decision_agreement']:.2%}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Schema-driven, vectorized validation of patient records.
+
+A Schema turns a whole batch of patient dicts into typed feature columns in
+one pass and checks ranges and enums as array operations. The result holds
+the (N, n_fields) feature matrix, a boolean `valid` mask and an (N, n_fields)
+matrix of error codes, so invalid rows can be reported while the valid rows
+are scored in a single engine call:
+
+    result = API_SCHEMA.validate(patients, code_indexes={'icd': icd_index, 'cpt': cpt_index})
+    probabilities = engine.eligible_probability(result.features[result.valid])
+    for i in result.invalid_rows():
+        print(i, result.row_errors(i))   # [{'field': 'age', 'code': 'out_of_range', 'message': ...}]
+
+Error codes (ERROR_CODES): missing, not_a_number, out_of_range,
+invalid_choice, invalid_code, malformed (the record is not an object, e.g.
+an unparseable stream line).
+
+Only NumPy is needed, so the serving processes stay free of pandas.
+"""
+
+from itertools import repeat
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+OK = 0
+MISSING = 1
+NOT_A_NUMBER = 2
+OUT_OF_RANGE = 3
+INVALID_CHOICE = 4
+INVALID_CODE = 5
+MALFORMED = 6
+
+ERROR_CODES = {
+    MISSING: 'missing',
+    NOT_A_NUMBER: 'not_a_number',
+    OUT_OF_RANGE: 'out_of_range',
+    INVALID_CHOICE: 'invalid_choice',
+    INVALID_CODE: 'invalid_code',
+    MALFORMED: 'malformed',
+}
+
+
+class Field(NamedTuple):
+    """
+    One feature column of a schema.
+
+    Attributes:
+        key: Input key (also the name reported in errors)
+        label: Name used in error messages, e.g. 'Age'
+        low, high: Inclusive range for numeric fields
+        choices: Enum fields: lower-cased input value -> encoded number
+        integer: Truncate numeric values toward zero (like int())
+        code_key: Alternative key holding a raw code, resolved through the
+            code index of the same name when `key` is absent. Resolved
+            frequencies are clipped to [low, high]: code tables keep
+            counting after training (frequency_store.py), and the model was
+            only fitted on that range
+        error_type: Metrics/error label for this field's failures
+    """
+    key: str
+    label: str
+    low: Optional[float] = None
+    high: Optional[float] = None
+    choices: Optional[dict] = None
+    integer: bool = False
+    code_key: Optional[str] = None
+    error_type: str = 'invalid_input'
+
+    def describe(self):
+        """The constraint, as used in error messages."""
+        if self.choices is not None:
+            return f"{self.label} must be " + ' or '.join(repr(choice) for choice in self.choices)
+        return f"{self.label} must be {self.low:g}-{self.high:g}"
+
+    def clip(self, frequencies):
+        """Code-resolved frequencies limited to the field's range (scalar or array)."""
+        return np.clip(frequencies, self.low, self.high)
+
+
+def numeric_column(values):
+    """Values as a float array; NaN where missing or not a number."""
+    try:
+        column = np.asarray(values, dtype=np.float64)
+        if column.shape == (len(values),):
+            return column
+    except (TypeError, ValueError, OverflowError):
+        pass
+    # Slow path: some values are strings, nested lists, huge ints or other objects
+    column = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            column[i] = float(value)
+        except OverflowError:  # an int beyond float range, like the float '1e400'
+            column[i] = np.inf if value > 0 else -np.inf
+        except (TypeError, ValueError):
+            pass
+    return column
+
+
+def _enum_column(values, choices):
+    """Encoded enum values (matched case-insensitively); NaN where not a choice."""
+    def encode(value):
+        return choices.get(value.lower(), np.nan) if type(value) is str else np.nan
+    try:
+        # Batches repeat a handful of values: encode each distinct one once
+        table = {value: encode(value) for value in set(values)}
+        return np.fromiter(map(table.__getitem__, values), dtype=np.float64, count=len(values))
+    except TypeError:  # unhashable values (lists, dicts)
+        return np.fromiter(map(encode, values), dtype=np.float64, count=len(values))
+
+
+class ValidationResult:
+    """
+    Typed columns and per-row, per-field error codes for one batch.
+
+    Attributes:
+        features: (N, n_fields) float64 matrix; cells that failed are NaN
+        valid: (N,) bool mask of rows without any error
+        codes: (N, n_fields) int8 error codes (0 = ok), see ERROR_CODES
+        from_code: field key -> (N,) bool mask of rows resolved from a raw code
+    """
+
+    def __init__(self, schema, records, features, codes, from_code, malformed):
+        self.schema = schema
+        self.records = records
+        self.features = features
+        self.codes = codes
+        self.valid = ~codes.any(axis=1)
+        self.from_code = from_code
+        self._malformed = malformed
+
+    def __len__(self):
+        return len(self.valid)
+
+    def invalid_rows(self):
+        """Indices of rows with at least one error."""
+        return np.flatnonzero(~self.valid).tolist()
+
+    def row_errors(self, i):
+        """[{'field', 'code', 'message'}] for row i, in schema field order."""
+        if i in self._malformed:
+            return [{'field': None, 'code': 'malformed', 'message': self._malformed[i]}]
+        record = self.records[i]
+        errors = []
+        for j in np.flatnonzero(self.codes[i]).tolist():
+            field = self.schema.fields[j]
+            code = int(self.codes[i, j])
+            errors.append({'field': field.key, 'code': ERROR_CODES[code],
+                           'message': self.schema.message(field, code, record)})
+        return errors
+
+    def error_message(self, i):
+        """Messages of row i's errors, joined with '; '."""
+        return '; '.join(error['message'] for error in self.row_errors(i))
+
+    def error_type(self, i):
+        """Metrics label for row i: missing_fields, malformed or its first field's error_type."""
+        if i in self._malformed:
+            return 'malformed'
+        row = self.codes[i]
+        if (row == MISSING).any():
+            return 'missing_fields'
+        return self.schema.fields[int(np.flatnonzero(row)[0])].error_type
+
+
+class Schema:
+    """Ordered fields; `validate` maps records to a ValidationResult."""
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def message(self, field, code, record):
+        if code == MISSING:
+            alternatives = f" (or {field.code_key})" if field.code_key else ''
+            return f"Missing field: {field.key}{alternatives}"
+        value = record.get(field.key, record.get(field.code_key) if field.code_key else None)
+        if code == NOT_A_NUMBER:
+            return f"{field.label} must be a number, got {value!r}"
+        if code == INVALID_CODE:
+            return f"{field.code_key.upper()} code must be a string, got {value!r}"
+        return f"{field.describe()}, got {value}"
+
+    def validate(self, records, code_indexes=None):
+        """
+        Convert and check a batch of records.
+
+        Args:
+            records: Sequence of dicts; any other entry (e.g. an Exception
+                from a stream parser) is reported as malformed
+            code_indexes: code_key -> CodeFrequencyIndex, for fields that
+                accept raw codes
+
+        Returns:
+            ValidationResult
+        """
+        n = len(records)
+        if n == 1 and type(records[0]) is dict:
+            row = self._fast_row(records[0], code_indexes)
+            if row is not None:
+                from_code = {
+                    field.key: np.array([records[0].get(field.key) is None])
+                    for field in self.fields if field.code_key is not None
+                }
+                return ValidationResult(self, records, np.array([row]),
+                                        np.zeros((1, len(self.fields)), dtype=np.int8), from_code, {})
+
+        malformed = {}
+        if set(map(type, records)) - {dict}:
+            cleaned = []
+            for i, record in enumerate(records):
+                if isinstance(record, dict):
+                    cleaned.append(record)
+                else:
+                    malformed[i] = str(record) if isinstance(record, Exception) else \
+                        f"Patient must be a JSON object, got {type(record).__name__}"
+                    cleaned.append({})
+            records = cleaned
+
+        features = np.full((n, len(self.fields)), np.nan)
+        codes = np.zeros((n, len(self.fields)), dtype=np.int8)
+        from_code = {}
+        for j, field in enumerate(self.fields):
+            values = list(map(dict.get, records, repeat(field.key)))
+            column = _enum_column(values, field.choices) if field.choices is not None else numeric_column(values)
+            # Only NaN cells can be missing or invalid; inspect just those values
+            nan_rows = np.flatnonzero(np.isnan(column))
+            missing = nan_rows[np.fromiter((values[i] is None for i in nan_rows.tolist()), dtype=bool,
+                                           count=len(nan_rows))]
+            codes[nan_rows, j] = INVALID_CHOICE if field.choices is not None else NOT_A_NUMBER
+
+            if field.choices is None:
+                if field.integer:
+                    column = np.trunc(column)
+                with np.errstate(invalid='ignore'):
+                    codes[~((column >= field.low) & (column <= field.high)) & ~np.isnan(column), j] = OUT_OF_RANGE
+
+            if field.code_key is not None:
+                # Rows without the numeric key fall back to the raw code
+                raw = [records[i].get(field.code_key) for i in missing.tolist()]
+                has_code = np.fromiter((code is not None for code in raw), dtype=bool, count=len(raw))
+                usable = np.fromiter((type(code) in (str, int) for code in raw), dtype=bool, count=len(raw))
+                codes[missing[has_code & ~usable], j] = INVALID_CODE
+                if usable.any():
+                    codes[missing[usable], j] = OK
+                    column[missing[usable]] = field.clip(code_indexes[field.code_key].lookup_many(
+                        [code for code, ok in zip(raw, usable.tolist()) if ok]
+                    ))
+                use_code = np.zeros(n, dtype=bool)
+                use_code[missing[has_code]] = True
+                from_code[field.key] = use_code
+                missing = missing[~has_code]
+
+            codes[missing, j] = MISSING
+            column[codes[:, j] != OK] = np.nan
+            features[:, j] = column
+
+        if malformed:
+            rows = np.fromiter(malformed, dtype=np.int64, count=len(malformed))
+            codes[rows] = MALFORMED
+        return ValidationResult(self, records, features, codes, from_code, malformed)
+
+    def _fast_row(self, record, code_indexes):
+        """
+        Feature row for one record using scalar checks.
+
+        Single-row requests would otherwise pay the fixed cost of the array
+        operations. Returns None when anything is off, in which case the
+        array path produces the errors.
+        """
+        row = []
+        for field in self.fields:
+            value = record.get(field.key)
+            if field.choices is not None:
+                encoded = field.choices.get(value.lower()) if type(value) is str else None
+                if encoded is None:
+                    return None
+                row.append(encoded)
+                continue
+            if value is None and field.code_key is not None:
+                code = record.get(field.code_key)
+                if type(code) not in (str, int):
+                    return None
+                row.append(float(field.clip(code_indexes[field.code_key].lookup(code))))
+                continue
+            if type(value) not in (int, float):
+                return None
+            try:
+                number = float(int(value)) if field.integer else float(value)
+            except (ValueError, OverflowError):  # NaN / infinity
+                return None
+            if not field.low <= number <= field.high:
+                return None
+            row.append(number)
+        return row
+
+    def validate_one(self, record, code_indexes=None):
+        """
+        Feature row for a single record.
+
+        Raises:
+            ValueError with the record's error messages if it is invalid
+        """
+        if type(record) is dict:
+            row = self._fast_row(record, code_indexes)
+            if row is not None:
+                return np.array(row)
+        result = self.validate([record], code_indexes)
+        if not result.valid[0]:
+            raise ValueError(result.error_message(0))
+        return result.features[0]
+
+
+GENDER_CHOICES = {'male': 1.0, 'female': 0.0}
+
+# Wire format of api.py: frequencies or raw ICD/CPT codes; whole numbers
+API_SCHEMA = Schema([
+    Field('age', 'Age', 1, 120, integer=True, error_type='invalid_age'),
+    Field('gender', 'Gender', choices=GENDER_CHOICES, error_type='invalid_gender'),
+    Field('icd_frequency', 'ICD frequency', 1, 683, integer=True, code_key='icd',
+          error_type='invalid_icd_frequency'),
+    Field('cpt_frequency', 'CPT frequency', 1, 1815, integer=True, code_key='cpt',
+          error_type='invalid_cpt_frequency'),
+    Field('month', 'Month', 1, 6, integer=True, error_type='invalid_month'),
+])
+
+# predictor.InsuranceEligibilityPredictor keyword names
+PREDICTOR_SCHEMA = Schema([
+    Field('age', 'Age', 1, 120, error_type='invalid_age'),
+    Field('gender', 'Gender', choices=GENDER_CHOICES, error_type='invalid_gender'),
+    Field('icd_freq', 'ICD frequency', 1, 683, error_type='invalid_icd_frequency'),
+    Field('cpt_freq', 'CPT frequency', 1, 1815, error_type='invalid_cpt_frequency'),
+    Field('month', 'Month', 1, 6, error_type='invalid_month'),
+])